@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # connect the cache invalidation, NOTIFY, statistics and webhook receivers
+        from . import authentication, broadcast, stats, webhooks  # noqa: F401
+
+        # register the OpenAPI extensions
+        from . import schema  # noqa: F401
@@ -0,0 +1,308 @@
+"""
+Async views, served natively under ASGI (project/asgi.py).
+
+The KYC status streams only exist here. The status, profile and
+verification views mirror their APIView counterparts in views.py and replace
+them in the URLs when KYC_ASYNC_VIEWS is enabled.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from project.timing import stage
+
+from . import idempotency, verification
+from .authentication import CachedJWTAuthentication, KYCTokenAuthentication
+from .broadcast import get_broadcaster
+from .conditional import add_cache_headers, user_etag
+from .media import signed_resource
+from .models import KYCState
+from .renderers import ORJSONRenderer
+from .serializers import DocumentUploadSerializer, UserProfileReadSerializer
+from .views import KYC_CONFLICT_MESSAGE
+
+User = get_user_model()
+
+
+def _status(state):
+    return {
+        "status": "Verified" if state == KYCState.VERIFIED else "Not Verified",
+        "kyc_state": state,
+    }
+
+
+def _pooled(function):
+    """
+    `function` made awaitable, run in the shared thread pool.
+
+    Thread-sensitive sync code runs in a thread that keeps its database
+    connection open. The KYC status streams stay open for minutes and share
+    that thread (see project/handlers.py), so they do their database work
+    here instead and close the connection right away.
+    """
+
+    def run(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            connections.close_all()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def _authenticate(
+    request, authentication_class=CachedJWTAuthentication, view=None, run=sync_to_async
+):
+    """
+    Authenticate and throttle the request like the APIViews do.
+
+    Args:
+        run (Callable): Makes the sync authentication and throttling awaitable,
+            _pooled for the long lived requests.
+
+    Returns:
+        tuple: The user and None, or None and an error response.
+    """
+    try:
+        result = await run(authentication_class().authenticate)(request)
+    except APIException as exc:
+        return None, JsonResponse({"detail": exc.detail}, status=401)
+    if result is None:
+        return None, JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+
+    request.user = result[0]
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not await run(throttle.allow_request)(request, view):
+            response = JsonResponse({"detail": "Request was throttled."}, status=429)
+            wait = throttle.wait()
+            if wait is not None:
+                response["Retry-After"] = str(int(wait))
+            return None, response
+    return request.user, None
+
+
+def _json(data, status=200):
+    return HttpResponse(
+        ORJSONRenderer().render(data), status=status, content_type="application/json"
+    )
+
+
+@_pooled
+def _current_state(user_id):
+    return (
+        User.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=user_id)
+        .values_list("kyc_state", flat=True)
+        .first()
+    )
+
+
+@require_GET
+async def kyc_status_events(request):
+    """
+    Stream the KYC status of the authenticated user as server-sent events.
+
+    The current status is sent when the stream opens, then every time it
+    changes. A keepalive comment is sent every KYC_EVENTS_KEEPALIVE_SECONDS.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        StreamingHttpResponse: A text/event-stream of "kyc-status" events, or a
+        401 JSON response.
+    """
+    user, error = await _authenticate(request, run=_pooled)
+    if error is not None:
+        return error
+    user_id = user.pk
+
+    async def events():
+        broadcaster = get_broadcaster()
+        with broadcaster.subscribe(user_id) as queue:
+            state = await _current_state(user_id)
+            broadcaster.seen(user_id, state)
+            yield "retry: 5000\n\n"
+            yield f"event: kyc-status\ndata: {json.dumps(_status(state))}\n\n"
+            while True:
+                try:
+                    new_state = await asyncio.wait_for(
+                        queue.get(), settings.KYC_EVENTS_KEEPALIVE_SECONDS
+                    )
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if new_state != state:
+                    state = new_state
+                    yield f"event: kyc-status\ndata: {json.dumps(_status(state))}\n\n"
+
+    return StreamingHttpResponse(
+        events(),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@require_GET
+async def kyc_status_wait(request):
+    """
+    Long-poll for a change of the KYC status of the authenticated user.
+
+    Returns as soon as the user's KYC state differs from the "kyc_state" query
+    parameter, or after "timeout" seconds (at most KYC_EVENTS_MAX_WAIT_SECONDS).
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        JsonResponse: The current "status" and "kyc_state" of the user.
+    """
+    user, error = await _authenticate(request, run=_pooled)
+    if error is not None:
+        return error
+    user_id = user.pk
+
+    try:
+        timeout = float(
+            request.GET.get("timeout", settings.KYC_EVENTS_MAX_WAIT_SECONDS)
+        )
+    except ValueError:
+        return JsonResponse({"timeout": ["A valid number is required."]}, status=400)
+    timeout = min(max(timeout, 0), settings.KYC_EVENTS_MAX_WAIT_SECONDS)
+
+    broadcaster = get_broadcaster()
+    with broadcaster.subscribe(user_id) as queue:
+        state = await _current_state(user_id)
+        broadcaster.seen(user_id, state)
+        if state == request.GET.get("kyc_state"):
+            try:
+                state = await asyncio.wait_for(queue.get(), timeout)
+            except TimeoutError:
+                pass
+    return JsonResponse(_status(state))
+
+
+@require_GET
+async def kyc_status(request):
+    """
+    Async version of KYCStatusView, served from the token claims.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The "status" of the user, or 304 if the If-None-Match
+        ETag is current.
+    """
+    user, error = await _authenticate(request, KYCTokenAuthentication)
+    if error is not None:
+        return error
+
+    etag = user_etag(user, "kyc-status", "json")
+    response = get_conditional_response(request, etag=etag) or _json(
+        {"status": "Verified" if user.is_kyc_verified else "Not Verified"}
+    )
+    return add_cache_headers(response, etag, settings.KYC_STATUS_MAX_AGE)
+
+
+@require_GET
+async def user_profile(request):
+    """
+    Async version of UserProfileView.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The profile of the user, or 304 if the If-None-Match
+        ETag is current.
+    """
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+
+    etag = user_etag(user, signed_resource("user-profile"), "json")
+    response = get_conditional_response(request, etag=etag) or _json(
+        UserProfileReadSerializer().serialize_instance(user)
+    )
+    return add_cache_headers(response, etag, settings.USER_PROFILE_MAX_AGE)
+
+
+@csrf_exempt
+@require_POST
+async def verify_identity(request):
+    """
+    Async version of VerifyIdentityView.
+
+    The Textract and Rekognition calls run concurrently without blocking the
+    event loop, see accounts.verification.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing the document.
+
+    Returns:
+        HttpResponse: The status of the verification process.
+    """
+    user, error = await _authenticate(request, view=verify_identity)
+    if error is not None:
+        return error
+
+    # parsing the multipart body reads the upload
+    with stage("upload"):
+        serializer = DocumentUploadSerializer(data=request.FILES)
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+
+    key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    if not key:
+        return _json(*await _verify(user, serializer.validated_data["document"]))
+    error = idempotency.check_key(key, user)
+    if error is not None:
+        return _json({"error": error}, status=400)
+
+    fingerprint = idempotency.request_fingerprint(
+        request.method, request.path, request.FILES
+    )
+    state, record = await sync_to_async(idempotency.claim)(
+        idempotency.scope_for(request, user), key, fingerprint
+    )
+    if state != idempotency.NEW:
+        status, data, headers = idempotency.rejection(state, record)
+        response = _json(data, status=status)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    try:
+        data, status = await _verify(user, serializer.validated_data["document"])
+    except BaseException:
+        await sync_to_async(idempotency.release)(record)
+        raise
+    await sync_to_async(idempotency.complete)(record, status, data)
+    return _json(data, status=status)
+
+
+verify_identity.throttle_cost = settings.KYC_VERIFY_THROTTLE_COST
+
+
+async def _verify(user, document):
+    outcome = await verification.averify_document(user, document)
+    if outcome == verification.NAME_MISMATCH:
+        return {"error": "Full name does not match ID."}, 400
+    if outcome == verification.CONFLICT:
+        return {"error": KYC_CONFLICT_MESSAGE}, 409
+    return {"status": "Verification successful!"}, 200
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .signals import kyc_state_changed
+
+User = get_user_model()
+
+# claims added to the tokens issued by /api/login/
+KYC_VERIFIED_CLAIM = "is_kyc_verified"
+KYC_VERSION_CLAIM = "kyc_version"
+
+# cached for users that don't exist or are inactive
+MISSING_VERSION = -1
+
+
+def _version_key(user_id):
+    return f"kyc-version:{user_id}"
+
+
+def current_kyc_version(user_id):
+    """
+    The user's current version, from the cache or, on a miss, the primary.
+
+    Returns:
+        int | None: The version, or None if the user doesn't exist or is inactive.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # a lagging replica would cache a version that is already outdated
+        version = (
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pk=user_id, is_active=True)
+            .values_list("version", flat=True)
+            .first()
+        )
+        if version is None:
+            version = MISSING_VERSION
+        cache.set(key, version, settings.KYC_VERSION_CACHE_SECONDS)
+    return None if version == MISSING_VERSION else version
+
+
+def forget_kyc_versions(user_ids):
+    keys = [_version_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # a concurrent request may cache the old version until the change commits
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class UserCache:
+    """
+    Two-tier cache of the users resolved from access tokens.
+
+    A small in-process LRU, whose entries live for JWT_USER_CACHE_LOCAL_SECONDS,
+    sits in front of the shared Django cache. Both tiers hold the raw column
+    values (without the password hash) and every hit builds a fresh User, so
+    views can modify request.user freely.
+
+    Entries are dropped when the user is saved or deleted and on KYC state
+    changes. Only the local tier of the current process can be cleared, which
+    is why other processes may serve a changed user for up to
+    JWT_USER_CACHE_LOCAL_SECONDS.
+    """
+
+    field_names = [
+        field.attname
+        for field in User._meta.concrete_fields
+        if field.attname != "password"
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self.local_hits = self.shared_hits = self.misses = 0
+
+    def get(self, user_id):
+        """
+        Returns:
+            User | None: The user, or None if it doesn't exist.
+        """
+        key = f"jwt-user:{user_id}"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > now:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return self._build(entry[1])
+
+        values = cache.get(key)
+        if values is not None:
+            self.shared_hits += 1
+        else:
+            values = (
+                User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list(*self.field_names)
+                .first()
+            )
+            self.misses += 1
+            if values is None:
+                return None
+            cache.set(key, values, settings.JWT_USER_CACHE_SECONDS)
+
+        with self._lock:
+            self._local[key] = (now + settings.JWT_USER_CACHE_LOCAL_SECONDS, values)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.JWT_USER_CACHE_SIZE:
+                self._local.popitem(last=False)
+        return self._build(values)
+
+    def forget(self, user_ids):
+        keys = [f"jwt-user:{user_id}" for user_id in user_ids]
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        cache.delete_many(keys)
+
+    def stats(self):
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": (
+                round((self.local_hits + self.shared_hits) / lookups, 4)
+                if lookups
+                else None
+            ),
+            "db_queries_saved": self.local_hits + self.shared_hits,
+            "local_size": len(self._local),
+        }
+
+    def _build(self, values):
+        values = iter(values)
+        return User.from_db(
+            DEFAULT_DB_ALIAS,
+            self.field_names,
+            [
+                next(values) if field.attname != "password" else DEFERRED
+                for field in User._meta.concrete_fields
+            ],
+        )
+
+
+user_cache = UserCache()
+
+
+def forget_users(user_ids):
+    forget_kyc_versions(user_ids)
+    user_cache.forget(user_ids)
+    transaction.on_commit(lambda: user_cache.forget(user_ids))
+
+
+@receiver(kyc_state_changed)
+def _kyc_state_changed(sender, changes, **kwargs):
+    forget_users([user_id for user_id, _, _ in changes])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _user_changed(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users through the user cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # loads the deferred password hash
+            return super().get_user(validated_token)
+
+        return user
+
+
+class KYCTokenAuthentication(CachedJWTAuthentication):
+    """
+    Authenticates from the KYC claims of the access token, without loading the user.
+
+    The token's version claim is compared to the user's current version, which
+    is cached for KYC_VERSION_CACHE_SECONDS and dropped whenever the user or
+    their KYC state changes. Tokens issued before the last change, or without
+    the claims, fall back to loading the user like CachedJWTAuthentication.
+
+    request.user is a TokenUser exposing the claims, e.g. is_kyc_verified.
+    """
+
+    def get_user(self, validated_token):
+        if (
+            KYC_VERSION_CLAIM not in validated_token
+            or KYC_VERIFIED_CLAIM not in validated_token
+        ):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        version = current_kyc_version(user_id)
+        if version is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if version != validated_token[KYC_VERSION_CLAIM]:
+            # the KYC claims are stale
+            return super().get_user(validated_token)
+
+        return api_settings.TOKEN_USER_CLASS(validated_token)
@@ -0,0 +1,201 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# changed by every process that blacklists a token
+GENERATION_KEY = "token-blacklist:generation"
+# rows committed slightly out of order are still picked up by the next refresh
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """A Bloom filter of strings, sized for `capacity` items at `error_rate`."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def error_rate(self):
+        """Expected false positive rate at the current fill."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class BlacklistFilter:
+    """
+    Per-process Bloom filter of the blacklisted refresh token JTIs.
+
+    A JTI the filter doesn't contain is not blacklisted, so the common case
+    never queries the database; positives are confirmed with a query. The
+    filter is refreshed incrementally from BlacklistedToken rows whenever the
+    generation in the shared cache changes, which every logout does before it
+    responds, and rebuilt from scratch every
+    TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS or when it outgrows its capacity.
+
+    A local memory cache doesn't tell a process about the logouts of the
+    others, so without a shared cache (see CACHES) negatives are confirmed
+    with a query as well.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._generation = None
+        self._loaded_until = None
+        self._refreshed_at = self._built_at = 0.0
+        self.lookups = self.positives = self.false_positives = 0
+        self.database_checks = 0
+
+    def might_contain(self, jti):
+        self._refresh()
+        self.lookups += 1
+        if jti in self._filter:
+            self.positives += 1
+            return True
+        return False
+
+    def record_false_positive(self):
+        self.false_positives += 1
+
+    def record_database_check(self):
+        self.database_checks += 1
+
+    def add(self, jti):
+        """Add a token blacklisted by this process and tell the other ones."""
+        with self._lock:
+            if self._filter is not None and jti not in self._filter:
+                self._filter.add(jti)
+        transaction.on_commit(_bump_generation)
+
+    def stats(self):
+        bloom = self._filter
+        negatives = self.lookups - (self.positives - self.false_positives)
+        return {
+            "items": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "size_bytes": len(bloom.bits) if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "expected_false_positive_rate": (
+                round(bloom.error_rate(), 6) if bloom else None
+            ),
+            "lookups": self.lookups,
+            "database_checks": self.database_checks,
+            "false_positives": self.false_positives,
+            "observed_false_positive_rate": (
+                round(self.false_positives / negatives, 6) if negatives else None
+            ),
+        }
+
+    def _refresh(self):
+        now = time.monotonic()
+        generation = cache.get(GENERATION_KEY)
+        if (
+            self._filter is not None
+            and generation == self._generation
+            and now - self._refreshed_at
+            < settings.TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS
+        ):
+            return
+
+        with self._lock:
+            if (
+                self._filter is None
+                or self._filter.count > self._filter.capacity
+                or now - self._built_at
+                > settings.TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS
+            ):
+                self._rebuild(now)
+            else:
+                self._load(self._filter, self._loaded_until - REFRESH_OVERLAP)
+            self._generation = generation
+            self._refreshed_at = now
+
+    def _rebuild(self, now):
+        rows = BlacklistedToken.objects.filter(
+            token__expires_at__gt=timezone.now()
+        ).count()
+        bloom = BloomFilter(
+            max(settings.TOKEN_BLACKLIST_FILTER_CAPACITY, rows * 2),
+            settings.TOKEN_BLACKLIST_FILTER_ERROR_RATE,
+        )
+        self._loaded_until = None
+        self._load(bloom, None)
+        self._filter = bloom
+        self._built_at = now
+
+    def _load(self, bloom, since):
+        started = timezone.now()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+        if since is not None:
+            rows = rows.filter(blacklisted_at__gte=since)
+        for jti in rows.values_list("token__jti", flat=True).iterator():
+            if jti not in bloom:
+                bloom.add(jti)
+        self._loaded_until = started
+
+
+def _bump_generation():
+    # a new value rather than incr(), which restarts from 1 after an eviction
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def shared_cache():
+    """Whether the default cache is seen by the other processes."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken checking the blacklist through the per-process filter first."""
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        positive = blacklist_filter.might_contain(jti)
+        if not positive and shared_cache():
+            return
+        blacklist_filter.record_database_check()
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_("Token is blacklisted"))
+        if positive:
+            blacklist_filter.record_false_positive()
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+from .signals import kyc_state_changed
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CHANNEL = "kyc_state_changed"
+# keeps NOTIFY payloads well under the 8000 bytes limit
+NOTIFY_BATCH_SIZE = 200
+
+
+@receiver(kyc_state_changed)
+def _notify(sender, changes, **kwargs):
+    # NOTIFY is transactional: listeners only hear about committed changes
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(changes), NOTIFY_BATCH_SIZE):
+            payload = json.dumps(
+                [
+                    [user_id, state]
+                    for user_id, _, state in changes[start : start + NOTIFY_BATCH_SIZE]
+                ]
+            )
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+
+class KYCBroadcaster:
+    """
+    Wakes the coroutines of an event loop waiting for KYC state changes.
+
+    Each waiter only costs an asyncio.Queue. On PostgreSQL a single thread
+    LISTENs for the notifications sent on kyc_state_changed; on other
+    databases one query every KYC_EVENTS_POLL_INTERVAL seconds checks the
+    states of all the users being waited on. The broadcaster stops when the
+    last waiter leaves.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._queues = defaultdict(set)
+        # last state seen of each user being waited on
+        self._states = {}
+        self._task = None
+        self._stopped = None
+
+    @contextmanager
+    def subscribe(self, user_id):
+        """
+        Wait for the KYC state changes of a user.
+
+        Yields:
+            asyncio.Queue: Receives the user's new KYC states.
+        """
+        queue = asyncio.Queue()
+        self._queues[user_id].add(queue)
+        self._start()
+        try:
+            yield queue
+        finally:
+            queues = self._queues[user_id]
+            queues.discard(queue)
+            if not queues:
+                del self._queues[user_id]
+                self._states.pop(user_id, None)
+            if not self._queues:
+                self._stop()
+
+    def seen(self, user_id, state):
+        """Record the state a new waiter read, changes are detected from there."""
+        self._states.setdefault(user_id, state)
+
+    def publish(self, changes):
+        for user_id, state in changes:
+            if user_id not in self._queues:
+                continue
+            self._states[user_id] = state
+            for queue in self._queues[user_id]:
+                queue.put_nowait(state)
+
+    def _start(self):
+        if self._task is not None:
+            return
+        _broadcasters.setdefault(self._loop, self)
+        self._stopped = threading.Event()
+        if connections[DEFAULT_DB_ALIAS].vendor == "postgresql":
+            self._task = threading.Thread(
+                target=self._listen,
+                args=(self._stopped,),
+                name="kyc-listen",
+                daemon=True,
+            )
+            self._task.start()
+        else:
+            self._task = self._loop.create_task(self._poll())
+
+    def _stop(self):
+        self._stopped.set()
+        if isinstance(self._task, asyncio.Task):
+            self._task.cancel()
+        self._task = None
+        _broadcasters.pop(self._loop, None)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(settings.KYC_EVENTS_POLL_INTERVAL)
+            try:
+                await self._check_states()
+            except Exception:
+                logger.warning("Cannot check the KYC states", exc_info=True)
+
+    async def _check_states(self):
+        known = dict(self._states)
+        if known:
+            current = await sync_to_async(self._current_states, thread_sensitive=False)(
+                list(known)
+            )
+            self.publish(
+                [
+                    (user_id, state)
+                    for user_id, state in current.items()
+                    if state != known[user_id]
+                ]
+            )
+
+    def _current_states(self, user_ids):
+        states = {}
+        try:
+            for start in range(0, len(user_ids), 1000):
+                states.update(
+                    User.objects.using(DEFAULT_DB_ALIAS)
+                    .filter(pk__in=user_ids[start : start + 1000])
+                    .values_list("pk", "kyc_state")
+                )
+        finally:
+            # runs in the shared thread pool, between long idle periods
+            connections.close_all()
+        return states
+
+    def _listen(self, stopped):
+        connection = connections[DEFAULT_DB_ALIAS]
+        while not stopped.is_set():
+            try:
+                listener = connection.get_new_connection(
+                    connection.get_connection_params()
+                )
+            except Exception:
+                logger.warning("Cannot LISTEN for KYC state changes", exc_info=True)
+                stopped.wait(settings.KYC_EVENTS_POLL_INTERVAL)
+                continue
+            try:
+                listener.autocommit = True
+                listener.cursor().execute(f"LISTEN {CHANNEL}")
+                # changes may have been missed while not listening
+                asyncio.run_coroutine_threadsafe(self._check_states(), self._loop)
+                while not stopped.is_set():
+                    if select.select([listener], [], [], 1.0) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        changes = json.loads(listener.notifies.pop(0).payload)
+                        self._loop.call_soon_threadsafe(self.publish, changes)
+            except Exception:
+                logger.warning("Lost the KYC state changes listener", exc_info=True)
+                stopped.wait(settings.KYC_EVENTS_POLL_INTERVAL)
+            finally:
+                listener.close()
+
+
+_broadcasters = {}
+
+
+def get_broadcaster():
+    """The broadcaster of the running event loop."""
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = KYCBroadcaster(loop)
+    return broadcaster
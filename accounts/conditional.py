@@ -0,0 +1,57 @@
+from functools import wraps
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from rest_framework_simplejwt.models import TokenUser
+
+from .authentication import KYC_VERSION_CLAIM
+
+
+def user_etag(user, resource, renderer_format):
+    """
+    Strong ETag of a representation that only depends on the requesting user.
+
+    Every change to a user bumps its version, so the ETag is built from the
+    user id and version without loading anything: the version comes from the
+    cached user, or from the token claim that KYCTokenAuthentication checked.
+    """
+    if isinstance(user, TokenUser):
+        version = user.token[KYC_VERSION_CLAIM]
+    else:
+        version = user.version
+    return f'"{resource}-{user.pk}-{version}-{renderer_format}"'
+
+
+def add_cache_headers(response, etag, max_age):
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, max_age=max_age)
+        patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+def conditional_user_response(resource, max_age):
+    """
+    Decorator for GET handlers of per-user resources.
+
+    Answers a matching If-None-Match with 304 Not Modified before the handler
+    runs, and adds the ETag and a private Cache-Control max-age to the responses.
+    `resource` can be a callable returning the resource name.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            name = resource() if callable(resource) else resource
+            etag = user_etag(request.user, name, request.accepted_renderer.format)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            return add_cache_headers(response, etag, max_age)
+
+        return wrapper
+
+    return decorator
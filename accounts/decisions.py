@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, F, TextField, Value, When
+from django.utils import timezone
+
+from . import review_queue
+from .models import KYCState, ReviewClaim
+from .notifications import kyc_decision_message, queue_messages
+from .signals import kyc_state_changed
+
+User = get_user_model()
+
+APPROVE = "approve"
+REJECT = "reject"
+
+
+def apply_decisions(decisions, reviewer):
+    """
+    Apply many approve/reject decisions with set-based updates in one transaction.
+
+    Approvals become a single UPDATE ... WHERE id IN (...), rejections a single
+    UPDATE with a CASE expression carrying each user's reason. Both bump the
+    version. The users are locked first, so the updates match exactly the
+    decisions reported; like the single-user transitions, they apply from any
+    KYC state. Notification emails for the whole batch are queued to be sent
+    after commit.
+
+    Args:
+        decisions (list[dict]): Items with "id", "decision" and, for rejections, "reason".
+        reviewer (User): The admin applying the decisions; users under another
+            reviewer's active claim are skipped.
+
+    Returns:
+        list[dict]: One {"id", "status"} item per decision, in input order, with
+        status "approved", "rejected", "not_found" or "claimed".
+    """
+    ids = [decision["id"] for decision in decisions]
+
+    with transaction.atomic():
+        now = timezone.now()
+        emails, states = {}, {}
+        for pk, email, state in (
+            User.objects.filter(pk__in=ids)
+            .select_for_update()
+            .values_list("pk", "email", "kyc_state")
+        ):
+            emails[pk], states[pk] = email, state
+        claimed = set(
+            ReviewClaim.objects.filter(user_id__in=ids, expires_at__gt=now)
+            .exclude(reviewer=reviewer)
+            .values_list("user_id", flat=True)
+        )
+
+        results, approvals, rejections = [], [], {}
+        for decision in decisions:
+            pk = decision["id"]
+            if pk not in emails:
+                results.append({"id": pk, "status": "not_found"})
+            elif pk in claimed:
+                results.append({"id": pk, "status": "claimed"})
+            elif decision["decision"] == APPROVE:
+                approvals.append(pk)
+                results.append({"id": pk, "status": "approved"})
+            else:
+                rejections[pk] = decision["reason"]
+                results.append({"id": pk, "status": "rejected"})
+
+        if approvals:
+            User.objects.filter(pk__in=approvals).update(
+                kyc_state=KYCState.VERIFIED,
+                is_kyc_verified=True,
+                kyc_rejection_reason="",
+                kyc_updated_at=now,
+                version=F("version") + 1,
+            )
+        if rejections:
+            User.objects.filter(pk__in=rejections).update(
+                kyc_state=KYCState.REJECTED,
+                is_kyc_verified=False,
+                kyc_updated_at=now,
+                version=F("version") + 1,
+                kyc_rejection_reason=Case(
+                    *[
+                        When(pk=pk, then=Value(reason))
+                        for pk, reason in rejections.items()
+                    ],
+                    output_field=TextField(),
+                ),
+            )
+
+        changes = [(pk, states[pk], KYCState.VERIFIED) for pk in approvals] + [
+            (pk, states[pk], KYCState.REJECTED) for pk in rejections
+        ]
+        if changes:
+            kyc_state_changed.send(sender=User, changes=changes)
+
+        review_queue.finish(approvals + list(rejections))
+        queue_messages(
+            [kyc_decision_message(emails[pk], True) for pk in approvals if emails[pk]]
+            + [
+                kyc_decision_message(emails[pk], False, reason)
+                for pk, reason in rejections.items()
+                if emails[pk]
+            ]
+        )
+
+    return results
@@ -0,0 +1,205 @@
+"""
+Idempotency-Key support for the POST endpoints that create things.
+
+A client that retries a request with the same Idempotency-Key header gets the
+stored response of the first request instead of running it again. A retry
+that arrives while the first request is still running gets a 409 with a
+Retry-After header rather than holding a worker until it finishes. Keys are
+scoped to the user; anonymous clients must send UUIDs, which are scoped to
+their address, so that unrelated clients never share a key. Stored responses
+expire after IDEMPOTENCY_KEY_TTL seconds. The key of a request in flight is
+only leased for IDEMPOTENCY_IN_FLIGHT_SECONDS, so that the key of a worker
+that died mid-request can be claimed again.
+
+Only responses the client can act on are stored: exceptions and 5xx responses
+release the key so that the retry runs the request again.
+"""
+
+import hashlib
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# states of a key, see claim
+NEW = "new"
+COMPLETED = "completed"
+IN_FLIGHT = "in_flight"
+MISMATCH = "mismatch"
+
+KEY_TOO_LONG_MESSAGE = (
+    f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters."
+)
+ANONYMOUS_KEY_MESSAGE = f"{IDEMPOTENCY_HEADER} must be a UUID without authentication."
+MISMATCH_MESSAGE = (
+    f"This {IDEMPOTENCY_HEADER} was already used for a different request."
+)
+IN_FLIGHT_MESSAGE = (
+    f"A request with this {IDEMPOTENCY_HEADER} is still being processed, retry later."
+)
+
+
+def request_fingerprint(method, path, data):
+    """
+    Hash of a request, a key may only be replayed for the same request.
+
+    Uploaded files are hashed by content, so re-sending the same document
+    under the same key matches.
+    """
+    digest = hashlib.sha256(f"{method} {path}".encode())
+    items = data.lists() if hasattr(data, "lists") else data.items()
+    for name, values in sorted(items, key=lambda item: item[0]):
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            digest.update(b"\0" + name.encode() + b"=")
+            if isinstance(value, UploadedFile):
+                for chunk in value.chunks():
+                    digest.update(chunk)
+                value.seek(0)
+            else:
+                digest.update(str(value).encode())
+    return digest.hexdigest()
+
+
+def check_key(key, user):
+    """The error message of an invalid key, or None."""
+    if len(key) > MAX_KEY_LENGTH:
+        return KEY_TOO_LONG_MESSAGE
+    if not user.is_authenticated:
+        try:
+            uuid.UUID(key)
+        except ValueError:
+            return ANONYMOUS_KEY_MESSAGE
+    return None
+
+
+def scope_for(request, user):
+    if user.is_authenticated:
+        return f"user:{user.pk}"
+    # the client address, as the throttles see it
+    return f"anon:{BaseThrottle().get_ident(request)}"
+
+
+def claim(scope, key, fingerprint):
+    """
+    Claim an idempotency key for a request.
+
+    Returns:
+        tuple: The state of the key and its record. NEW means the request owns
+        the key and must complete or release it, COMPLETED that the record
+        holds the response to replay, IN_FLIGHT that another request holds the
+        key and MISMATCH that the key was used for another request.
+    """
+    now = timezone.now()
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    scope=scope,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now
+                    + timedelta(seconds=settings.IDEMPOTENCY_IN_FLIGHT_SECONDS),
+                )
+            return NEW, record
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.filter(scope=scope, key=key).first()
+        if record is None:
+            # released in the meantime
+            continue
+        if record.expires_at <= now:
+            # unless it was completed in the meantime
+            IdempotencyRecord.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+            continue
+        if record.fingerprint != fingerprint:
+            return MISMATCH, record
+        if record.status_code is None:
+            return IN_FLIGHT, record
+        return COMPLETED, record
+
+
+def complete(record, status_code, data):
+    """Store the response of the request that owns the key, for the full TTL."""
+    if status_code >= 500:
+        release(record)
+        return
+    IdempotencyRecord.objects.filter(pk=record.pk).update(
+        status_code=status_code,
+        response=data,
+        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+
+
+def release(record):
+    """Give the key back, the next request with it runs again."""
+    IdempotencyRecord.objects.filter(pk=record.pk).delete()
+
+
+def rejection(state, record):
+    """
+    The response to a request that may not run.
+
+    Returns:
+        tuple: The status code, the data and the response headers.
+    """
+    if state == COMPLETED:
+        return record.status_code, record.response, {REPLAYED_HEADER: "true"}
+    if state == MISMATCH:
+        return status.HTTP_422_UNPROCESSABLE_ENTITY, {"error": MISMATCH_MESSAGE}, {}
+    return (
+        status.HTTP_409_CONFLICT,
+        {"error": IN_FLIGHT_MESSAGE},
+        {"Retry-After": str(settings.IDEMPOTENCY_RETRY_AFTER_SECONDS)},
+    )
+
+
+def idempotent(method):
+    """
+    Decorator for APIView POST handlers honoring the Idempotency-Key header.
+
+    Requests without the header are handled as usual.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return method(self, request, *args, **kwargs)
+        error = check_key(key, request.user)
+        if error is not None:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        state, record = claim(
+            scope_for(request, request.user),
+            key,
+            request_fingerprint(request.method, request.path, request.data),
+        )
+        if state != NEW:
+            status_code, data, headers = rejection(state, record)
+            return Response(data, status=status_code, headers=headers)
+
+        try:
+            response = method(self, request, *args, **kwargs)
+        except BaseException:
+            release(record)
+            raise
+        complete(record, response.status_code, response.data)
+        return response
+
+    return wrapper
@@ -0,0 +1,217 @@
+"""
+Bulk user imports, see the import_users command.
+
+Rows are streamed from CSV or NDJSON and handled in chunks: validated,
+stripped of users that already exist, their passwords hashed in a process
+pool (hashing dominates the cost of creating a user) and inserted with one
+bulk INSERT per chunk. The passwords of the next chunk are hashed while the
+current one is inserted.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+import orjson
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import stats
+from .models import KYCDailyCount, KYCState
+from .serializers import UserImportSerializer
+
+User = get_user_model()
+
+IMPORT_FORMATS = ("csv", "ndjson")
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def read_rows(source, import_format):
+    """
+    Iterate over the rows of an import file as (line, dict) pairs.
+
+    Lines of NDJSON input that can't be decoded are returned as None.
+    """
+    if import_format == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, text in enumerate(source, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            row = None
+        yield line, row if isinstance(row, dict) else None
+
+
+def _setup_worker():
+    # spawned workers (macOS, Windows) start without the settings
+    django.setup()
+
+
+def _hash_passwords(passwords):
+    return [make_password(password or None) for password in passwords]
+
+
+class UserImporter:
+    """
+    Imports users chunk by chunk.
+
+    Args:
+        workers (int): Processes hashing the passwords.
+        rejects (file): Receives the invalid rows as NDJSON, optional.
+    """
+
+    def __init__(self, workers=None, rejects=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.rejects = rejects
+        self.counts = Counter()
+        # phone numbers and emails of the chunk hashed but not inserted yet
+        self._pending = set()
+
+    def run(self, rows, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None):
+        """
+        Import (line, row) pairs.
+
+        Args:
+            rows (Iterable[tuple]): See read_rows.
+            chunk_size (int): Rows validated, hashed and inserted together.
+            on_chunk (callable): Called with the last line of each inserted
+                chunk once it is committed, for checkpoints and progress.
+        """
+        rows = iter(rows)
+        pending = None
+        with ProcessPoolExecutor(self.workers, initializer=_setup_worker) as pool:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if chunk:
+                    users = self._prepare(chunk)
+                    hashing = self._hash(pool, users)
+                    keys = {data["phone_number"] for data in users}
+                    keys.update(data["email_id"] for data in users if data["email_id"])
+                    current = (chunk[-1][0], users, hashing)
+                else:
+                    current = None
+                # insert the previous chunk while this one is hashed
+                if pending is not None:
+                    self._insert(*pending, on_chunk)
+                if current is None:
+                    break
+                pending, self._pending = current, keys
+
+    def _prepare(self, chunk):
+        """Validate the rows and drop the users that already exist."""
+        users = {}
+        for line, row in chunk:
+            self.counts["rows"] += 1
+            serializer = None if row is None else UserImportSerializer(data=row)
+            if serializer is None or not serializer.is_valid():
+                self.counts["invalid"] += 1
+                self._reject(line, row, serializer)
+                continue
+            data = serializer.validated_data
+            if data["phone_number"] in users or data["phone_number"] in self._pending:
+                self.counts["duplicate"] += 1
+                continue
+            users[data["phone_number"]] = data
+
+        for phone_number in self._existing(users):
+            users.pop(phone_number)
+            self.counts["existing"] += 1
+
+        # email_id is unique as well
+        emails = set(self._pending)
+        for phone_number, data in list(users.items()):
+            if data["email_id"] in emails:
+                users.pop(phone_number)
+                self.counts["duplicate"] += 1
+            elif data["email_id"]:
+                emails.add(data["email_id"])
+        return list(users.values())
+
+    def _existing(self, users):
+        """Phone numbers of the rows whose phone number or email_id is taken."""
+        existing = set(
+            User.objects.filter(phone_number__in=list(users)).values_list(
+                "phone_number", flat=True
+            )
+        )
+        emails = {data["email_id"] for data in users.values() if data["email_id"]}
+        if emails:
+            taken = set(
+                User.objects.filter(email_id__in=emails).values_list(
+                    "email_id", flat=True
+                )
+            )
+            existing.update(
+                phone_number
+                for phone_number, data in users.items()
+                if data["email_id"] in taken
+            )
+        return existing
+
+    def _hash(self, pool, users):
+        passwords = [data["password"] for data in users]
+        size = max(1, -(-len(passwords) // self.workers))
+        return [
+            pool.submit(_hash_passwords, passwords[start : start + size])
+            for start in range(0, len(passwords), size)
+        ]
+
+    def _insert(self, last_line, users, hashing, on_chunk):
+        passwords = [password for future in hashing for password in future.result()]
+        now = timezone.now()
+        objs = [
+            User(
+                phone_number=data["phone_number"],
+                full_name=data["full_name"],
+                email=data["email"],
+                email_id=data["email_id"],
+                password=password,
+                is_active=True,
+                date_joined=now,
+            )
+            for data, password in zip(users, passwords)
+        ]
+        with transaction.atomic():
+            # users created since _prepare are skipped by the database
+            User.objects.bulk_create(objs, ignore_conflicts=True)
+            inserted = self._inserted(objs)
+            # bulk_create sends no post_save, keep the KYC statistics in step
+            stats.record(
+                [(KYCState.PENDING, inserted)], [KYCDailyCount.SIGNUP] * inserted
+            )
+        self.counts["inserted"] += inserted
+        self.counts["existing"] += len(objs) - inserted
+        if on_chunk is not None:
+            on_chunk(last_line)
+
+    def _inserted(self, objs):
+        """How many of `objs` bulk_create inserted rather than skipped."""
+        # the password hashes are salted, a user with the phone number and the
+        # hash is one of ours and not a conflicting user
+        passwords = {obj.phone_number: obj.password for obj in objs}
+        stored = User.objects.filter(phone_number__in=list(passwords)).values_list(
+            "phone_number", "password"
+        )
+        return sum(
+            passwords[phone_number] == password for phone_number, password in stored
+        )
+
+    def _reject(self, line, row, serializer):
+        if self.rejects is None:
+            return
+        errors = serializer.errors if serializer is not None else "Not a JSON object."
+        self.rejects.write(
+            json.dumps({"line": line, "row": row, "errors": errors}, default=str) + "\n"
+        )
@@ -0,0 +1,175 @@
+"""
+The KYC attempt ledger.
+
+Verifications hand their KYCAttempt rows to a per-process background thread,
+which writes them with one multi-row INSERT per batch, so the request never
+waits for the ledger. Rows still queued when the process is killed are lost;
+the ledger is for analysis, not for the KYC decisions themselves.
+
+On PostgreSQL the table is partitioned by month: the manage_kyc_attempts
+command creates the partitions ahead of time and drops those past
+KYC_ATTEMPT_RETENTION_MONTHS. Rows of a month without a partition go to the
+DEFAULT partition, and are moved to their own one when it is created.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+from datetime import date
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import KYCAttempt
+
+logger = logging.getLogger(__name__)
+
+TABLE = KYCAttempt._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+class AttemptWriter:
+    """Batches KYCAttempt rows and inserts them from a background thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=settings.KYC_ATTEMPT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        # queue overflows and failed inserts; failed counts only the latter
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, **fields):
+        """Queue an attempt, it is dropped if the writer fell too far behind."""
+        self._start()
+        try:
+            self._queue.put_nowait(KYCAttempt(**fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Write the queued attempts from the calling thread."""
+        self._write(self._drain([]))
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="kyc-attempt-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _drain(self, batch):
+        while len(batch) < settings.KYC_ATTEMPT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=settings.KYC_ATTEMPT_FLUSH_SECONDS)
+            except queue.Empty:
+                continue
+            self._write(self._drain([first]))
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            KYCAttempt.objects.using(DEFAULT_DB_ALIAS).bulk_create(batch)
+            self.written += len(batch)
+        except Exception:
+            logger.exception("Lost %s KYC attempts", len(batch))
+            self.dropped += len(batch)
+            self.failed += len(batch)
+            # reconnect on the next batch
+            connections[DEFAULT_DB_ALIAS].close()
+
+
+attempt_writer = AttemptWriter()
+
+
+def month_start(day, months=0):
+    """First day of the month `months` after the one of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def partitions(connection):
+    """The monthly partitions of the ledger, {first day of the month: table}."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [TABLE],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    months = {}
+    for name in names:
+        year, _, month = name[len(TABLE) + 1 :].partition("_")
+        if year.isdigit() and month.isdigit():
+            months[date(int(year), int(month), 1)] = name
+    return months
+
+
+def default_months(connection):
+    """The months that have rows in the DEFAULT partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', created_at)::date "
+            f"FROM {connection.ops.quote_name(DEFAULT_PARTITION)}"
+        )
+        return sorted(month for (month,) in cursor.fetchall())
+
+
+def create_partition(connection, month):
+    """
+    Create the partition of `month`, with the rows the DEFAULT partition
+    holds for it.
+
+    A partition can't be created over the rows of the DEFAULT partition, so
+    it is filled as a plain table and attached afterwards, in one transaction.
+    """
+    quote = connection.ops.quote_name
+    name, default = quote(partition_name(month)), quote(DEFAULT_PARTITION)
+    start, end = month.isoformat(), month_start(month, 1).isoformat()
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} "
+            "WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+
+def drop_partition(connection, month):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {quote(partition_name(month))}")
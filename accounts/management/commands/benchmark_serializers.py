@@ -0,0 +1,80 @@
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from accounts.media import ContentAddressedStorage
+from accounts.renderers import ORJSONRenderer
+from accounts.serializers import UserProfileReadSerializer, UserProfileSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark of the user list serialization: UserProfileSerializer + "
+        "JSONRenderer against UserProfileReadSerializer + ORJSONRenderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        users = [self._user(i) for i in range(1, rows + 1)]
+        read_serializer = UserProfileReadSerializer()
+        tuples = [
+            tuple(
+                getattr(user, name).name
+                if name in read_serializer.file_fields
+                else getattr(user, name)
+                for name in read_serializer.fields
+            )
+            for user in users
+        ]
+
+        def before():
+            data = UserProfileSerializer(users, many=True).data
+            return JSONRenderer().render(data)
+
+        def after():
+            data = read_serializer.serialize_rows(tuples)
+            return ORJSONRenderer().render(data)
+
+        if before() != after():
+            raise CommandError("Fast path output differs from UserProfileSerializer.")
+
+        for label, func in (("before", before), ("after", after)):
+            best = min(self._time(func) for _ in range(options["repeat"]))
+            self.stdout.write(
+                f"{label:>6}: {rows / best:>12,.0f} rows/s ({best * 1000:.1f} ms for {rows} rows)"
+            )
+
+    def _time(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    def _user(self, i):
+        return User(
+            id=i,
+            full_name=f"User {i}",
+            phone_number=f"+233{i:09d}",
+            email=f"user{i}@example.com",
+            is_kyc_verified=bool(i % 2),
+            kyc_rejection_reason="" if i % 3 else "Blurry document",
+            profile_photo=(
+                self._stored_name("profile_photos", i, ".jpg") if i % 2 else ""
+            ),
+            document=self._stored_name("documents", i, ".pdf"),
+        )
+
+    def _stored_name(self, directory, i, extension):
+        # names given by ContentAddressedStorage
+        digest = hashlib.sha256(f"{directory}{i}".encode()).hexdigest()
+        return ContentAddressedStorage.content_name(
+            f"{directory}/file{extension}", digest
+        )
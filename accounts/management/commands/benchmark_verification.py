@@ -0,0 +1,116 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from accounts import utils, verification
+
+
+class FakeProvider:
+    """Stands in for the Textract and Rekognition clients, with a fixed latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def analyze_document(self, **kwargs):
+        time.sleep(self.latency)
+        return {"Blocks": [{"BlockType": "WORD", "Text": "JOHN"}]}
+
+    def detect_faces(self, **kwargs):
+        time.sleep(self.latency)
+        return {
+            "FaceDetails": [
+                {"BoundingBox": {"Left": 0.1, "Top": 0.1, "Width": 0.5, "Height": 0.5}}
+            ]
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the verifications a single process keeps in flight when they "
+        "run in WSGI worker threads and in the ASGI event loop. The AWS calls "
+        "are simulated with a fixed latency; nothing is written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Worker threads of the WSGI process (e.g. gunicorn --threads).",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.5,
+            help="Seconds taken by each simulated AWS call.",
+        )
+
+    def handle(self, *args, **options):
+        provider = FakeProvider(options["latency"])
+        utils.textract_client = provider
+        utils.rekognition_client = provider
+
+        image = io.BytesIO()
+        Image.new("RGB", (64, 64), "white").save(image, format="PNG")
+        content = image.getvalue()
+
+        self.inflight = self.peak = 0
+        self.lock = threading.Lock()
+        requests = options["requests"]
+
+        def wsgi():
+            with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                list(pool.map(lambda _: self._verify(content), range(requests)))
+
+        def asgi():
+            async def run():
+                await asyncio.gather(*(self._averify(content) for _ in range(requests)))
+
+            asyncio.run(run())
+
+        self.stdout.write(
+            f"{requests} verifications, {options['latency']}s per AWS call, "
+            f"KYC_PROVIDER_MAX_CONCURRENCY={settings.KYC_PROVIDER_MAX_CONCURRENCY}"
+        )
+        for label, func in (
+            (f"WSGI ({options['threads']} threads)", wsgi),
+            ("ASGI", asgi),
+        ):
+            self.inflight = self.peak = 0
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{label:>20}: {self.peak:>5} in flight at peak, "
+                f"{requests / elapsed:>8.1f} verifications/s ({elapsed:.2f}s)"
+            )
+
+    def _enter(self):
+        with self.lock:
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+
+    def _leave(self):
+        with self.lock:
+            self.inflight -= 1
+
+    def _verify(self, content):
+        self._enter()
+        try:
+            verification.analyze_document(content)
+        finally:
+            self._leave()
+
+    async def _averify(self, content):
+        self._enter()
+        try:
+            await verification.aanalyze_document(content)
+        finally:
+            self._leave()
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.outbox import Dispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the emails queued in the outbox over pooled mail connections, "
+        "retrying failures with backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once the outbox is drained."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no email is due.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--connections",
+            type=int,
+            default=None,
+            help=f"Mail connections, defaults to {settings.OUTBOX_CONNECTIONS}.",
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(connections=options["connections"])
+        total_sent = total_failed = 0
+        try:
+            while True:
+                # the dispatcher outlives CONN_MAX_AGE
+                close_old_connections()
+                sent, failed = dispatcher.dispatch(options["batch_size"])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stderr.write(f"Sent {sent} emails, {failed} failed.")
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.close()
+        self.stdout.write(f"Sent {total_sent} emails, {total_failed} failed.")
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts.webhooks import Dispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver the queued KYC state changes to the webhook subscriptions, in "
+        "signed batches, retrying failures with backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once no event is due."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no event is due.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=None, help="Deliveries in flight."
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(concurrency=options["concurrency"])
+        try:
+            while True:
+                # the dispatcher outlives CONN_MAX_AGE
+                close_old_connections()
+                if dispatcher.dispatch():
+                    self.stderr.write(self._format(dispatcher.stats()))
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.close()
+        self.stdout.write(self._format(dispatcher.stats()))
+
+    def _format(self, stats):
+        latency = stats["average_latency_ms"]
+        return (
+            f"Delivered {stats.get('events', 0)} events in "
+            f"{stats.get('batches', 0)} batches, {stats.get('failures', 0)} failed "
+            f"deliveries, {stats.get('dead', 0)} dead letters"
+            + (f", {latency} ms per request." if latency is not None else ".")
+        )
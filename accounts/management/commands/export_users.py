@@ -0,0 +1,61 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from project.routers import routing_context
+
+from accounts.exports import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream all users and their KYC outcome to a file (or stdout) as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            dest="export_format",
+            choices=sorted(EXPORT_FORMATS),
+            default="ndjson",
+        )
+        parser.add_argument(
+            "--gzip", action="store_true", help="Gzip the output on the fly."
+        )
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=None,
+            help="Resume after this user id (the last id of a previous export).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--output", default="-", help="Destination file, '-' for stdout."
+        )
+
+    def handle(self, *args, **options):
+        # the export is read-only and long running, keep it off the primary
+        with routing_context():
+            self._export(options)
+
+    def _export(self, options):
+        chunks = stream_export(
+            options["export_format"],
+            after_id=options["after"],
+            gzip=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if options["output"] == "-":
+            self._write(chunks, sys.stdout.buffer)
+        else:
+            with open(options["output"], "wb") as destination:
+                self._write(chunks, destination)
+            self.stderr.write(f"Export written to {options['output']}")
+
+    def _write(self, chunks, destination):
+        for chunk in chunks:
+            destination.write(chunk)
+        destination.flush()
@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from accounts.media import ContentAddressedStorage, referenced_names, stored_names
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the media files no row references anymore. The stored files and "
+        "the referenced names are both streamed in sorted order and merged, so "
+        "memory use does not grow with the number of files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=86400,
+            help=(
+                "Seconds since a file was written before it can be deleted, "
+                "protecting the uploads whose row is not committed yet."
+            ),
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        location = default_storage.location
+        if not os.path.isdir(location):
+            self.stdout.write("No media files.")
+            return
+        cutoff = time.time() - options["min_age"]
+        references = referenced_names()
+        reference = next(references, None)
+        counts = {"files": 0, "referenced": 0, "recent": 0, "deleted": 0}
+        freed = 0
+
+        for name, entry in stored_names(location):
+            counts["files"] += 1
+            while reference is not None and reference < name:
+                reference = next(references, None)
+            if reference == name:
+                counts["referenced"] += 1
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                counts["recent"] += 1
+                continue
+            counts["deleted"] += 1
+            freed += stat.st_size
+            if not options["dry_run"]:
+                os.unlink(entry.path)
+
+        self._clean_incoming(location, cutoff, options["dry_run"])
+        self.stdout.write(
+            f"{'Would delete' if options['dry_run'] else 'Deleted'} "
+            f"{counts['deleted']} of {counts['files']} files "
+            f"({freed / 1024 / 1024:.1f} MiB): {counts['referenced']} referenced, "
+            f"{counts['recent']} too recent."
+        )
+
+    def _clean_incoming(self, location, cutoff, dry_run):
+        """Remove the temporary files of uploads that crashed."""
+        incoming = os.path.join(location, ContentAddressedStorage.INCOMING_DIR)
+        if not os.path.isdir(incoming) or dry_run:
+            return
+        with os.scandir(incoming) as scan:
+            for entry in scan:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.imports import (
+    DEFAULT_CHUNK_SIZE,
+    IMPORT_FORMATS,
+    UserImporter,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a CSV or NDJSON file with the columns "
+        "phone_number, full_name, email, email_id and password. Rows whose phone "
+        "number or email_id already exists are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="File to import, '-' for stdin.")
+        parser.add_argument(
+            "--format",
+            dest="import_format",
+            choices=IMPORT_FORMATS,
+            help="Defaults to the file extension.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Password hashing processes."
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "File recording the last imported line. An existing checkpoint "
+                "resumes the import after that line."
+            ),
+        )
+        parser.add_argument(
+            "--rejects", help="Write the invalid rows and their errors to this file."
+        )
+
+    def handle(self, *args, **options):
+        import_format = options["import_format"] or self._guess_format(options["input"])
+        checkpoint = options["checkpoint"]
+        after = self._load_checkpoint(checkpoint, options["input"])
+
+        source = (
+            sys.stdin
+            if options["input"] == "-"
+            else open(options["input"], newline="", encoding="utf-8")
+        )
+        rejects = open(options["rejects"], "a") if options["rejects"] else None
+        importer = UserImporter(workers=options["workers"], rejects=rejects)
+        started = time.monotonic()
+
+        def on_chunk(line):
+            if checkpoint:
+                self._save_checkpoint(checkpoint, options["input"], line)
+            self._report(importer.counts, started)
+
+        rows = (
+            (line, row)
+            for line, row in read_rows(source, import_format)
+            if line > after
+        )
+        try:
+            importer.run(rows, chunk_size=options["chunk_size"], on_chunk=on_chunk)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if rejects is not None:
+                rejects.close()
+
+        counts = importer.counts
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"Imported {counts['inserted']} users from {counts['rows']} rows in "
+            f"{elapsed:.1f}s ({counts['rows'] / max(elapsed, 1e-9):,.0f} rows/s): "
+            f"{counts['existing']} existing, {counts['duplicate']} duplicates, "
+            f"{counts['invalid']} invalid."
+        )
+
+    def _guess_format(self, path):
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        if extension in ("json", "jsonl"):
+            extension = "ndjson"
+        if extension not in IMPORT_FORMATS:
+            raise CommandError("Pass --format, it can't be told from the file name.")
+        return extension
+
+    def _load_checkpoint(self, path, source):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            state = json.load(checkpoint)
+        if state["input"] != os.path.abspath(source):
+            raise CommandError(f"{path} is the checkpoint of {state['input']}.")
+        self.stderr.write(f"Resuming after line {state['line']}.")
+        return state["line"]
+
+    def _save_checkpoint(self, path, source, line):
+        # replaced atomically, a crash leaves the previous checkpoint
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as checkpoint:
+            json.dump({"input": os.path.abspath(source), "line": line}, checkpoint)
+        os.replace(temporary, path)
+
+    def _report(self, counts, started):
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f"{counts['rows']} rows read: {counts['inserted']} inserted, "
+            f"{counts['existing']} existing, {counts['duplicate']} duplicates, "
+            f"{counts['invalid']} invalid, {counts['rows'] / max(elapsed, 1e-9):,.0f} rows/s"
+        )
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from accounts.ledger import (
+    create_partition,
+    default_months,
+    drop_partition,
+    month_start,
+    partitions,
+)
+from accounts.models import KYCAttempt
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintain the KYC attempt ledger: create the monthly partitions ahead of "
+        "time and drop the partitions older than the retention. Run it daily. "
+        "Rows that went to the DEFAULT partition (e.g. while it didn't run) are "
+        "moved to the partition of their month. "
+        "On databases without partitioning the old rows are deleted in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Partitions created after the current month.",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            default=settings.KYC_ATTEMPT_RETENTION_MONTHS,
+            help="Months kept before the current one.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        current = month_start(timezone.now().date())
+        oldest = month_start(current, -options["retention_months"])
+
+        if connection.vendor != "postgresql":
+            self._delete_before(oldest, options["batch_size"])
+            return
+
+        existing = partitions(connection)
+        months = {
+            month_start(current, offset)
+            for offset in range(options["months_ahead"] + 1)
+        }
+        # older months only get a partition to be dropped with it below
+        months.update(default_months(connection))
+        for month in sorted(months - set(existing)):
+            create_partition(connection, month)
+            existing[month] = None
+            self.stdout.write(f"Created partition for {month:%Y-%m}.")
+        for month in sorted(existing):
+            if month < oldest:
+                drop_partition(connection, month)
+                self.stdout.write(f"Dropped partition for {month:%Y-%m}.")
+
+    def _delete_before(self, oldest, batch_size):
+        # a plain comparison on the indexed column; months are in UTC, like
+        # the partition bounds
+        old = KYCAttempt.objects.filter(
+            created_at__lt=datetime(
+                oldest.year, oldest.month, 1, tzinfo=dt_timezone.utc
+            )
+        )
+        deleted = 0
+        while True:
+            ids = list(old.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += KYCAttempt.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(f"Deleted {deleted} KYC attempts.")
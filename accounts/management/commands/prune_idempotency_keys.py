@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Delete the stored Idempotency-Key responses whose TTL has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                IdempotencyRecord.objects.filter(expires_at__lte=now).values_list(
+                    "pk", flat=True
+                )[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyRecord.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys.")
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import ThrottleBucket
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the throttle buckets of clients idle for longer than --max-age "
+        "seconds. Their buckets are full again, which is what a missing bucket means. "
+        'Only needed with THROTTLE_STORE = "database", cached buckets expire.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=int, default=86400)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options["max_age"]
+        deleted = 0
+        while True:
+            keys = list(
+                ThrottleBucket.objects.filter(updated_at__lt=cutoff).values_list(
+                    "key", flat=True
+                )[: options["batch_size"]]
+            )
+            if not keys:
+                break
+            deleted += ThrottleBucket.objects.filter(
+                key__in=keys, updated_at__lt=cutoff
+            ).delete()[0]
+        self.stdout.write(f"Deleted {deleted} throttle buckets.")
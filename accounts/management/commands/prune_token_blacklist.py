@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted tokens in small batches, "
+        "each in its own short transaction, walking the expired tokens in "
+        "primary key order."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to pause between batches.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        last_id = 0
+        outstanding = blacklisted = 0
+
+        expired_tokens = OutstandingToken.objects.filter(expires_at__lte=now)
+        while True:
+            # refresh lifetimes may change, so expired rows can sit anywhere
+            # in the table; only the expired ones are read
+            expired = list(
+                expired_tokens.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not expired:
+                break
+            last_id = expired[-1]
+
+            blacklisted += BlacklistedToken.objects.filter(
+                token_id__in=expired
+            ).delete()[0]
+            outstanding += OutstandingToken.objects.filter(id__in=expired).delete()[0]
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(
+            f"Deleted {outstanding} outstanding and {blacklisted} blacklisted tokens."
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import UploadSession
+from accounts.uploads import delete_session
+
+
+class Command(BaseCommand):
+    help = "Delete the expired resumable uploads and their temporary files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            sessions = list(
+                UploadSession.objects.filter(expires_at__lte=now)[
+                    : options["batch_size"]
+                ]
+            )
+            if not sessions:
+                break
+            for session in sessions:
+                delete_session(session)
+            deleted += len(sessions)
+        self.stdout.write(f"Deleted {deleted} expired uploads.")
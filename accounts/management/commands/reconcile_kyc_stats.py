@@ -0,0 +1,68 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from accounts import stats
+from accounts.models import KYCStateCount
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the number of users per KYC state from the user table in a "
+        "single streaming pass, and correct the counters. The daily history is "
+        "left alone: deleted users and overturned decisions leave no trace in "
+        "the user table, so it can't be recomputed exactly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the differences with the current counters.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # the users and the counters are read from the same snapshot,
+                # without blocking the signups and transitions
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            states = self._count(options["chunk_size"])
+            current = self._current()
+
+        deltas = {
+            state: states[state] - current[state]
+            for state in set(states) | set(current)
+            if states[state] != current[state]
+        }
+        for state in sorted(deltas):
+            self.stdout.write(
+                f"{state}: counted {states[state]}, counters had {current[state]}"
+            )
+        if options["dry_run"]:
+            return
+
+        # changes committed since the snapshot are in the counters already,
+        # adding the difference is enough
+        stats.adjust(deltas)
+        self.stdout.write(f"Corrected {len(deltas)} state counters.")
+
+    def _count(self, chunk_size):
+        states = Counter()
+        users = User.objects.values_list("kyc_state", flat=True)
+        for state in users.iterator(chunk_size=chunk_size):
+            states[state] += 1
+        return states
+
+    def _current(self):
+        states = Counter()
+        for state, count in KYCStateCount.objects.values_list("state", "count"):
+            states[state] += count
+        return states
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from accounts.renditions import save_renditions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the renditions of the profile photos that have none, e.g. the "
+        "photos stored before renditions existed. With --all, every photo is "
+        "rendered again, after PROFILE_PHOTO_RENDITIONS or the qualities changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(profile_photo="").exclude(profile_photo=None)
+        if not options["all"]:
+            users = users.filter(profile_photo_renditions={})
+        last_pk, rendered, missing = 0, 0, 0
+        while True:
+            batch = list(
+                users.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "profile_photo")[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            for pk, name in batch:
+                try:
+                    with default_storage.open(name) as photo:
+                        renditions = save_renditions(photo.read())
+                except FileNotFoundError:
+                    missing += 1
+                    continue
+                # skipped if the photo changed meanwhile; the version bump
+                # invalidates the cached profiles
+                rendered += User.objects.filter(pk=pk, profile_photo=name).update(
+                    profile_photo_renditions=renditions, version=F("version") + 1
+                )
+        self.stdout.write(
+            f"Rendered {rendered} profile photos, {missing} missing files."
+        )
@@ -0,0 +1,72 @@
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import orjson
+from django.core.management.base import BaseCommand
+
+from accounts.webhooks import DELIVERY_HEADER, SIGNATURE_HEADER, verify_signature
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local HTTP endpoint receiving webhooks, for testing the "
+        "dispatch_webhooks command. Prints the events of each delivery."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--secret", help="Reject the deliveries not signed with this secret."
+        )
+        parser.add_argument(
+            "--fail-rate",
+            type=float,
+            default=0.0,
+            help="Share of the deliveries answered with a 503, to test retries.",
+        )
+
+    def handle(self, *args, **options):
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                signature = self.headers.get(SIGNATURE_HEADER, "")
+                if options["secret"] and not verify_signature(
+                    options["secret"], signature, body
+                ):
+                    command.stderr.write("Rejected a delivery with a bad signature.")
+                    return self._reply(401)
+                if random.random() < options["fail_rate"]:
+                    return self._reply(503)
+                data = orjson.loads(body)
+                command.stdout.write(
+                    f"Delivery {self.headers.get(DELIVERY_HEADER)}: "
+                    f"{len(data['events'])} events"
+                )
+                for event in data["events"]:
+                    command.stdout.write(
+                        f"  user {event['user_id']}: {event['previous_state']} -> "
+                        f"{event['state']} at {event['occurred_at']}"
+                    )
+                self._reply(204)
+
+            def _reply(self, code):
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), Handler)
+        self.stderr.write(
+            f"Receiving webhooks on http://{options['host']}:{options['port']}/"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
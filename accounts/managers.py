@@ -31,3 +31,12 @@ class CustomUserManager(BaseUserManager):
         if extra_fields.get("is_superuser") is not True:
             raise ValueError("Superuser must have is_superuser=True.")
         return self.create_user(phone_number, password, **extra_fields)
+
+    def pending_kyc(self):
+        """
+        Users waiting for a KYC review: in the pending state with an uploaded
+        document. Matches the user_pending_kyc_idx partial index.
+        """
+        return self.filter(kyc_state="pending", document__isnull=False).exclude(
+            document=""
+        )
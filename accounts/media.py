@@ -0,0 +1,359 @@
+"""
+Protected media files, the identity documents and profile photos.
+
+The default storage (ProtectedMediaStorage) gives every file a short-lived
+signed URL, MEDIA_URL<name>?expires=<unix time>&signature=<HMAC>, which is
+what the API returns. MediaView only checks the signature, or that the
+authenticated user owns the file or is an admin, and leaves the transfer to
+the front proxy with X-Accel-Redirect when MEDIA_ACCEL_REDIRECT_PREFIX is
+set, e.g. with nginx:
+
+    location /protected-media/ {
+        internal;
+        alias /srv/kyc/media/;
+    }
+
+Without a proxy (development) the view serves the file itself, answering
+Range and conditional requests.
+
+Files are stored by content (ContentAddressedStorage): an upload to
+documents/ is stored as documents/<h[0:2]>/<h[2:4]>/<h>.<extension>, h
+being its SHA-256. Identical uploads share one file, written once and
+atomically, and the two-level fan-out keeps directories small. As files
+are shared they are never deleted with a row; the gc_media command removes
+the files no row references anymore.
+"""
+
+import hashlib
+import heapq
+import hmac
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import time
+from urllib.parse import quote, urlencode
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection
+from django.db.models import FileField
+from django.db.models.functions import Collate
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date
+from rest_framework.negotiation import BaseContentNegotiation
+
+from . import renditions
+from .renditions import rendition_names
+
+SIGNATURE_SALT = "accounts.media"
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+CHUNK_SIZE = 64 * 1024
+
+
+def expiry(now=None):
+    """
+    Expiry of the URLs signed now.
+
+    Rounded to MEDIA_URL_TTL_SECONDS so that a file keeps the same URL, which
+    clients can cache, for a while. URLs are valid for one to two TTLs.
+    """
+    ttl = settings.MEDIA_URL_TTL_SECONDS
+    return (int(now if now is not None else time.time()) // ttl + 2) * ttl
+
+
+def signature(name, expires):
+    return salted_hmac(
+        SIGNATURE_SALT, f"{name}:{expires}", algorithm="sha256"
+    ).hexdigest()
+
+
+def signer(expires):
+    """
+    signature(name, expires) for many names, the HMAC key derived once.
+
+    Returns:
+        Callable[[str], str]: The signature of a name.
+    """
+    # the key salted_hmac derives from the salt and SECRET_KEY
+    key = hashlib.sha256((SIGNATURE_SALT + settings.SECRET_KEY).encode()).digest()
+    keyed = hmac.new(key, digestmod=hashlib.sha256)
+    suffix = f":{expires}".encode()
+
+    def sign(name):
+        mac = keyed.copy()
+        mac.update(name.encode() + suffix)
+        return mac.hexdigest()
+
+    return sign
+
+
+def check_signature(name, expires, given):
+    """Whether `given` is an unexpired signature of the file `name`."""
+    if not expires or not expires.isdigit() or int(expires) < time.time():
+        return False
+    return constant_time_compare(signature(name, int(expires)), given or "")
+
+
+def signed_resource(resource):
+    """
+    Name of a cached resource listing signed URLs, for its ETag.
+
+    Changes with the URLs so that a revalidation never keeps expired ones.
+    """
+    return f"{resource}-{expiry()}"
+
+
+class ProtectedMediaStorage(FileSystemStorage):
+    """A file system storage whose URLs are signed, see MediaView."""
+
+    def url(self, name):
+        expires = expiry()
+        query = urlencode({"expires": expires, "signature": signature(name, expires)})
+        return f"{super().url(name)}?{query}"
+
+    def url_builder(self, prefix=None):
+        """
+        url() for many files, the expiry and the signing key computed once.
+
+        Args:
+            prefix (str): The base URL, e.g. made absolute, instead of MEDIA_URL.
+        """
+        if not self.base_url.endswith("/"):
+            return self.url
+        prefix = prefix or self.base_url
+        expires = expiry()
+        sign = signer(expires)
+
+        def url(name):
+            path = filepath_to_uri(name).lstrip("/")
+            return f"{prefix}{path}?expires={expires}&signature={sign(name)}"
+
+        return url
+
+
+class ContentAddressedStorage(ProtectedMediaStorage):
+    """
+    Stores files under the SHA-256 of their content, see the module docstring.
+
+    The name given to save() only provides the directory and the extension.
+    """
+
+    # uploads in progress, ignored by gc_media
+    INCOMING_DIR = ".incoming"
+
+    def get_available_name(self, name, max_length=None):
+        # files are named by content, an existing file is the same file
+        return name
+
+    def _save(self, name, content):
+        incoming = os.path.join(self.location, self.INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+                file.flush()
+                os.fsync(file.fileno())
+            name = self.content_name(name, digest.hexdigest())
+            path = self.path(name)
+            if os.path.exists(path):
+                # deduplicated; refreshed so gc_media doesn't collect it before
+                # the row referencing it is committed
+                os.utime(path)
+                os.unlink(temporary)
+                return name
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            # atomic, readers never see a partial file
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        return name
+
+    @staticmethod
+    def content_name(name, sha256):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, sha256[:2], sha256[2:4], sha256 + extension)
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Files are served whatever the Accept header of the client (<img> tags)."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def can_access(request, name):
+    """
+    Whether the request may read the file `name`.
+
+    Either the URL is signed, or the user is an admin or owns the file.
+    """
+    params = request.query_params
+    if "signature" in params:
+        return check_signature(name, params.get("expires"), params["signature"])
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    return name in (
+        getattr(user, "document", None) and user.document.name,
+        getattr(user, "profile_photo", None) and user.profile_photo.name,
+        *rendition_names(getattr(user, "profile_photo_renditions", None)),
+    )
+
+
+def max_age(request):
+    """How long the response can be cached, at most until its URL expires."""
+    expires = request.query_params.get("expires", "")
+    if expires.isdigit():
+        return max(0, int(expires) - int(time.time()))
+    return settings.MEDIA_URL_TTL_SECONDS
+
+
+def serve(request, name):
+    """
+    Respond with the file `name` of the default storage.
+
+    Raises:
+        Http404: The file does not exist.
+    """
+    try:
+        # rejects the names outside MEDIA_ROOT
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        # the proxy answers Range and conditional requests itself
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(name)
+    else:
+        response = _serve_file(request, path, content_type)
+    patch_cache_control(response, private=True, max_age=max_age(request))
+    return response
+
+
+def _serve_file(request, path, content_type):
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found.")
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, stat.st_size, etag, content_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _file_response(request, path, size, etag, content_type):
+    match = RANGE_RE.fullmatch(request.headers.get("Range", "").strip())
+    if_range = request.headers.get("If-Range")
+    # multiple ranges, or an If-Range of another version, get the whole file
+    if not match or not any(match.groups()) or (if_range and if_range != etag):
+        return FileResponse(open(path, "rb"), content_type=content_type)
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start > end:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    response = StreamingHttpResponse(
+        _read_range(path, start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    return response
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_fields():
+    """The (model, field name) pairs of the file fields using the default storage."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField) and field.storage is default_storage
+    ]
+
+
+def referenced_names(chunk_size=10000):
+    """
+    The names of the files referenced by a row, sorted by code point.
+
+    One query per file field, sorted by the database with a binary collation
+    so that the order matches stored_names, and the profile photo renditions.
+    """
+    collation = "C" if connection.vendor == "postgresql" else "BINARY"
+    streams = [
+        model._default_manager.exclude(**{name: ""})
+        .filter(**{f"{name}__isnull": False})
+        .annotate(file_name=Collate(name, collation))
+        .order_by("file_name")
+        .values_list("file_name", flat=True)
+        .iterator(chunk_size=chunk_size)
+        for model, name in file_fields()
+    ]
+    return heapq.merge(*streams, renditions.referenced_names())
+
+
+def stored_names(location, directory=""):
+    """
+    The names of the files stored under `location`, sorted by code point.
+
+    Yields:
+        tuple: The name and its os.DirEntry.
+    """
+    with os.scandir(os.path.join(location, directory)) as scan:
+        # "a/..." sorts after "a.png", like full names do
+        entries = sorted(
+            scan, key=lambda entry: entry.name + "/" if entry.is_dir() else entry.name
+        )
+    for entry in entries:
+        name = posixpath.join(directory, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            if name != ContentAddressedStorage.INCOMING_DIR:
+                yield from stored_names(location, name)
+        else:
+            yield name, entry
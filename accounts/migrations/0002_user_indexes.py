@@ -0,0 +1,69 @@
+# Generated by Django 5.1.6 on 2026-10-19 09:51
+
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(fields=["is_kyc_verified"], name="user_kyc_verified_idx"),
+    models.Index(fields=["date_joined"], name="user_date_joined_idx"),
+    models.Index(fields=["full_name", "id"], name="user_full_name_idx"),
+    models.Index(
+        condition=models.Q(("document__isnull", False), ("is_kyc_verified", False))
+        & ~models.Q(("document", "")),
+        fields=["date_joined", "id"],
+        name="user_pending_kyc_idx",
+    ),
+]
+
+# Serves the admin's `full_name__icontains` search, which PostgreSQL compiles
+# to UPPER("full_name"::text) LIKE UPPER(%s).
+TRIGRAM_INDEX = "user_full_name_trgm_idx"
+
+
+def add_indexes(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    if schema_editor.connection.vendor != "postgresql":
+        for index in INDEXES:
+            schema_editor.add_index(User, index)
+        return
+
+    # build without blocking writes on large tables
+    for index in INDEXES:
+        schema_editor.add_index(User, index, concurrently=True)
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TRIGRAM_INDEX} "
+        f"ON {User._meta.db_table} USING gin (UPPER(full_name) gin_trgm_ops)"
+    )
+
+
+def remove_indexes(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    if schema_editor.connection.vendor != "postgresql":
+        for index in INDEXES:
+            schema_editor.remove_index(User, index)
+        return
+
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {TRIGRAM_INDEX}")
+    for index in INDEXES:
+        schema_editor.remove_index(User, index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_indexes, remove_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name="user", index=index)
+                for index in INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-19 09:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewClaim',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_claim', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('claimed_at', models.DateTimeField()),
+                ('heartbeat_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_claims', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
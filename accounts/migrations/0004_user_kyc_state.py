@@ -0,0 +1,106 @@
+# Generated by Django 5.1.6 on 2026-10-19 09:59
+
+from django.db import migrations, models
+
+# the pending queue index is rebuilt on kyc_state instead of is_kyc_verified
+OLD_PENDING_INDEX = models.Index(
+    condition=models.Q(("document__isnull", False), ("is_kyc_verified", False))
+    & ~models.Q(("document", "")),
+    fields=["date_joined", "id"],
+    name="user_pending_kyc_idx",
+)
+NEW_PENDING_INDEX = models.Index(
+    condition=models.Q(
+        ("document__isnull", False),
+        ("kyc_state", "pending"),
+        models.Q(("document", ""), _negated=True),
+    ),
+    fields=["date_joined", "id"],
+    name="user_pending_kyc_idx",
+)
+
+
+def set_kyc_state(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    User.objects.filter(is_kyc_verified=True).update(kyc_state="verified")
+    User.objects.filter(is_kyc_verified=False).exclude(kyc_rejection_reason="").update(
+        kyc_state="rejected"
+    )
+
+
+def _index_options(schema_editor):
+    # build and drop without blocking writes on large tables
+    if schema_editor.connection.vendor == "postgresql":
+        return {"concurrently": True}
+    return {}
+
+
+def add_index(index):
+    def operation(apps, schema_editor):
+        User = apps.get_model("accounts", "User")
+        schema_editor.add_index(User, index, **_index_options(schema_editor))
+
+    return operation
+
+
+def remove_index(index):
+    def operation(apps, schema_editor):
+        User = apps.get_model("accounts", "User")
+        schema_editor.remove_index(User, index, **_index_options(schema_editor))
+
+    return operation
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0003_reviewclaim"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    remove_index(OLD_PENDING_INDEX), add_index(OLD_PENDING_INDEX)
+                ),
+            ],
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name="user",
+                    name="user_pending_kyc_idx",
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="kyc_state",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("verified", "Verified"),
+                    ("rejected", "Rejected"),
+                ],
+                default="pending",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(set_kyc_state, migrations.RunPython.noop, atomic=True),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    add_index(NEW_PENDING_INDEX), remove_index(NEW_PENDING_INDEX)
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name="user", index=NEW_PENDING_INDEX),
+            ],
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:25
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_counters(apps, schema_editor):
+    # the states and the signups of the existing users, all in shard 0
+    User = apps.get_model("accounts", "User")
+    KYCStateCount = apps.get_model("accounts", "KYCStateCount")
+    KYCDailyCount = apps.get_model("accounts", "KYCDailyCount")
+    states, daily = Counter(), Counter()
+    users = User.objects.values_list("kyc_state", "date_joined").iterator(
+        chunk_size=2000
+    )
+    for state, date_joined in users:
+        states[state] += 1
+        daily[timezone.localdate(date_joined)] += 1
+    KYCStateCount.objects.bulk_create(
+        KYCStateCount(state=state, shard=0, count=count)
+        for state, count in states.items()
+    )
+    KYCDailyCount.objects.bulk_create(
+        (
+            KYCDailyCount(day=day, event="signup", shard=0, count=count)
+            for day, count in daily.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_idempotencyrecord"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="kyc_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="KYCDailyCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("event", models.CharField(max_length=16)),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "event", "shard"), name="unique_kyc_daily_shard"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="KYCStateCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("verified", "Verified"),
+                            ("rejected", "Rejected"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("state", "shard"), name="unique_kyc_state_shard"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# PostgreSQL: range partitioned by month, the partition key has to be part of
+# the primary key
+CREATE_PARTITIONED_TABLE = """
+CREATE TABLE accounts_kycattempt (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    user_id bigint NOT NULL,
+    document_sha256 varchar(64) NOT NULL,
+    match_score double precision NULL,
+    textract_ms double precision NULL,
+    rekognition_ms double precision NULL,
+    total_ms double precision NULL,
+    decision varchar(16) NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE INDEX kyc_attempt_user_idx ON accounts_kycattempt (user_id, created_at);
+CREATE INDEX kyc_attempt_created_idx ON accounts_kycattempt (created_at);
+-- catches the rows of months without a partition, e.g. if manage_kyc_attempts
+-- stopped running; the command moves them to their partition later
+CREATE TABLE accounts_kycattempt_default PARTITION OF accounts_kycattempt DEFAULT;
+"""
+
+
+def create_table(apps, schema_editor):
+    model = apps.get_model("accounts", "KYCAttempt")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(model)
+        return
+
+    schema_editor.execute(CREATE_PARTITIONED_TABLE)
+    # the current and next month, manage_kyc_attempts creates the following ones
+    today = timezone.now().date()
+    for offset in (0, 1):
+        index = today.year * 12 + today.month - 1 + offset
+        start = f"{index // 12}-{index % 12 + 1:02d}-01"
+        end = f"{(index + 1) // 12}-{(index + 1) % 12 + 1:02d}-01"
+        schema_editor.execute(
+            f"CREATE TABLE accounts_kycattempt_{start[:7].replace('-', '_')} "
+            f"PARTITION OF accounts_kycattempt FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+
+def drop_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model("accounts", "KYCAttempt"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_kyc_stats"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="KYCAttempt",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        ("document_sha256", models.CharField(max_length=64)),
+                        ("match_score", models.FloatField(null=True)),
+                        ("textract_ms", models.FloatField(null=True)),
+                        ("rekognition_ms", models.FloatField(null=True)),
+                        ("total_ms", models.FloatField(null=True)),
+                        ("decision", models.CharField(max_length=16)),
+                        (
+                            "created_at",
+                            models.DateTimeField(default=django.utils.timezone.now),
+                        ),
+                        (
+                            "user",
+                            models.ForeignKey(
+                                db_constraint=False,
+                                db_index=False,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                related_name="kyc_attempts",
+                                to=settings.AUTH_USER_MODEL,
+                            ),
+                        ),
+                    ],
+                    options={
+                        "indexes": [
+                            models.Index(
+                                fields=["user", "created_at"],
+                                name="kyc_attempt_user_idx",
+                            ),
+                            models.Index(
+                                fields=["created_at"], name="kyc_attempt_created_idx"
+                            ),
+                        ],
+                    },
+                ),
+            ],
+        ),
+        # creates the table of the model above
+        migrations.RunPython(create_table, drop_table),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0011_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="profile_photo_renditions",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,10 +1,28 @@
-from django.db import models
+import secrets
+import uuid
+
+from django.db import models, transaction
 
 # Create your models here.
 from django.contrib.auth.models import AbstractUser
 from .managers import CustomUserManager
+from .signals import kyc_state_changed
 from django.core.validators import FileExtensionValidator
-from django.db.models import Q, UniqueConstraint
+from django.db.models import F, Q, UniqueConstraint
+from django.conf import settings
+from django.utils import timezone
+
+
+class KYCState(models.TextChoices):
+    PENDING = "pending", "Pending"
+    VERIFIED = "verified", "Verified"
+    REJECTED = "rejected", "Rejected"
+
+
+# states each KYC transition may be applied from
+KYC_APPROVE_FROM = (KYCState.PENDING, KYCState.REJECTED, KYCState.VERIFIED)
+KYC_REJECT_FROM = (KYCState.PENDING, KYCState.VERIFIED, KYCState.REJECTED)
+KYC_VERIFY_FROM = (KYCState.PENDING, KYCState.REJECTED, KYCState.VERIFIED)
 
 
 # Create your models here.
@@ -30,6 +48,15 @@ class User(AbstractUser):
     profile_photo = models.ImageField(
         upload_to="profile_photos/", null=True, blank=True
     )
+    # resized copies of profile_photo, see accounts/renditions.py
+    profile_photo_renditions = models.JSONField(default=dict, blank=True)
+    kyc_state = models.CharField(
+        max_length=16, choices=KYCState.choices, default=KYCState.PENDING
+    )
+    # bumped by every change, KYC transitions included
+    version = models.PositiveIntegerField(default=0)
+    # when kyc_state last changed
+    kyc_updated_at = models.DateTimeField(null=True, blank=True)
 
     USERNAME_FIELD = "phone_number"
     # username field cannot be part of required fields
@@ -40,9 +67,427 @@ class User(AbstractUser):
     def __str__(self):
         return self.full_name
 
+    def save(self, *args, **kwargs):
+        # any change gets a new version, the profile ETags are built from it
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        # bumped by the UPDATE itself, so that concurrent saves of the same
+        # row never write the same version
+        version = self.version
+        self.version = F("version") + 1
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        try:
+            super().save(*args, **kwargs)
+        except BaseException:
+            self.version = version
+            raise
+        self.refresh_from_db(fields=["version"])
+
+    def transition_kyc(self, sources, target, **fields):
+        """
+        Move the user to the `target` KYC state.
+
+        The transition is a single ``UPDATE ... WHERE id = %s AND kyc_state = %s``
+        on the state loaded on this instance, writing only the KYC columns and
+        bumping ``version``. If another request changed the state in the
+        meantime, no row matches and the transition is lost. Applied
+        transitions send ``kyc_state_changed``.
+
+        Args:
+            sources (Iterable[str]): States the transition is allowed from.
+            target (str): The new KYC state.
+            **fields: Extra columns written in the same statement.
+
+        Returns:
+            bool: Whether the transition was applied.
+        """
+        if self.kyc_state not in sources:
+            return False
+
+        fields.update(
+            kyc_state=target,
+            is_kyc_verified=target == KYCState.VERIFIED,
+            kyc_updated_at=timezone.now(),
+        )
+        # the receivers (KYC statistics) write in the same transaction
+        with transaction.atomic():
+            updated = (
+                type(self)
+                .objects.filter(pk=self.pk, kyc_state=self.kyc_state)
+                .update(version=F("version") + 1, **fields)
+            )
+            if not updated:
+                return False
+
+            previous = self.kyc_state
+            kyc_state_changed.send(
+                sender=type(self), changes=[(self.pk, previous, target)]
+            )
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.version += 1
+        return True
+
+    def approve_kyc(self):
+        return self.transition_kyc(
+            KYC_APPROVE_FROM, KYCState.VERIFIED, kyc_rejection_reason=""
+        )
+
+    def reject_kyc(self, reason):
+        return self.transition_kyc(
+            KYC_REJECT_FROM, KYCState.REJECTED, kyc_rejection_reason=reason
+        )
+
+    def verify_kyc(self, **fields):
+        """Automatic verification after a matching ID upload; re-verification is allowed."""
+        return self.transition_kyc(
+            KYC_VERIFY_FROM,
+            KYCState.VERIFIED,
+            kyc_rejection_reason="",
+            **fields,
+        )
+
     class Meta:
         constraints = [
             UniqueConstraint(
                 fields=["email_id"], name="unique_email_id", condition=~Q(email_id=None)
             )
         ]
+        indexes = [
+            models.Index(fields=["is_kyc_verified"], name="user_kyc_verified_idx"),
+            models.Index(fields=["date_joined"], name="user_date_joined_idx"),
+            # (full_name, id) is the admin changelist ordering
+            models.Index(fields=["full_name", "id"], name="user_full_name_idx"),
+            # users waiting for a KYC review, oldest first
+            models.Index(
+                fields=["date_joined", "id"],
+                name="user_pending_kyc_idx",
+                condition=Q(kyc_state=KYCState.PENDING, document__isnull=False)
+                & ~Q(document=""),
+            ),
+        ]
+
+
+class ReviewClaim(models.Model):
+    """
+    A reviewer's lease on a pending user in the KYC review queue.
+
+    A claim is active until ``expires_at``; reviewers extend it with
+    heartbeats. Expired claims are simply taken over by the next reviewer
+    claiming work.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="review_claim",
+    )
+    reviewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="review_claims",
+    )
+    claimed_at = models.DateTimeField()
+    heartbeat_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user_id} claimed by {self.reviewer_id}"
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket state of a throttled client, see accounts.throttling."""
+
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    # unix time of the last request
+    updated_at = models.FloatField(db_index=True)
+    # whether the last request was let through
+    granted = models.BooleanField()
+
+    def __str__(self):
+        return self.key
+
+
+class IdempotencyRecord(models.Model):
+    """
+    The stored response of a request sent with an Idempotency-Key header.
+
+    ``status_code`` stays empty while the first request is in flight.
+    """
+
+    # "user:<id>", or "anon" for unauthenticated requests
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    # hash of the method, path and body, a key can't be reused for another request
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["scope", "key"], name="unique_idempotency_key")
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
+class KYCStateCount(models.Model):
+    """
+    Number of users in each KYC state, see accounts.stats.
+
+    A state's count is spread over KYC_STATS_SHARDS rows so that concurrent
+    transitions rarely update the same row; its total is the sum of the shards.
+    """
+
+    state = models.CharField(max_length=16, choices=KYCState.choices)
+    shard = models.PositiveSmallIntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["state", "shard"], name="unique_kyc_state_shard")
+        ]
+
+    def __str__(self):
+        return f"{self.state}[{self.shard}]: {self.count}"
+
+
+class KYCDailyCount(models.Model):
+    """Signups and KYC decisions per day, sharded like KYCStateCount."""
+
+    SIGNUP = "signup"
+
+    day = models.DateField()
+    # SIGNUP or the KYC state users were moved to
+    event = models.CharField(max_length=16)
+    shard = models.PositiveSmallIntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["day", "event", "shard"], name="unique_kyc_daily_shard"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.event}[{self.shard}]: {self.count}"
+
+
+class KYCAttempt(models.Model):
+    """
+    Append-only record of a document verification, see accounts.ledger.
+
+    On PostgreSQL the table is range partitioned by month on ``created_at``
+    (its primary key is ``(id, created_at)``), so that the retention drops
+    whole partitions.
+    """
+
+    # no constraint, the attempts outlive deleted users
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        # covered by kyc_attempt_user_idx
+        db_index=False,
+        related_name="kyc_attempts",
+    )
+    document_sha256 = models.CharField(max_length=64)
+    # fuzzy match of the user's name against the document text, 0-100
+    match_score = models.FloatField(null=True)
+    # provider latencies and the duration of the whole verification
+    textract_ms = models.FloatField(null=True)
+    rekognition_ms = models.FloatField(null=True)
+    total_ms = models.FloatField(null=True)
+    decision = models.CharField(max_length=16)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="kyc_attempt_user_idx"),
+            models.Index(fields=["created_at"], name="kyc_attempt_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.decision} at {self.created_at}"
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by the dispatch_outbox command.
+
+    Rows are written in the transaction that decided to send the email, so a
+    rolled back change never notifies anyone. See accounts.outbox.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    # gave up after OUTBOX_MAX_ATTEMPTS
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField()
+    # of the first recipient, for the per-domain concurrency limit
+    domain = models.CharField(max_length=255)
+    status = models.CharField(max_length=8, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # not sent before, pushed back after each failed attempt
+    available_at = models.DateTimeField(default=timezone.now)
+    # claimed by a dispatcher until then
+    leased_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the dispatcher's queue, sent emails are not part of it
+            models.Index(
+                fields=["available_at", "id"],
+                name="outbox_pending_idx",
+                condition=Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
+
+
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookSubscription(models.Model):
+    """
+    An endpoint notified of KYC state changes, see accounts.webhooks.
+
+    The delivery counters are maintained by the dispatch_webhooks command.
+    """
+
+    url = models.URLField(max_length=500)
+    # signs the payloads (HMAC-SHA256), shared with the receiver
+    secret = models.CharField(max_length=64, default=generate_webhook_secret)
+    # KYC states notified, all of them when empty
+    states = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_events = models.PositiveBigIntegerField(default=0)
+    delivered_batches = models.PositiveBigIntegerField(default=0)
+    failed_deliveries = models.PositiveBigIntegerField(default=0)
+    last_delivery_at = models.DateTimeField(null=True, blank=True)
+    # HTTP status of the last delivery, empty when the endpoint was unreachable
+    last_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.url
+
+
+class WebhookEvent(models.Model):
+    """
+    A KYC state change waiting to be delivered to a subscription.
+
+    Events are deleted once delivered. Those still failing after
+    WEBHOOK_MAX_ATTEMPTS are kept as dead letters.
+    """
+
+    PENDING = "pending"
+    DEAD = "dead"
+    STATUSES = [(PENDING, "Pending"), (DEAD, "Dead")]
+
+    subscription = models.ForeignKey(
+        WebhookSubscription,
+        on_delete=models.CASCADE,
+        # covered by webhook_subscription_idx
+        db_index=False,
+        related_name="events",
+    )
+    # no constraint, the events of deleted users are still delivered
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    previous_state = models.CharField(max_length=16, choices=KYCState.choices)
+    state = models.CharField(max_length=16, choices=KYCState.choices)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=8, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # the end of the batching window, pushed back after each failed delivery
+    available_at = models.DateTimeField()
+    # claimed by a dispatcher until then
+    leased_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                name="webhook_pending_idx",
+                condition=Q(status="pending"),
+            ),
+            models.Index(
+                fields=["subscription", "status"], name="webhook_subscription_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.previous_state} -> {self.state} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable document upload, see accounts.uploads.
+
+    The chunks are appended to a temporary file until the session is
+    finalized with the SHA-256 of the whole file.
+    """
+
+    VERIFICATION = "verification"
+    SIGNUP = "signup"
+    PURPOSES = [(VERIFICATION, "Verification"), (SIGNUP, "Signup")]
+
+    OPEN = "open"
+    COMPLETE = "complete"
+    STATUSES = [(OPEN, "Open"), (COMPLETE, "Complete")]
+
+    # unguessable, it is all an anonymous signup upload is authorized by
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="upload_sessions",
+    )
+    purpose = models.CharField(max_length=16, choices=PURPOSES)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    # declared by the client
+    size = models.PositiveBigIntegerField()
+    # bytes received, the offset of the next chunk
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=8, choices=STATUSES, default=OPEN)
+    # verification outcome of a finalized verification upload
+    outcome = models.CharField(max_length=16, blank=True)
+    # the request writing a chunk or finalizing, see accounts.uploads.leased
+    busy_until = models.DateTimeField(null=True, blank=True)
+    lease = models.UUIDField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
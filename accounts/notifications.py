@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from .models import OutboxEmail
+
+APPROVED_SUBJECT = "Document Approved"
+APPROVED_MESSAGE = "Greetings,\n\nKindly note your verification has been approved."
+REJECTED_SUBJECT = "Document Rejected"
+REJECTED_MESSAGE = (
+    "Greetings,\n\nKindly note your verification has been rejected for the "
+    "following reason:\n\n{reason}"
+)
+NAME_MISMATCH_MESSAGE = (
+    "Greetings,\n\nKindly note your verification has been rejected as your name "
+    "does not match the name on the ID provided."
+)
+
+
+def kyc_decision_message(email, approved, reason=""):
+    if approved:
+        subject, body = APPROVED_SUBJECT, APPROVED_MESSAGE
+    else:
+        subject, body = REJECTED_SUBJECT, REJECTED_MESSAGE.format(reason=reason)
+    return EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+
+
+def name_mismatch_message(email):
+    return EmailMessage(
+        subject=REJECTED_SUBJECT,
+        body=NAME_MISMATCH_MESSAGE,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+
+
+def queue_messages(messages):
+    """
+    Add the messages to the outbox, in the current transaction.
+
+    They are sent by the dispatch_outbox command once the transaction commits,
+    so a rolled back decision never notifies anyone and the request does not
+    wait on the mail server.
+    """
+    OutboxEmail.objects.bulk_create(
+        OutboxEmail(
+            subject=message.subject,
+            body=message.body,
+            from_email=message.from_email,
+            to=list(message.to),
+            domain=message.to[0].rpartition("@")[2].lower(),
+        )
+        for message in messages
+    )
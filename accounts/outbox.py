@@ -0,0 +1,172 @@
+"""
+The email outbox dispatcher, run by the dispatch_outbox command.
+
+Pending OutboxEmail rows are claimed in batches with SELECT ... FOR UPDATE
+SKIP LOCKED and a lease, so several dispatchers can run side by side. Each
+sending thread keeps its mail connection open across batches, and the
+emails of a recipient domain are spread over at most
+OUTBOX_DOMAIN_CONCURRENCY threads. Failed emails are retried with
+exponential backoff and marked failed after OUTBOX_MAX_ATTEMPTS.
+"""
+
+import logging
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def claim_batch(size):
+    """
+    Lease up to `size` emails that are due, oldest first.
+
+    Returns:
+        list[OutboxEmail]: The claimed emails.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        emails = list(
+            OutboxEmail.objects.filter(
+                Q(leased_until__isnull=True) | Q(leased_until__lt=now),
+                status=OutboxEmail.PENDING,
+                available_at__lte=now,
+            )
+            .order_by("available_at", "id")
+            .select_for_update(skip_locked=True)[:size]
+        )
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            leased_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        )
+    return emails
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt, exponential with jitter."""
+    delay = min(
+        settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.OUTBOX_RETRY_MAX_SECONDS,
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+class Dispatcher:
+    """Sends the outbox over pooled mail connections."""
+
+    def __init__(self, connections=None, domain_concurrency=None):
+        self.connections = connections or settings.OUTBOX_CONNECTIONS
+        self.domain_concurrency = (
+            domain_concurrency or settings.OUTBOX_DOMAIN_CONCURRENCY
+        )
+        self._pool = ThreadPoolExecutor(self.connections, thread_name_prefix="outbox")
+        self._local = threading.local()
+        self._opened = []
+
+    def dispatch(self, size=None):
+        """
+        Send one batch.
+
+        Returns:
+            tuple: The number of emails sent and failed.
+        """
+        emails = claim_batch(size or settings.OUTBOX_BATCH_SIZE)
+        if not emails:
+            return 0, 0
+
+        results = list(self._pool.map(self._send, self._split(emails)))
+        sent = [pk for result in results for pk in result[0]]
+        failed = {pk: error for result in results for pk, error in result[1].items()}
+        self._finish(emails, sent, failed)
+        return len(sent), len(failed)
+
+    def close(self):
+        self._pool.shutdown()
+        for connection in self._opened:
+            try:
+                connection.close()
+            except Exception:
+                logger.warning("Failed to close a mail connection", exc_info=True)
+
+    def _split(self, emails):
+        """Spread each domain's emails over at most domain_concurrency chunks."""
+        chunks = []
+        by_domain = defaultdict(list)
+        for email in emails:
+            by_domain[email.domain].append(email)
+        for domain_emails in by_domain.values():
+            count = min(self.domain_concurrency, self.connections, len(domain_emails))
+            chunks.extend(domain_emails[i::count] for i in range(count))
+        return chunks
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._local.connection = connection
+            self._opened.append(connection)
+        return connection
+
+    def _send(self, emails):
+        sent, failed = [], {}
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.to,
+            )
+            try:
+                self._connection().send_messages([message])
+            except Exception as exc:
+                logger.warning(
+                    "Failed to send outbox email %s", email.pk, exc_info=True
+                )
+                failed[email.pk] = repr(exc)
+                # reconnect for the next email
+                self._drop_connection()
+            else:
+                sent.append(email.pk)
+        return sent, failed
+
+    def _drop_connection(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            self._opened.remove(connection)
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _finish(self, emails, sent, failed):
+        now = timezone.now()
+        OutboxEmail.objects.filter(pk__in=sent).update(
+            status=OutboxEmail.SENT, sent_at=now, leased_until=None
+        )
+        for email in emails:
+            if email.pk not in failed:
+                continue
+            attempts = email.attempts + 1
+            gave_up = attempts >= settings.OUTBOX_MAX_ATTEMPTS
+            OutboxEmail.objects.filter(pk=email.pk).update(
+                status=OutboxEmail.FAILED if gave_up else OutboxEmail.PENDING,
+                attempts=attempts,
+                last_error=failed[email.pk],
+                available_at=now + timedelta(seconds=retry_delay(attempts)),
+                leased_until=None,
+            )
+            if gave_up:
+                logger.error(
+                    "Giving up on outbox email %s after %s attempts", email.pk, attempts
+                )
@@ -0,0 +1,166 @@
+"""
+Precomputed renditions of the profile photos.
+
+The face cropped from the ID document is kept as the profile photo, at full
+quality for the reviewers. At verification time it is also resized to each
+of PROFILE_PHOTO_RENDITIONS (thumbnail, list, detail) and encoded twice:
+progressive JPEG, understood by every client, and WebP, around a third
+smaller. Renditions are stored by content next to the original, and their
+names are kept on the user (profile_photo_renditions):
+
+    {"thumb": {"width": 96, "height": 96, "jpeg": "profile_photos/...jpg",
+               "webp": "profile_photos/...webp"}, ...}
+
+The API returns them with signed URLs instead of the names, see rendition_urls.
+"""
+
+import io
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connections
+from PIL import Image
+
+# key in profile_photo_renditions: Pillow format, extension
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        # progressive JPEGs are smaller and render early at low resolution
+        image.save(
+            buffer,
+            format="JPEG",
+            quality=settings.PROFILE_PHOTO_JPEG_QUALITY,
+            progressive=True,
+            optimize=True,
+        )
+    else:
+        # method 6 is the slowest and smallest encoding, affordable on thumbnails
+        image.save(
+            buffer, format="WEBP", quality=settings.PROFILE_PHOTO_WEBP_QUALITY, method=6
+        )
+    return buffer.getvalue()
+
+
+def render(photo):
+    """
+    Resize and encode a profile photo for each of PROFILE_PHOTO_RENDITIONS.
+
+    Args:
+        photo (bytes): The original photo.
+
+    Returns:
+        dict: For each rendition, its width, height and encoded bytes by format.
+    """
+    with Image.open(io.BytesIO(photo)) as image:
+        image.load()
+        # no alpha channel in JPEG, and CMYK or palette images encode badly
+        original = image.convert("RGB")
+
+    renditions = {}
+    for name, size in settings.PROFILE_PHOTO_RENDITIONS.items():
+        image = original.copy()
+        # keeps the aspect ratio and never enlarges
+        image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        renditions[name] = {
+            "width": image.width,
+            "height": image.height,
+            **{
+                key: _encode(image, image_format)
+                for key, (image_format, _) in FORMATS.items()
+            },
+        }
+    return renditions
+
+
+def save_renditions(photo, storage=default_storage):
+    """
+    Render a profile photo and store its renditions.
+
+    Returns:
+        dict: The value of profile_photo_renditions, see the module docstring.
+    """
+    field = get_user_model()._meta.get_field("profile_photo")
+    renditions = {}
+    for name, rendition in render(photo).items():
+        renditions[name] = {"width": rendition["width"], "height": rendition["height"]}
+        for key, (_, extension) in FORMATS.items():
+            # stored by content hash, the name only gives the directory and extension
+            renditions[name][key] = storage.save(
+                field.generate_filename(None, f"{name}{extension}"),
+                ContentFile(rendition[key]),
+            )
+    return renditions
+
+
+def rendition_names(renditions):
+    """The file names of a profile_photo_renditions value."""
+    return [
+        rendition[key]
+        for rendition in (renditions or {}).values()
+        for key in FORMATS
+        if rendition.get(key)
+    ]
+
+
+def rendition_urls(renditions, url):
+    """
+    profile_photo_renditions with URLs instead of file names, smallest first.
+
+    Args:
+        renditions (dict): A profile_photo_renditions value.
+        url (Callable[[str], str]): Builds the URL of a file name.
+    """
+    # jsonb doesn't keep the order of the keys
+    by_width = sorted((renditions or {}).items(), key=lambda item: item[1]["width"])
+    return {
+        name: {
+            "width": rendition["width"],
+            "height": rendition["height"],
+            **{key: url(rendition[key]) for key in FORMATS},
+        }
+        for name, rendition in by_width
+    }
+
+
+def referenced_names(chunk_size=10000):
+    """
+    The names of the renditions referenced by a user, sorted by code point.
+
+    The database expands the JSON values (jsonb_each, or json_each on SQLite)
+    and sorts the names with the binary collation of media.referenced_names,
+    and they are read through a server-side cursor, so memory use does not
+    grow with the number of users.
+    """
+    User = get_user_model()
+    connection = connections[DEFAULT_DB_ALIAS]
+    table = connection.ops.quote_name(User._meta.db_table)
+    column = connection.ops.quote_name(
+        User._meta.get_field("profile_photo_renditions").column
+    )
+    if connection.vendor == "postgresql":
+        each, extract, collation = "jsonb_each", "rendition.value ->> %s", '"C"'
+        params = list(FORMATS)
+    else:
+        each, extract = "json_each", "json_extract(rendition.value, %s)"
+        collation = "BINARY"
+        params = [f"$.{key}" for key in FORMATS]
+    select = (
+        f"SELECT {extract} AS name FROM {table}, {each}({table}.{column}) AS rendition"
+    )
+    sql = (
+        f"SELECT name FROM ({' UNION ALL '.join([select] * len(FORMATS))}) AS names "
+        f"WHERE name IS NOT NULL ORDER BY name COLLATE {collation}"
+    )
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(chunk_size):
+            for (name,) in rows:
+                yield name
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import ReviewClaim
+
+User = get_user_model()
+
+
+def _lease():
+    return timedelta(seconds=settings.KYC_REVIEW_LEASE_SECONDS)
+
+
+# Claims the users, taking over only claims that expired meanwhile: another
+# reviewer may have committed a claim since the candidates were read.
+CLAIM_SQL = """
+INSERT INTO {table} ({user}, {reviewer}, claimed_at, heartbeat_at, expires_at)
+VALUES {values}
+ON CONFLICT ({user}) DO UPDATE SET
+    {reviewer} = excluded.{reviewer},
+    claimed_at = excluded.claimed_at,
+    heartbeat_at = excluded.heartbeat_at,
+    expires_at = excluded.expires_at
+WHERE {table}.expires_at <= %s
+RETURNING {user}
+"""
+
+
+def _claimable(now, count):
+    """Up to `count` pending users without an active claim, locked, oldest first."""
+    return list(
+        User.objects.pending_kyc()
+        .exclude(review_claim__expires_at__gt=now)
+        .order_by("date_joined", "id")
+        .select_for_update(skip_locked=True, of=("self",))
+        .values_list("pk", flat=True)[:count]
+    )
+
+
+def claim_next(reviewer, count):
+    """
+    Atomically claim up to `count` pending users for a reviewer, oldest first.
+
+    Candidate rows are locked with SELECT ... FOR UPDATE SKIP LOCKED, so
+    reviewers claiming at the same time never wait on each other. The claims
+    are then written with one INSERT ... ON CONFLICT DO UPDATE that only takes
+    over expired claims, so a claim committed by another reviewer after the
+    candidates were read is kept, and that user is left out.
+
+    Returns:
+        list[ReviewClaim]: The claims created, in queue order.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        user_ids = _claimable(now, count)
+        if not user_ids:
+            return []
+
+        connection = connections[DEFAULT_DB_ALIAS]
+        quote_name = connection.ops.quote_name
+        claimed_at = connection.ops.adapt_datetimefield_value(now)
+        expires_at = connection.ops.adapt_datetimefield_value(now + _lease())
+        sql = CLAIM_SQL.format(
+            table=quote_name(ReviewClaim._meta.db_table),
+            user=quote_name(ReviewClaim._meta.get_field("user").column),
+            reviewer=quote_name(ReviewClaim._meta.get_field("reviewer").column),
+            values=", ".join(["(%s, %s, %s, %s, %s)"] * len(user_ids)),
+        )
+        params = [
+            value
+            for user_id in user_ids
+            for value in (user_id, reviewer.pk, claimed_at, claimed_at, expires_at)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, claimed_at])
+            claimed = {user_id for (user_id,) in cursor.fetchall()}
+
+    return [
+        ReviewClaim(
+            user_id=user_id,
+            reviewer=reviewer,
+            claimed_at=now,
+            heartbeat_at=now,
+            expires_at=now + _lease(),
+        )
+        for user_id in user_ids
+        if user_id in claimed
+    ]
+
+
+def heartbeat(reviewer, user_ids):
+    """
+    Extend the reviewer's active claims on the given users.
+
+    Returns:
+        list[int]: The user ids whose claims were extended. Claims that
+        already expired are not revived.
+    """
+    now = timezone.now()
+    claims = ReviewClaim.objects.filter(
+        reviewer=reviewer, user_id__in=user_ids, expires_at__gt=now
+    )
+    with transaction.atomic():
+        renewed = list(claims.select_for_update().values_list("user_id", flat=True))
+        ReviewClaim.objects.filter(user_id__in=renewed).update(
+            heartbeat_at=now, expires_at=now + _lease()
+        )
+    return renewed
+
+
+def release(reviewer, user_ids):
+    """Give back the reviewer's claims on the given users."""
+    ReviewClaim.objects.filter(reviewer=reviewer, user_id__in=user_ids).delete()
+
+
+def claimed_by_other(user, reviewer):
+    """
+    Whether `user` is under an active claim held by someone other than `reviewer`.
+
+    Decisions check it in their transaction, with the user row locked by
+    select_for_update(): claim_next skips locked users, so the answer holds
+    until the decision commits.
+    """
+    return (
+        ReviewClaim.objects.filter(user=user, expires_at__gt=timezone.now())
+        .exclude(reviewer=reviewer)
+        .exists()
+    )
+
+
+def finish(user_ids):
+    """Drop the claims on users whose review is done."""
+    ReviewClaim.objects.filter(user_id__in=user_ids).delete()
+
+
+def queue_stats():
+    """
+    Queue depth and lease ages for monitoring.
+
+    Returns:
+        dict: pending/claimed/unclaimed counts, the age in seconds of the oldest
+        active claim and of the stalest heartbeat, and active claims per reviewer.
+    """
+    now = timezone.now()
+    pending = User.objects.pending_kyc()
+    active = ReviewClaim.objects.filter(expires_at__gt=now)
+
+    depth = pending.count()
+    claimed = pending.filter(review_claim__expires_at__gt=now).count()
+    ages = active.aggregate(
+        oldest_claim=Min("claimed_at"), stalest_heartbeat=Min("heartbeat_at")
+    )
+
+    def age(value):
+        return round((now - value).total_seconds(), 1) if value else None
+
+    return {
+        "pending": depth,
+        "claimed": claimed,
+        "unclaimed": depth - claimed,
+        "lease_seconds": settings.KYC_REVIEW_LEASE_SECONDS,
+        "oldest_claim_age_seconds": age(ages["oldest_claim"]),
+        "stalest_heartbeat_age_seconds": age(ages["stalest_heartbeat"]),
+        "reviewers": list(
+            active.values("reviewer_id")
+            .annotate(claimed=Count("pk"))
+            .order_by("-claimed")
+        ),
+    }
@@ -0,0 +1,23 @@
+"""
+OpenAPI extensions, so that the schema documents the project's subclasses of
+the simplejwt classes like the originals.
+"""
+
+from drf_spectacular.contrib.rest_framework_simplejwt import (
+    SimpleJWTScheme,
+    TokenObtainPairSerializerExtension,
+)
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = "accounts.authentication.CachedJWTAuthentication"
+
+
+class KYCTokenScheme(SimpleJWTScheme):
+    # the same access tokens, a separate name keeps the components distinct
+    target_class = "accounts.authentication.KYCTokenAuthentication"
+    name = "kycJwtAuth"
+
+
+class KYCTokenObtainPairSerializerExtension(TokenObtainPairSerializerExtension):
+    target_class = "accounts.serializers.KYCTokenObtainPairSerializer"
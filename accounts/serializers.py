@@ -1,27 +1,77 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from drf_spectacular.utils import extend_schema_field
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+
+from .authentication import KYC_VERIFIED_CLAIM, KYC_VERSION_CLAIM
+from .blacklist import FilteredRefreshToken
+from . import uploads
+from .media import ProtectedMediaStorage
+from .models import KYCState, UploadSession, WebhookEvent, WebhookSubscription
+from .renditions import rendition_urls
 
 User = get_user_model()
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
-    document = serializers.FileField(required=True)
+    document = serializers.FileField(required=False)
+    # a finalized resumable upload, instead of the document
+    document_upload = serializers.UUIDField(required=False, write_only=True)
 
     class Meta:
         model = User
-        fields = ("phone_number", "password", "full_name", "document", "email")
+        fields = (
+            "phone_number",
+            "password",
+            "full_name",
+            "document",
+            "document_upload",
+            "email",
+        )
         extra_kwargs = {
             "password": {"write_only": True},
         }
 
+    def validate(self, attrs):
+        if ("document" in attrs) == ("document_upload" in attrs):
+            raise serializers.ValidationError(
+                {"document": "Upload a document or pass a document_upload."}
+            )
+        return attrs
+
+    def validate_document_upload(self, value):
+        upload = UploadSession.objects.filter(
+            pk=value,
+            purpose=UploadSession.SIGNUP,
+            status=UploadSession.COMPLETE,
+            expires_at__gt=timezone.now(),
+        ).first()
+        if upload is None:
+            raise serializers.ValidationError("No finalized signup upload has this id.")
+        return upload
+
     def create(self, validated_data):
+        upload = validated_data.pop("document_upload", None)
         password = validated_data["password"]
         instance = self.Meta.model(**validated_data)
         if password is not None:
             instance.set_password(password)
         instance.is_active = True
-        instance.save()
+        if upload is None:
+            instance.save()
+            return instance
 
+        with uploads.open_upload(upload) as document:
+            instance.document = document
+            instance.save()
+        uploads.delete_session(upload)
         return instance
 
     def validate_document(self, value):
@@ -33,7 +83,34 @@ class RegistrationSerializer(serializers.ModelSerializer):
         return value
 
 
+class RenditionSerializer(serializers.Serializer):
+    width = serializers.IntegerField()
+    height = serializers.IntegerField()
+    jpeg = serializers.URLField(help_text="Progressive JPEG.")
+    webp = serializers.URLField(help_text="WebP, smaller than the JPEG.")
+
+
+@extend_schema_field(serializers.DictField(child=RenditionSerializer()))
+class ProfilePhotoRenditionsField(serializers.Field):
+    """The resized profile photos by rendition (thumb, list, detail), with URLs."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = User._meta.get_field("profile_photo").storage
+        request = self.context.get("request")
+        if request is not None:
+            return rendition_urls(
+                value, lambda name: request.build_absolute_uri(storage.url(name))
+            )
+        return rendition_urls(value, storage.url)
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
+    profile_photo_renditions = ProfilePhotoRenditionsField()
+
     class Meta:
         model = User
         fields = (
@@ -44,15 +121,83 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "is_kyc_verified",
             "kyc_rejection_reason",
             "profile_photo",
+            "profile_photo_renditions",
             "document",
         )
 
 
+class UserProfileReadSerializer:
+    """
+    Read-only fast path producing the same output as UserProfileSerializer.
+
+    Works from ``values_list()`` tuples (or an already loaded instance) and
+    builds file URLs from a prefix resolved once per serializer, instead of
+    creating a model instance, field objects and a FieldFile per row.
+    """
+
+    fields = UserProfileSerializer.Meta.fields
+    file_fields = ("profile_photo", "document")
+
+    def __init__(self, request=None):
+        self._url_builders = {
+            name: self._url_builder(User._meta.get_field(name).storage, request)
+            for name in self.file_fields
+        }
+        self._file_positions = [
+            (self.fields.index(name), self._url_builders[name])
+            for name in self.file_fields
+        ]
+        self._renditions_position = self.fields.index("profile_photo_renditions")
+
+    @staticmethod
+    def _url_builder(storage, request):
+        if isinstance(storage, ProtectedMediaStorage):
+            prefix = storage.base_url
+            if request is not None:
+                prefix = request.build_absolute_uri(prefix)
+            return storage.url_builder(prefix)
+
+        # subclasses may build their URLs differently
+        if type(storage) is FileSystemStorage and storage.base_url.endswith("/"):
+            prefix = storage.base_url
+            if request is not None:
+                prefix = request.build_absolute_uri(prefix)
+            return lambda name: prefix + filepath_to_uri(name).lstrip("/")
+
+        if request is not None:
+            return lambda name: request.build_absolute_uri(storage.url(name))
+        return storage.url
+
+    def queryset(self, queryset):
+        return queryset.values_list(*self.fields)
+
+    def to_representation(self, row):
+        row = list(row)
+        for position, build_url in self._file_positions:
+            name = row[position]
+            row[position] = build_url(name) if name else None
+        position = self._renditions_position
+        row[position] = rendition_urls(
+            row[position], self._url_builders["profile_photo"]
+        )
+        return dict(zip(self.fields, row))
+
+    def serialize_rows(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+    def serialize_instance(self, instance):
+        row = []
+        for name in self.fields:
+            value = getattr(instance, name)
+            row.append(value.name if name in self.file_fields else value)
+        return self.to_representation(row)
+
+
 class ApproveKYCSerializer(serializers.Serializer):
     def save(self, user):
-        user.is_kyc_verified = True
-        user.kyc_rejection_reason = ""
-        user.save()
+        """Returns whether the approval won against concurrent changes."""
+        return user.approve_kyc()
 
 
 class RejectKYCSerializer(serializers.ModelSerializer):
@@ -64,10 +209,8 @@ class RejectKYCSerializer(serializers.ModelSerializer):
         }
 
     def save(self, instance, validated_data):
-        instance.is_kyc_verified = False
-        instance.kyc_rejection_reason = validated_data["kyc_rejection_reason"]
-        instance.save()
-        return instance
+        """Returns whether the rejection won against concurrent changes."""
+        return instance.reject_kyc(validated_data["kyc_rejection_reason"])
 
 
 class DocumentUploadSerializer(serializers.Serializer):
@@ -84,3 +227,211 @@ class DocumentUploadSerializer(serializers.Serializer):
 
 class RefreshTokenSerializer(serializers.Serializer):
     refresh = serializers.CharField(required=True)
+
+
+class UserExportSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=("ndjson", "csv"), default="ndjson")
+    gzip = serializers.BooleanField(default=False)
+    after = serializers.IntegerField(required=False, min_value=0)
+
+
+class UserImportSerializer(serializers.Serializer):
+    """A row of the import_users command."""
+
+    phone_number = serializers.CharField(max_length=50)
+    full_name = serializers.CharField(max_length=255)
+    email = serializers.EmailField(required=False, allow_blank=True, default="")
+    email_id = serializers.EmailField(
+        required=False, allow_blank=True, allow_null=True, default=None
+    )
+    # users imported without a password get an unusable one
+    password = serializers.CharField(
+        required=False, allow_blank=True, default="", trim_whitespace=False
+    )
+
+    def validate_email_id(self, value):
+        # empty CSV cells, the column is unique when set
+        return value or None
+
+
+class KYCStatsSerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=1, default=30)
+
+    def validate_days(self, value):
+        if value > settings.KYC_STATS_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"At most {settings.KYC_STATS_MAX_DAYS} days can be requested."
+            )
+        return value
+
+
+class ReviewQueueClaimSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, default=1)
+
+    def validate_count(self, value):
+        if value > settings.KYC_REVIEW_MAX_CLAIM:
+            raise serializers.ValidationError(
+                f"At most {settings.KYC_REVIEW_MAX_CLAIM} users can be claimed at once."
+            )
+        return value
+
+
+class ReviewQueueLeaseSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100
+    )
+
+
+class KYCDecisionSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)
+    decision = serializers.ChoiceField(choices=("approve", "reject"))
+    reason = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if attrs["decision"] == "reject" and not attrs.get("reason"):
+            raise serializers.ValidationError(
+                {"reason": "A reason is required to reject a user."}
+            )
+        return attrs
+
+
+class BulkKYCDecisionSerializer(serializers.Serializer):
+    decisions = KYCDecisionSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_decisions(self, value):
+        ids = [decision["id"] for decision in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each user can only appear once.")
+        return value
+
+
+class KYCTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds the KYC status and the user version to the issued tokens."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[KYC_VERIFIED_CLAIM] = user.is_kyc_verified
+        token[KYC_VERSION_CLAIM] = user.version
+        return token
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """Checks the refresh token against the per-process blacklist filter first."""
+
+    token_class = FilteredRefreshToken
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    states = serializers.ListField(
+        child=serializers.ChoiceField(choices=KYCState.choices),
+        required=False,
+        help_text="KYC states notified, all of them when empty.",
+    )
+    # annotated by accounts.webhooks.subscriptions
+    pending_events = serializers.IntegerField(read_only=True)
+    dead_letters = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = WebhookSubscription
+        fields = (
+            "id",
+            "url",
+            "secret",
+            "states",
+            "is_active",
+            "created_at",
+            "delivered_events",
+            "delivered_batches",
+            "failed_deliveries",
+            "last_delivery_at",
+            "last_status",
+            "last_error",
+            "pending_events",
+            "dead_letters",
+        )
+        read_only_fields = (
+            "created_at",
+            "delivered_events",
+            "delivered_batches",
+            "failed_deliveries",
+            "last_delivery_at",
+            "last_status",
+            "last_error",
+        )
+        extra_kwargs = {"secret": {"required": False, "min_length": 16}}
+
+
+class WebhookEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookEvent
+        fields = (
+            "id",
+            "subscription",
+            "user",
+            "previous_state",
+            "state",
+            "occurred_at",
+            "attempts",
+            "last_error",
+        )
+
+
+class WebhookRequeueSerializer(serializers.Serializer):
+    subscription = serializers.IntegerField(min_value=1, required=False)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=1000,
+    )
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(
+                "Pass the ids of the dead letters or a subscription."
+            )
+        return attrs
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    purpose = serializers.ChoiceField(choices=UploadSession.PURPOSES)
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.ChoiceField(choices=uploads.ALLOWED_CONTENT_TYPES)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_size(self, value):
+        if value > settings.KYC_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Documents can be at most {settings.KYC_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField(
+        help_text="Suggested chunk size in bytes."
+    )
+
+    class Meta:
+        model = UploadSession
+        fields = (
+            "id",
+            "purpose",
+            "filename",
+            "content_type",
+            "size",
+            "offset",
+            "status",
+            "chunk_size",
+            "expires_at",
+        )
+
+    def get_chunk_size(self, obj) -> int:
+        return settings.KYC_UPLOAD_CHUNK_SIZE
+
+
+class UploadFinalizeSerializer(serializers.Serializer):
+    sha256 = serializers.RegexField(
+        r"^[0-9a-fA-F]{64}$", help_text="SHA-256 of the whole file, in hex."
+    )
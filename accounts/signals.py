@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent whenever KYC states change, with
+# changes=[(user_id, previous_state, new_state), ...]. Bulk decisions send a
+# single signal for the whole batch.
+kyc_state_changed = Signal()
@@ -0,0 +1,147 @@
+"""
+KYC statistics maintained incrementally, for the admin dashboard.
+
+Every signup, KYC transition and deletion adds to the sharded counters of
+KYCStateCount and KYCDailyCount in the transaction that made the change, so
+reading the statistics sums a few dozen rows however many users there are.
+The reconcile_kyc_stats command recomputes the state counters from the user
+table.
+"""
+
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import KYCDailyCount, KYCState, KYCStateCount
+from .signals import kyc_state_changed
+
+# adds to the counter of a shard, creating it on first use
+ADD_SQL = """
+INSERT INTO {table} ({columns}, {count})
+VALUES {values}
+ON CONFLICT ({columns}) DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}
+"""
+
+
+def _add(model, columns, deltas):
+    """
+    Add `deltas` ({(column values...): delta}) to the counters of a random shard.
+
+    A single statement on PostgreSQL and SQLite (INSERT ... ON CONFLICT).
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    connection = connections[DEFAULT_DB_ALIAS]
+    quote = connection.ops.quote_name
+    columns = [*columns, "shard"]
+    shard = random.randrange(settings.KYC_STATS_SHARDS)
+    placeholders = "(" + ", ".join(["%s"] * (len(columns) + 1)) + ")"
+    sql = ADD_SQL.format(
+        table=quote(model._meta.db_table),
+        columns=", ".join(quote(column) for column in columns),
+        count=quote("count"),
+        values=", ".join([placeholders] * len(deltas)),
+    )
+    params = [value for key, delta in deltas.items() for value in (*key, shard, delta)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record(states=(), events=(), day=None):
+    """
+    Count users entering and leaving KYC states, and daily events.
+
+    Args:
+        states (Iterable[tuple]): (state, delta) pairs.
+        events (Iterable[str]): Events that happened today (or on `day`).
+        day (date): Defaults to the current date.
+    """
+    state_deltas = Counter()
+    for state, delta in states:
+        state_deltas[(state,)] += delta
+    day = day or timezone.localdate()
+    _add(KYCStateCount, ["state"], state_deltas)
+    _add(KYCDailyCount, ["day", "event"], Counter((day, event) for event in events))
+
+
+def adjust(state_deltas):
+    """
+    Correct the state counters, see the reconcile_kyc_stats command.
+
+    Args:
+        state_deltas (dict): {state: delta}.
+    """
+    _add(KYCStateCount, ["state"], {(state,): d for state, d in state_deltas.items()})
+
+
+@receiver(kyc_state_changed)
+def _kyc_state_changed(sender, changes, **kwargs):
+    states, events = [], []
+    for _, previous, new in changes:
+        if previous != new:
+            states += [(previous, -1), (new, 1)]
+            events.append(new)
+    record(states, events)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record([(instance.kyc_state, 1)], [KYCDailyCount.SIGNUP])
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _user_deleted(sender, instance, **kwargs):
+    record([(instance.kyc_state, -1)])
+
+
+def kyc_stats(days):
+    """
+    The number of users per KYC state and the daily figures of the last `days` days.
+
+    Returns:
+        dict: "totals" per state (and overall), and "daily" items, oldest
+        first, with the signups, verifications and rejections of each day and
+        its verification rate (verified / decided, None without decisions).
+    """
+    totals = {state: 0 for state in KYCState.values}
+    totals.update(
+        KYCStateCount.objects.values_list("state")
+        .annotate(total=Sum("count"))
+        .order_by()
+    )
+    totals["total"] = sum(totals.values())
+
+    today = timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    counts = {
+        (day, event): total
+        for day, event, total in KYCDailyCount.objects.filter(day__gte=first)
+        .values_list("day", "event")
+        .annotate(total=Sum("count"))
+        .order_by()
+    }
+    daily = []
+    for offset in range(days):
+        day = first + timedelta(days=offset)
+        verified = counts.get((day, KYCState.VERIFIED), 0)
+        rejected = counts.get((day, KYCState.REJECTED), 0)
+        decided = verified + rejected
+        daily.append(
+            {
+                "date": day.isoformat(),
+                "signups": counts.get((day, KYCDailyCount.SIGNUP), 0),
+                "verified": verified,
+                "rejected": rejected,
+                "verification_rate": round(verified / decided, 4) if decided else None,
+            }
+        )
+    return {"totals": totals, "daily": daily}
@@ -0,0 +1,96 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.paginators import EstimatedCountPaginator
+
+from .utils import KYCTestCase
+
+User = get_user_model()
+
+
+class EstimatedCountPaginatorTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(5):
+            self.create_user(f"+1555000000{index}")
+
+    def test_small_result_sets_are_counted(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by("pk"), 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
+
+    def test_lists_are_counted(self):
+        self.assertIsNone(EstimatedCountPaginator([1, 2], 1).estimated_count())
+
+    @skipUnless(connection.vendor == "postgresql", "planner estimates")
+    def test_large_result_sets_use_the_estimate(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by("pk"), 2)
+        paginator.exact_count_threshold = 0
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        self.assertEqual(count, paginator.estimated_count())
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("EXPLAIN"))
+
+    def test_estimate_below_the_threshold_is_counted(self):
+        paginator = EstimatedCountPaginator(User.objects.order_by("pk"), 2)
+        with mock.patch.object(paginator, "estimated_count", return_value=9999):
+            self.assertEqual(paginator.count, 5)
+
+
+class UserAdminTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_user("+15550000001", full_name="Bob Smith")
+        self.create_user("+15550000002", full_name="Alice Jones")
+        self.client.force_login(self.create_admin())
+
+    def test_changelist_loads_the_displayed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/admin/accounts/user/")
+        self.assertEqual(response.status_code, 200)
+        (select,) = [query["sql"] for query in queries if "ORDER BY" in query["sql"]]
+        self.assertNotIn('"password"', select)
+        self.assertNotIn("JOIN", select)
+        # ordered by (full_name, id), like user_full_name_idx
+        names = [user.full_name for user in response.context["cl"].result_list]
+        self.assertEqual(names, ["Admin", "Alice Jones", "Bob Smith"])
+
+    def test_no_full_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/admin/accounts/user/", {"q": "alice"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 1)
+        counts = [query["sql"] for query in queries if "COUNT(" in query["sql"]]
+        self.assertEqual(len(counts), 1)
+        if connection.vendor == "postgresql":
+            # the expression of user_full_name_trgm_idx
+            self.assertIn("UPPER", counts[0])
+
+    def test_sorting_is_limited_to_indexed_columns(self):
+        response = self.client.get("/admin/accounts/user/", {"o": "5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user.full_name for user in response.context["cl"].result_list],
+            ["Admin", "Alice Jones", "Bob Smith"],
+        )
+
+
+class UserIndexTests(KYCTestCase):
+    def test_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, User._meta.db_table
+            )
+        for name in (
+            "user_kyc_verified_idx",
+            "user_date_joined_idx",
+            "user_full_name_idx",
+            "user_pending_kyc_idx",
+        ):
+            self.assertIn(name, constraints)
+        if connection.vendor == "postgresql":
+            self.assertIn("user_full_name_trgm_idx", constraints)
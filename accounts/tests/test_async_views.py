@@ -0,0 +1,158 @@
+import io
+import json
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import AsyncRequestFactory
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import async_views, utils, verification
+from accounts.management.commands.benchmark_verification import FakeProvider
+
+from .utils import KYCTestCase
+
+
+def png():
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(image, format="PNG")
+    return image.getvalue()
+
+
+class BarrierProvider(FakeProvider):
+    """Only answers when the Textract and Rekognition calls are both in flight."""
+
+    def __init__(self):
+        super().__init__(0)
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def analyze_document(self, **kwargs):
+        self.barrier.wait()
+        return super().analyze_document(**kwargs)
+
+    def detect_faces(self, **kwargs):
+        self.barrier.wait()
+        return super().detect_faces(**kwargs)
+
+
+class AsyncViewTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        # FakeProvider reads "JOHN" on every document
+        self.user = self.create_user("+15550000001", full_name="John")
+        self.login(self.user)
+        self.factory = AsyncRequestFactory()
+        provider = FakeProvider(0)
+        for name in ("textract_client", "rekognition_client"):
+            patcher = mock.patch.object(utils, name, provider)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def headers(self, user=None, **headers):
+        token = RefreshToken.for_user(user or self.user).access_token
+        return {"authorization": f"Bearer {token}", **headers}
+
+    def test_status_and_profile_match_the_apiviews(self):
+        for path, view in (
+            ("/api/kyc-status/", async_views.kyc_status),
+            ("/api/user-profile/", async_views.user_profile),
+        ):
+            with self.subTest(path=path):
+                expected = self.client.get(path)
+                response = async_to_sync(view)(
+                    self.factory.get(path, headers=self.headers())
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), expected.json())
+                self.assertEqual(response["ETag"], expected["ETag"])
+                self.assertEqual(response["Cache-Control"], expected["Cache-Control"])
+
+                response = async_to_sync(view)(
+                    self.factory.get(
+                        path, headers=self.headers(if_none_match=expected["ETag"])
+                    )
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_authentication_is_required(self):
+        for view in (async_views.kyc_status, async_views.user_profile):
+            with self.subTest(view=view.__name__):
+                response = async_to_sync(view)(self.factory.get("/"))
+                self.assertEqual(response.status_code, 401)
+        response = async_to_sync(async_views.verify_identity)(self.factory.post("/"))
+        self.assertEqual(response.status_code, 401)
+
+    def verify(self, user):
+        request = self.factory.post(
+            "/api/upload-document/",
+            {"document": SimpleUploadedFile("id.png", png(), "image/png")},
+            headers=self.headers(user),
+        )
+        return async_to_sync(async_views.verify_identity)(request)
+
+    def test_verify_identity(self):
+        response = self.verify(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content), {"status": "Verification successful!"}
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_state, "verified")
+        self.assertTrue(self.user.profile_photo)
+
+        # the APIView gives the same answer
+        other = self.create_user("+15550000002", full_name="John")
+        self.login(other)
+        response = self.client.post(
+            "/api/upload-document/",
+            {"document": SimpleUploadedFile("id.png", png(), "image/png")},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "Verification successful!"})
+
+    def test_name_mismatch(self):
+        user = self.create_user("+15550000002", full_name="Mary Smith")
+        response = self.verify(user)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            json.loads(response.content), {"error": "Full name does not match ID."}
+        )
+        user.refresh_from_db()
+        self.assertEqual(user.kyc_state, "pending")
+
+    def test_invalid_upload(self):
+        request = self.factory.post("/api/upload-document/", {}, headers=self.headers())
+        response = async_to_sync(async_views.verify_identity)(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("document", json.loads(response.content))
+
+    def test_provider_calls_overlap(self):
+        # each call waits for the other, they deadlock unless they overlap
+        for analyze in (
+            verification.analyze_document,
+            async_to_sync(verification.aanalyze_document),
+        ):
+            with self.subTest(analyze=analyze):
+                provider = BarrierProvider()
+                with mock.patch.object(
+                    utils, "textract_client", provider
+                ), mock.patch.object(utils, "rekognition_client", provider):
+                    analysis = analyze(png())
+                self.assertEqual(analysis.text, "JOHN")
+                self.assertIsNotNone(analysis.face)
+
+    def test_benchmark(self):
+        out = io.StringIO()
+        call_command(
+            "benchmark_verification",
+            requests=4,
+            threads=2,
+            latency=0.01,
+            stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn("WSGI (2 threads)", output)
+        self.assertIn("ASGI", output)
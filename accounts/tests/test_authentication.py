@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.test import override_settings
+from drf_spectacular.generators import SchemaGenerator
+
+from accounts.authentication import user_cache
+
+from .utils import KYCTestCase
+
+
+class UserCacheTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("+15550000001")
+
+    def test_cached_user_is_served_without_queries(self):
+        user_cache.get(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_cache.get(self.user.pk).full_name, "Jane Doe")
+
+    def test_save_invalidates_the_cached_user(self):
+        user_cache.get(self.user.pk)
+        self.user.full_name = "John Doe"
+        self.user.save()
+        self.assertEqual(user_cache.get(self.user.pk).full_name, "John Doe")
+
+    def test_delete_invalidates_the_cached_user(self):
+        user_cache.get(self.user.pk)
+        pk = self.user.pk
+        self.user.delete()
+        self.assertIsNone(user_cache.get(pk))
+
+    def test_kyc_transition_invalidates_the_cached_user(self):
+        user_cache.get(self.user.pk)
+        self.user.approve_kyc()
+        self.assertTrue(user_cache.get(self.user.pk).is_kyc_verified)
+
+    def test_profile_reflects_a_save(self):
+        self.login(self.user)
+        self.assertEqual(
+            self.client.get("/api/user-profile/").json()["full_name"], "Jane Doe"
+        )
+        self.user.full_name = "John Doe"
+        self.user.save()
+        self.assertEqual(
+            self.client.get("/api/user-profile/").json()["full_name"], "John Doe"
+        )
+
+    def test_password_hash_is_not_cached(self):
+        user = user_cache.get(self.user.pk)
+        self.assertNotIn(self.user.password, cache.get(f"jwt-user:{self.user.pk}"))
+        self.assertIn("password", user.get_deferred_fields())
+
+    def test_hits_build_a_fresh_user(self):
+        user_cache.get(self.user.pk).full_name = "John Doe"
+        self.assertEqual(user_cache.get(self.user.pk).full_name, "Jane Doe")
+
+    @override_settings(JWT_USER_CACHE_LOCAL_SECONDS=0)
+    def test_expired_local_entries_use_the_shared_cache(self):
+        user_cache.get(self.user.pk)
+        before = user_cache.stats()
+        with self.assertNumQueries(0):
+            user_cache.get(self.user.pk)
+        after = user_cache.stats()
+        self.assertEqual(after["shared_hits"], before["shared_hits"] + 1)
+        self.assertEqual(after["local_hits"], before["local_hits"])
+
+    @override_settings(JWT_USER_CACHE_SIZE=1)
+    def test_local_tier_is_bounded(self):
+        other = self.create_user("+15550000002")
+        user_cache.get(self.user.pk)
+        user_cache.get(other.pk)
+        self.assertEqual(user_cache.stats()["local_size"], 1)
+
+    def test_unknown_user(self):
+        self.assertIsNone(user_cache.get(0))
+
+    def test_metrics(self):
+        self.client.force_authenticate(self.create_admin())
+        response = self.client.get("/api/admin/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hit_ratio", response.json()["user_cache"])
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/admin/metrics/").status_code, 403)
+
+
+class SchemaTests(KYCTestCase):
+    def test_jwt_authentication_is_documented(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        self.assertEqual(
+            set(schema["components"]["securitySchemes"]), {"jwtAuth", "kycJwtAuth"}
+        )
+        self.assertEqual(
+            schema["paths"]["/api/user-profile/"]["get"]["security"],
+            [{"jwtAuth": []}],
+        )
+        login = schema["components"]["schemas"]["KYCTokenObtainPair"]
+        self.assertIn("access", login["properties"])
+        self.assertIn("refresh", login["properties"])
@@ -0,0 +1,144 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from accounts import blacklist
+from accounts.blacklist import BlacklistFilter, BloomFilter, FilteredRefreshToken
+from accounts.serializers import FilteredTokenRefreshSerializer
+
+from .utils import KYCTestCase
+
+
+class BloomFilterTests(KYCTestCase):
+    def test_members_and_error_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"member-{i}")
+        self.assertTrue(all(f"member-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.03)
+        self.assertAlmostEqual(bloom.error_rate(), 0.01, delta=0.005)
+
+
+class BlacklistFilterTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.filter = BlacklistFilter()
+        patcher = mock.patch.object(blacklist, "blacklist_filter", self.filter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = self.create_user("+15550000001")
+        self.login(self.user)
+
+    def token(self):
+        return FilteredRefreshToken.for_user(self.user)
+
+    def logout(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/api/logout/", {"refresh": str(token)}, format="json"
+            )
+
+    def blacklisted_elsewhere(self, token):
+        """Blacklist `token` like another process would."""
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=token["jti"])
+        )
+        blacklist._bump_generation()
+
+    def test_logout_blacklists_the_token(self):
+        token = self.token()
+        self.assertEqual(self.logout(token).status_code, 200)
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+        serializer = FilteredTokenRefreshSerializer(data={"refresh": str(token)})
+        with self.assertRaises(TokenError):
+            serializer.is_valid()
+        self.assertEqual(self.logout(token).status_code, 400)
+
+    @mock.patch.object(blacklist, "shared_cache", return_value=True)
+    def test_negatives_skip_the_database_with_a_shared_cache(self, shared_cache):
+        self.logout(self.token())
+        token = self.token()
+        # loads the filter
+        FilteredRefreshToken(str(token))
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(str(token))
+        self.assertEqual(self.filter.stats()["database_checks"], 0)
+
+    @mock.patch.object(blacklist, "shared_cache", return_value=True)
+    def test_logouts_of_other_processes(self, shared_cache):
+        token = self.token()
+        FilteredRefreshToken(str(token))
+        self.blacklisted_elsewhere(token)
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+
+    def test_negatives_are_confirmed_without_a_shared_cache(self):
+        token = self.token()
+        FilteredRefreshToken(str(token))
+        # the local memory cache never hears about the other processes
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=token["jti"])
+        )
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+        self.assertEqual(self.filter.stats()["database_checks"], 2)
+
+    @mock.patch.object(blacklist, "shared_cache", return_value=True)
+    def test_false_positives_are_counted(self, shared_cache):
+        token = self.token()
+        FilteredRefreshToken(str(token))
+        with mock.patch.object(BloomFilter, "__contains__", return_value=True):
+            FilteredRefreshToken(str(token))
+        stats = self.filter.stats()
+        self.assertEqual(stats["lookups"], 2)
+        self.assertEqual(stats["database_checks"], 1)
+        self.assertEqual(stats["false_positives"], 1)
+        self.assertEqual(stats["observed_false_positive_rate"], 0.5)
+
+    def test_expired_blacklist_entries_are_not_loaded(self):
+        token = self.token()
+        self.logout(token)
+        OutstandingToken.objects.update(expires_at=timezone.now())
+        # e.g. another process starting
+        bloom = BlacklistFilter()
+        self.assertFalse(bloom.might_contain(token["jti"]))
+        self.assertEqual(bloom.stats()["items"], 0)
+
+
+class PruneTokenBlacklistTests(KYCTestCase):
+    def test_prunes_expired_tokens_only(self):
+        user = self.create_user("+15550000001")
+        tokens = [FilteredRefreshToken.for_user(user) for _ in range(5)]
+        for token in tokens[:3]:
+            token.blacklist()
+        now = timezone.now()
+        # expired out of id order
+        expired = [tokens[0]["jti"], tokens[2]["jti"], tokens[4]["jti"]]
+        OutstandingToken.objects.filter(jti__in=expired).update(
+            expires_at=now - timedelta(seconds=1)
+        )
+
+        out = io.StringIO()
+        call_command("prune_token_blacklist", batch_size=1, sleep=0, stdout=out)
+        self.assertEqual(
+            out.getvalue().strip(),
+            "Deleted 3 outstanding and 2 blacklisted tokens.",
+        )
+        self.assertCountEqual(
+            OutstandingToken.objects.values_list("jti", flat=True),
+            [tokens[1]["jti"], tokens[3]["jti"]],
+        )
+        self.assertEqual(
+            list(BlacklistedToken.objects.values_list("token__jti", flat=True)),
+            [tokens[1]["jti"]],
+        )
@@ -0,0 +1,55 @@
+from .utils import KYCTestCase
+
+
+class ConditionalGetTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("+15550000001")
+        self.login(self.user)
+
+    def test_etag_and_cache_headers(self):
+        for path in ("/api/kyc-status/", "/api/user-profile/"):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response["ETag"].startswith('"'))
+                self.assertIn("private", response["Cache-Control"])
+                self.assertIn("max-age", response["Cache-Control"])
+                self.assertIn("Authorization", response["Vary"])
+
+    def test_matching_etag_answers_304(self):
+        for path in ("/api/kyc-status/", "/api/user-profile/"):
+            with self.subTest(path=path):
+                etag = self.client.get(path)["ETag"]
+                response = self.client.get(path, headers={"if-none-match": etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertEqual(response.content, b"")
+
+    def test_a_change_gives_a_new_etag(self):
+        etag = self.client.get("/api/user-profile/")["ETag"]
+        self.user.full_name = "John Doe"
+        self.user.save()
+        response = self.client.get(
+            "/api/user-profile/", headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["full_name"], "John Doe")
+
+    def test_kyc_transition_gives_a_new_etag(self):
+        etag = self.client.get("/api/kyc-status/")["ETag"]
+        self.user.approve_kyc()
+        response = self.client.get("/api/kyc-status/", headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "Verified"})
+
+    def test_etags_differ_per_user_and_resource(self):
+        status = self.client.get("/api/kyc-status/")["ETag"]
+        profile = self.client.get("/api/user-profile/")["ETag"]
+        self.login(self.create_user("+15550000002"))
+        response = self.client.get(
+            "/api/kyc-status/", headers={"if-none-match": status}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(status, profile)
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+
+from accounts import review_queue
+from accounts.models import KYCState, OutboxEmail, ReviewClaim
+
+from .utils import KYCTestCase
+
+User = get_user_model()
+
+
+class BulkDecisionTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reviewer = self.create_admin()
+        self.users = [
+            self.create_user(
+                f"+1555000000{index}",
+                email=f"user{index}@example.com",
+                document=f"documents/{index}.pdf",
+            )
+            for index in range(1, 5)
+        ]
+        self.client.force_authenticate(self.reviewer)
+
+    def decide(self, decisions):
+        return self.client.post(
+            "/api/admin/kyc-decisions/", {"decisions": decisions}, format="json"
+        )
+
+    def test_decisions(self):
+        self.users[2].approve_kyc()
+        other_reviewer = self.create_admin("+15550000009")
+        review_queue.claim_next(other_reviewer, 1)
+        response = self.decide(
+            [
+                {"id": self.users[1].pk, "decision": "approve"},
+                {"id": self.users[2].pk, "decision": "reject", "reason": "Expired."},
+                {"id": 999999, "decision": "approve"},
+                {"id": self.users[0].pk, "decision": "approve"},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": self.users[1].pk, "status": "approved"},
+                {"id": self.users[2].pk, "status": "rejected"},
+                {"id": 999999, "status": "not_found"},
+                # the oldest user, claimed by the other reviewer
+                {"id": self.users[0].pk, "status": "claimed"},
+            ],
+        )
+
+        states = dict(User.objects.values_list("pk", "kyc_state"))
+        self.assertEqual(states[self.users[0].pk], KYCState.PENDING)
+        self.assertEqual(states[self.users[1].pk], KYCState.VERIFIED)
+        self.assertEqual(states[self.users[2].pk], KYCState.REJECTED)
+        rejected = User.objects.get(pk=self.users[2].pk)
+        self.assertEqual(rejected.kyc_rejection_reason, "Expired.")
+        self.assertEqual(rejected.version, self.users[2].version + 1)
+        self.assertEqual(
+            sorted(OutboxEmail.objects.values_list("to", flat=True)),
+            [["user2@example.com"], ["user3@example.com"]],
+        )
+
+    def test_any_state_can_be_decided_again(self):
+        self.users[0].approve_kyc()
+        self.users[1].reject_kyc("Blurry document.")
+        response = self.decide(
+            [
+                {"id": self.users[0].pk, "decision": "approve"},
+                {"id": self.users[1].pk, "decision": "reject", "reason": "Expired."},
+            ]
+        )
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["approved", "rejected"],
+        )
+        self.assertEqual(
+            User.objects.get(pk=self.users[1].pk).kyc_rejection_reason, "Expired."
+        )
+
+    def test_own_claims_are_finished(self):
+        review_queue.claim_next(self.reviewer, 2)
+        self.decide([{"id": self.users[0].pk, "decision": "approve"}])
+        self.assertEqual(
+            list(ReviewClaim.objects.values_list("user_id", flat=True)),
+            [self.users[1].pk],
+        )
+
+    def test_invalid_decisions(self):
+        for decisions in (
+            [{"id": self.users[0].pk, "decision": "reject"}],
+            [{"id": self.users[0].pk, "decision": "approve"}] * 2,
+            [],
+        ):
+            with self.subTest(decisions=decisions):
+                self.assertEqual(self.decide(decisions).status_code, 400)
+        self.assertEqual(
+            User.objects.get(pk=self.users[0].pk).kyc_state, KYCState.PENDING
+        )
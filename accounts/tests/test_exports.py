@@ -0,0 +1,86 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+
+from accounts.exports import EXPORT_FIELDS, stream_export
+
+from .utils import KYCTestCase
+
+
+class ExportTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [
+            self.create_user(f"+1555000000{index}", full_name=f"Jane Doe {index}")
+            for index in range(1, 4)
+        ]
+
+    def export(self, **params):
+        self.client.force_authenticate(self.create_admin())
+        response = self.client.get("/api/admin/users/export/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_ndjson_lists_the_users_by_id(self):
+        response, content = self.export()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        # the admin is created last
+        self.assertEqual([row["id"] for row in rows[:3]], [u.pk for u in self.users])
+        self.assertEqual(list(rows[0]), list(EXPORT_FIELDS))
+        self.assertEqual(rows[0]["full_name"], "Jane Doe 1")
+        self.assertEqual(rows[0]["kyc_state"], "pending")
+
+    def test_csv_has_a_header(self):
+        response, content = self.export(output="csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual(rows[1][:2], [str(self.users[0].pk), "Jane Doe 1"])
+        self.assertEqual(len(rows), 5)
+
+    def test_after_resumes_the_export(self):
+        _, content = self.export(after=self.users[0].pk)
+        ids = [json.loads(line)["id"] for line in content.decode().splitlines()]
+        self.assertNotIn(self.users[0].pk, ids)
+        self.assertEqual(ids[:2], [self.users[1].pk, self.users[2].pk])
+
+    def test_gzip(self):
+        response, content = self.export(gzip="true")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("users.ndjson.gz", response["Content-Disposition"])
+        self.assertEqual(gzip.decompress(content), b"".join(stream_export("ndjson")))
+
+    def test_chunks_are_flushed_by_size(self):
+        for index in range(200):
+            self.create_user(f"+1555100{index:04d}", full_name="x" * 200)
+        chunks = list(stream_export("ndjson", chunk_size=50))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) >= 64 * 1024 for chunk in chunks[:-1]))
+
+    def test_invalid_format(self):
+        self.client.force_authenticate(self.create_admin())
+        response = self.client.get("/api/admin/users/export/", {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get("/api/admin/users/export/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "users.csv")
+            call_command(
+                "export_users", format="csv", output=path, stderr=io.StringIO()
+            )
+            with open(path, newline="") as export:
+                rows = list(csv.reader(export))
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual(len(rows), 4)
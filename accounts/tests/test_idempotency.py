@@ -0,0 +1,117 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+
+from accounts import idempotency
+from accounts.models import IdempotencyRecord
+
+from .utils import PDF, KYCTestCase
+
+User = get_user_model()
+
+
+class IdempotencyTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.key = str(uuid.uuid4())
+
+    def signup(self, key=None, address="203.0.113.1", **fields):
+        data = {
+            "phone_number": "+15550000001",
+            "password": "Secret-pass-123",
+            "full_name": "Jane Doe",
+            "document": SimpleUploadedFile("id.pdf", PDF, "application/pdf"),
+            **fields,
+        }
+        return self.client.post(
+            "/api/signup/",
+            data,
+            HTTP_IDEMPOTENCY_KEY=key or self.key,
+            REMOTE_ADDR=address,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.signup()
+        self.assertEqual(first.status_code, 201)
+
+        retry = self.signup()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], "true")
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.signup()
+        response = self.signup(full_name="John Doe")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json(), {"error": idempotency.MISMATCH_MESSAGE})
+
+    @override_settings(IDEMPOTENCY_RETRY_AFTER_SECONDS=3)
+    def test_retry_of_a_request_in_flight(self):
+        self.signup()
+        # as if the first request were still running
+        IdempotencyRecord.objects.update(status_code=None, response=None)
+
+        response = self.signup()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(response.json(), {"error": idempotency.IN_FLIGHT_MESSAGE})
+
+    def test_anonymous_keys_are_scoped_to_the_client(self):
+        self.assertEqual(self.signup().status_code, 201)
+        response = self.signup(address="198.51.100.7", phone_number="+15550000002")
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn(idempotency.REPLAYED_HEADER, response)
+        self.assertEqual(
+            set(IdempotencyRecord.objects.values_list("scope", flat=True)),
+            {"anon:203.0.113.1", "anon:198.51.100.7"},
+        )
+
+    def test_anonymous_key_must_be_a_uuid(self):
+        response = self.signup(key="retry-1")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": idempotency.ANONYMOUS_KEY_MESSAGE})
+        self.assertFalse(User.objects.exists())
+
+    def test_key_too_long(self):
+        response = self.signup(key="x" * (idempotency.MAX_KEY_LENGTH + 1))
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_request_releases_the_key(self):
+        self.assertEqual(self.signup(full_name="").status_code, 400)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertEqual(self.signup().status_code, 201)
+
+
+@override_settings(IDEMPOTENCY_IN_FLIGHT_SECONDS=60, IDEMPOTENCY_KEY_TTL=3600)
+class IdempotencyLeaseTests(KYCTestCase):
+    def claim(self):
+        return idempotency.claim("user:1", "key", "fingerprint")
+
+    def expires_in(self, record):
+        record.refresh_from_db()
+        return (record.expires_at - timezone.now()).total_seconds()
+
+    def test_key_in_flight_is_leased(self):
+        state, record = self.claim()
+        self.assertEqual(state, idempotency.NEW)
+        self.assertAlmostEqual(self.expires_in(record), 60, delta=5)
+
+        idempotency.complete(record, 201, {"id": 1})
+        self.assertAlmostEqual(self.expires_in(record), 3600, delta=5)
+        self.assertEqual(self.claim()[0], idempotency.COMPLETED)
+
+    def test_expired_lease_is_claimed_again(self):
+        _, record = self.claim()
+        self.assertEqual(self.claim()[0], idempotency.IN_FLIGHT)
+        # the worker died with the key
+        IdempotencyRecord.objects.update(expires_at=timezone.now())
+
+        state, new_record = self.claim()
+        self.assertEqual(state, idempotency.NEW)
+        # the late response of the first request doesn't complete the new one
+        idempotency.complete(record, 201, {"id": 1})
+        self.assertEqual(self.claim()[0], idempotency.IN_FLIGHT)
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+
+from accounts import stats
+
+from .utils import KYCTestCase
+
+User = get_user_model()
+
+CSV_HEADER = "phone_number,full_name,email,email_id,password\n"
+
+
+class ImportUsersTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def import_users(self, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_users", path, workers=1, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def phone_numbers(self):
+        return set(User.objects.values_list("phone_number", flat=True))
+
+    def test_csv_import(self):
+        self.create_user("+15550000009", email_id="taken@example.com")
+        path = self.write(
+            "users.csv",
+            CSV_HEADER
+            + "+15550000001,Jane Doe,jane@example.com,jane@example.com,Secret-1\n"
+            # the same phone number, and the same email_id, in the file
+            + "+15550000001,Jane Again,,,\n"
+            + "+15550000002,John Doe,,jane@example.com,\n"
+            # taken by an existing user
+            + "+15550000009,Existing,,,\n"
+            + "+15550000003,Other,,taken@example.com,\n"
+            + ",No Phone,,,\n"
+            + "+15550000004,Max Doe,,,\n",
+        )
+        rejects = os.path.join(self.directory, "rejects.ndjson")
+
+        out, _ = self.import_users(path, chunk_size=100, rejects=rejects)
+        self.assertIn("Imported 2 users from 7 rows", out)
+        self.assertIn("2 existing, 2 duplicates, 1 invalid.", out)
+        self.assertEqual(
+            self.phone_numbers(), {"+15550000001", "+15550000004", "+15550000009"}
+        )
+
+        jane = User.objects.get(phone_number="+15550000001")
+        self.assertEqual(jane.full_name, "Jane Doe")
+        self.assertTrue(jane.check_password("Secret-1"))
+        self.assertFalse(
+            User.objects.get(phone_number="+15550000004").has_usable_password()
+        )
+        # bulk_create sends no post_save, the statistics count the import
+        self.assertEqual(stats.kyc_stats(1)["daily"][0]["signups"], 3)
+
+        with open(rejects) as file:
+            rejected = [json.loads(line) for line in file]
+        self.assertEqual([row["line"] for row in rejected], [7])
+        self.assertIn("phone_number", rejected[0]["errors"])
+
+    def test_duplicates_across_chunks(self):
+        path = self.write(
+            "users.ndjson",
+            "\n".join(
+                json.dumps(row)
+                for row in (
+                    {"phone_number": "+15550000001", "full_name": "A"},
+                    {"phone_number": "+15550000001", "full_name": "B"},
+                    {"phone_number": "+15550000002", "full_name": "C"},
+                )
+            )
+            + "\nnot json\n",
+        )
+        out, _ = self.import_users(path, chunk_size=1)
+        self.assertIn("Imported 2 users from 4 rows", out)
+        self.assertIn("0 existing, 1 duplicates, 1 invalid.", out)
+        self.assertEqual(User.objects.get(phone_number="+15550000001").full_name, "A")
+
+    def test_checkpoint(self):
+        path = self.write(
+            "users.csv",
+            CSV_HEADER + "".join(f"+1555000000{i},User {i},,,\n" for i in range(1, 6)),
+        )
+        checkpoint = os.path.join(self.directory, "checkpoint.json")
+
+        self.import_users(path, chunk_size=2, checkpoint=checkpoint)
+        with open(checkpoint) as file:
+            self.assertEqual(
+                json.load(file), {"input": os.path.abspath(path), "line": 6}
+            )
+
+        # as if the import stopped after the first chunk
+        User.objects.filter(phone_number__gt="+15550000002").delete()
+        with open(checkpoint, "w") as file:
+            json.dump({"input": os.path.abspath(path), "line": 3}, file)
+        out, err = self.import_users(path, chunk_size=2, checkpoint=checkpoint)
+        self.assertIn("Resuming after line 3.", err)
+        self.assertIn("Imported 3 users from 3 rows", out)
+        self.assertEqual(len(self.phone_numbers()), 5)
+
+    def test_checkpoint_of_another_file(self):
+        path = self.write("users.csv", CSV_HEADER)
+        checkpoint = self.write(
+            "checkpoint.json", json.dumps({"input": "/elsewhere.csv", "line": 3})
+        )
+        with self.assertRaises(CommandError):
+            self.import_users(path, checkpoint=checkpoint)
+
+    def test_format_must_be_known(self):
+        path = self.write("users.txt", "")
+        with self.assertRaises(CommandError):
+            self.import_users(path)
+        out, _ = self.import_users(path, import_format="csv")
+        self.assertIn("Imported 0 users from 0 rows", out)
@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from accounts.models import KYCState, KYC_APPROVE_FROM
+from accounts.views import KYC_CONFLICT_MESSAGE
+
+from .utils import KYCTestCase
+
+User = get_user_model()
+
+
+class KYCTransitionTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("+15550000001", document="documents/id.pdf")
+
+    def test_transition_bumps_the_version(self):
+        self.assertTrue(self.user.approve_kyc())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_state, KYCState.VERIFIED)
+        self.assertTrue(self.user.is_kyc_verified)
+        self.assertEqual(self.user.version, 1)
+
+    def test_concurrent_saves_get_their_own_version(self):
+        first = User.objects.get(pk=self.user.pk)
+        second = User.objects.get(pk=self.user.pk)
+        first.full_name = "John Doe"
+        first.save()
+        second.email = "jane@example.com"
+        second.save(update_fields=["email"])
+
+        self.assertEqual((first.version, second.version), (1, 2))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.version, 2)
+
+    def test_failed_save_keeps_the_version(self):
+        self.create_user("+15550000002")
+        self.user.phone_number = "+15550000002"
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.user.save()
+        self.assertEqual(self.user.version, 0)
+
+    def test_stale_transition_is_lost(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.assertTrue(self.user.reject_kyc("Blurry document."))
+
+        self.assertFalse(stale.approve_kyc())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_state, KYCState.REJECTED)
+        self.assertEqual(self.user.kyc_rejection_reason, "Blurry document.")
+        self.assertEqual(self.user.version, 1)
+
+    def test_transition_from_another_state_makes_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                self.user.transition_kyc([KYCState.REJECTED], KYCState.VERIFIED)
+            )
+
+    def test_verified_user_can_be_approved_again(self):
+        self.assertIn(KYCState.VERIFIED, KYC_APPROVE_FROM)
+        self.client.force_authenticate(self.create_admin())
+        for _ in range(2):
+            response = self.client.post(f"/api/admin/approve-kyc/{self.user.pk}/")
+            self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_state, KYCState.VERIFIED)
+
+    def test_concurrent_change_answers_409(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.user.reject_kyc("Blurry document.")
+        self.client.force_authenticate(self.create_admin())
+
+        # the rejection commits between the view's read and its update
+        with mock.patch("accounts.views.get_object_or_404", return_value=stale):
+            response = self.client.post(f"/api/admin/approve-kyc/{self.user.pk}/")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {"error": KYC_CONFLICT_MESSAGE})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_state, KYCState.REJECTED)
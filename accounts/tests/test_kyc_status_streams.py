@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from project.asgi import application
+
+from .utils import KYCTransactionTestCase
+
+
+class ASGIRequest:
+    """A GET request to the ASGI application, left open until close()."""
+
+    def __init__(self, path, query="", token=None):
+        headers = [(b"host", b"testserver")]
+        if token is not None:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        self.messages = asyncio.Queue()
+        self.requested = False
+        self.disconnected = asyncio.Event()
+        self.task = asyncio.create_task(
+            application(scope, self.receive, self.messages.put)
+        )
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def start(self):
+        message = await asyncio.wait_for(self.messages.get(), 5)
+        return message["status"]
+
+    async def chunk(self):
+        message = await asyncio.wait_for(self.messages.get(), 5)
+        return message["body"].decode()
+
+    async def json(self):
+        status = await self.start()
+        body = ""
+        while True:
+            message = await asyncio.wait_for(self.messages.get(), 5)
+            body += message["body"].decode()
+            if not message.get("more_body"):
+                break
+        await self.close()
+        return status, json.loads(body)
+
+    async def close(self):
+        self.disconnected.set()
+        await asyncio.wait_for(self.task, 5)
+
+
+# the waiters' throttle writes would lock the in-memory SQLite tables
+@override_settings(
+    KYC_EVENTS_POLL_INTERVAL=0.05,
+    KYC_EVENTS_KEEPALIVE_SECONDS=60,
+    THROTTLE_STORE="cache",
+)
+class KYCStatusStreamTests(KYCTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [self.create_user(f"+1555000000{i}") for i in range(1, 4)]
+        self.tokens = [
+            str(RefreshToken.for_user(user).access_token) for user in self.users
+        ]
+        self.user, self.token = self.users[0], self.tokens[0]
+
+    def tearDown(self):
+        # the LISTEN connection must be gone before the test database is
+        for thread in threading.enumerate():
+            if thread.name == "kyc-listen":
+                thread.join()
+        super().tearDown()
+
+    def wait(self, query="kyc_state=pending&timeout=5", token=None):
+        return ASGIRequest("/api/kyc-status/wait/", query, token=token or self.token)
+
+    async def approve(self):
+        await sync_to_async(self.user.approve_kyc)()
+
+    async def test_wait_returns_a_different_state_right_away(self):
+        status, data = await self.wait("kyc_state=verified").json()
+        self.assertEqual(status, 200)
+        self.assertEqual(data, {"status": "Not Verified", "kyc_state": "pending"})
+
+    async def test_wait_returns_on_change(self):
+        request = self.wait()
+        await asyncio.sleep(0.2)
+        self.assertFalse(request.task.done())
+        await self.approve()
+        status, data = await request.json()
+        self.assertEqual(status, 200)
+        self.assertEqual(data, {"status": "Verified", "kyc_state": "verified"})
+
+    async def test_wait_times_out(self):
+        status, data = await self.wait("kyc_state=pending&timeout=0.1").json()
+        self.assertEqual(status, 200)
+        self.assertEqual(data["kyc_state"], "pending")
+
+    async def test_wait_rejects_an_invalid_timeout(self):
+        status, data = await self.wait("kyc_state=pending&timeout=soon").json()
+        self.assertEqual(status, 400)
+        self.assertIn("timeout", data)
+
+    async def test_authentication_is_required(self):
+        request = ASGIRequest("/api/kyc-status/wait/", "kyc_state=pending")
+        status, _ = await request.json()
+        self.assertEqual(status, 401)
+        request = ASGIRequest("/api/kyc-status/events/")
+        status, _ = await request.json()
+        self.assertEqual(status, 401)
+
+    async def test_events(self):
+        request = ASGIRequest("/api/kyc-status/events/", token=self.token)
+        self.assertEqual(await request.start(), 200)
+        self.assertEqual(await request.chunk(), "retry: 5000\n\n")
+        self.assertEqual(
+            await request.chunk(),
+            'event: kyc-status\ndata: {"status": "Not Verified", '
+            '"kyc_state": "pending"}\n\n',
+        )
+        await self.approve()
+        self.assertEqual(
+            await request.chunk(),
+            'event: kyc-status\ndata: {"status": "Verified", '
+            '"kyc_state": "verified"}\n\n',
+        )
+        await request.close()
+
+    async def test_many_waiters_share_threads_and_connections(self):
+        threads = threading.active_count()
+        backends = await sync_to_async(self.backends)()
+        # 50 waiters per user stay within the user throttle
+        requests = [self.wait(token=token) for token in self.tokens for _ in range(50)]
+        await asyncio.sleep(0.5)
+        self.assertFalse(any(request.task.done() for request in requests))
+        # the thread pool, the shared sync thread and the listener, and at
+        # most one connection each
+        self.assertLess(threading.active_count() - threads, 40)
+        if backends is not None:
+            self.assertLess(await sync_to_async(self.backends)() - backends, 40)
+
+        for user in self.users:
+            await sync_to_async(user.approve_kyc)()
+        for request in requests:
+            status, data = await request.json()
+            self.assertEqual(status, 200)
+            self.assertEqual(data["kyc_state"], "verified")
+
+    @staticmethod
+    def backends():
+        """Connections open to the database, on PostgreSQL."""
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity "
+                "WHERE datname = current_database()"
+            )
+            return cursor.fetchone()[0]
@@ -0,0 +1,156 @@
+import io
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.ledger import (
+    AttemptWriter,
+    default_months,
+    month_start,
+    partition_name,
+    partitions,
+)
+from accounts.management.commands.manage_kyc_attempts import Command
+from accounts.models import KYCAttempt
+
+from .utils import KYCTestCase
+
+
+def attempt(**fields):
+    return {"user_id": 1, "document_sha256": "0" * 64, "decision": "verified", **fields}
+
+
+class AttemptWriterTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.writer = AttemptWriter()
+        # written by flush(), from the test's thread
+        patcher = mock.patch.object(self.writer, "_start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(KYC_ATTEMPT_BATCH_SIZE=2)
+    def test_queued_attempts_are_written_in_batches(self):
+        for decision in ("verified", "name_mismatch", "verified"):
+            self.writer.record(**attempt(decision=decision))
+        self.assertFalse(KYCAttempt.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.writer.flush()
+        self.assertEqual(self.writer.stats()["queued"], 1)
+        self.writer.flush()
+        self.assertCountEqual(
+            KYCAttempt.objects.values_list("decision", flat=True),
+            ["verified", "name_mismatch", "verified"],
+        )
+        self.assertEqual(
+            self.writer.stats(),
+            {"queued": 0, "written": 3, "dropped": 0, "failed": 0},
+        )
+
+    @override_settings(KYC_ATTEMPT_QUEUE_SIZE=1)
+    def test_full_queue_drops_attempts(self):
+        writer = AttemptWriter()
+        with mock.patch.object(writer, "_start"):
+            writer.record(**attempt())
+            writer.record(**attempt())
+        self.assertEqual(writer.stats()["queued"], 1)
+        self.assertEqual(writer.stats()["dropped"], 1)
+
+    def test_failed_insert_is_counted(self):
+        self.writer.record(**attempt())
+        # the connection is closed to reconnect on the next batch
+        with mock.patch.object(
+            QuerySet, "bulk_create", side_effect=DatabaseError
+        ), mock.patch.object(connection, "close"), self.assertLogs("accounts.ledger"):
+            self.writer.flush()
+        self.assertEqual(
+            self.writer.stats(),
+            {"queued": 0, "written": 0, "dropped": 1, "failed": 1},
+        )
+
+
+class RetentionTests(KYCTestCase):
+    def test_rows_before_the_oldest_month_are_deleted(self):
+        start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        for created_at in (
+            start - timedelta(days=40),
+            start - timedelta(microseconds=1),
+            start,
+            start + timedelta(days=1),
+        ):
+            KYCAttempt.objects.create(**attempt(created_at=created_at))
+
+        out = io.StringIO()
+        command = Command(stdout=out)
+        with CaptureQueriesContext(connection) as queries:
+            command._delete_before(start.date(), batch_size=1)
+        # compares the column itself, the created_at index applies
+        self.assertIn('."created_at" < ', queries[0]["sql"])
+        self.assertEqual(out.getvalue(), "Deleted 2 KYC attempts.\n")
+        self.assertEqual(
+            sorted(KYCAttempt.objects.values_list("created_at", flat=True)),
+            [start, start + timedelta(days=1)],
+        )
+
+    @skipUnless(connection.vendor != "postgresql", "PostgreSQL drops partitions")
+    def test_command_deletes_old_rows(self):
+        old = timezone.now() - timedelta(days=500)
+        KYCAttempt.objects.create(**attempt(created_at=old))
+        KYCAttempt.objects.create(**attempt())
+        out = io.StringIO()
+        call_command("manage_kyc_attempts", retention_months=12, stdout=out)
+        self.assertEqual(out.getvalue(), "Deleted 1 KYC attempts.\n")
+        self.assertEqual(KYCAttempt.objects.count(), 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "partitioning is PostgreSQL only")
+class PartitionTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.current = month_start(timezone.now().date())
+
+    def manage(self, **options):
+        out = io.StringIO()
+        call_command("manage_kyc_attempts", stdout=out, **options)
+        return out.getvalue()
+
+    def in_month(self, month):
+        return datetime(month.year, month.month, 15, tzinfo=dt_timezone.utc)
+
+    def test_partitions_are_created_ahead(self):
+        self.manage(months_ahead=2, retention_months=12)
+        months = partitions(connection)
+        for offset in range(3):
+            self.assertIn(month_start(self.current, offset), months)
+        self.assertEqual(months[self.current], partition_name(self.current))
+
+    def test_default_rows_get_their_partition(self):
+        self.manage(months_ahead=0, retention_months=12)
+        month = month_start(self.current, -3)
+        self.assertNotIn(month, partitions(connection))
+        KYCAttempt.objects.create(**attempt(created_at=self.in_month(month)))
+        self.assertEqual(default_months(connection), [month])
+
+        output = self.manage(months_ahead=0, retention_months=12)
+        self.assertIn(f"Created partition for {month:%Y-%m}.", output)
+        self.assertIn(month, partitions(connection))
+        self.assertEqual(default_months(connection), [])
+        # still there, in the partition of its month
+        self.assertEqual(KYCAttempt.objects.count(), 1)
+
+    def test_old_partitions_are_dropped(self):
+        old = month_start(self.current, -2)
+        KYCAttempt.objects.create(**attempt(created_at=self.in_month(old)))
+        KYCAttempt.objects.create(**attempt())
+
+        output = self.manage(months_ahead=0, retention_months=1)
+        self.assertIn(f"Dropped partition for {old:%Y-%m}.", output)
+        self.assertNotIn(old, partitions(connection))
+        self.assertEqual(KYCAttempt.objects.count(), 1)
@@ -0,0 +1,149 @@
+import os
+import time
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from rest_framework.throttling import SimpleRateThrottle
+
+from accounts import media
+from accounts.models import ThrottleBucket
+
+from .utils import PDF, KYCTestCase
+
+
+class SignedURLTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.name = default_storage.save("documents/id.pdf", ContentFile(PDF))
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.status_code == 200:
+            response.body = b"".join(response.streaming_content)
+        return response
+
+    def test_signed_url_serves_the_file(self):
+        url = default_storage.url(self.name)
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, PDF)
+
+    def test_url_builder_matches_url(self):
+        build = default_storage.url_builder()
+        self.assertEqual(build(self.name), default_storage.url(self.name))
+
+    def test_name_is_content_addressed(self):
+        self.assertRegex(
+            self.name, r"^documents/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$"
+        )
+        self.assertEqual(
+            default_storage.save("documents/copy.pdf", ContentFile(PDF)), self.name
+        )
+
+    def test_tampered_signature(self):
+        url = default_storage.url(self.name)
+        tampered = url[:-1] + ("0" if url[-1] != "0" else "1")
+        self.assertEqual(self.get(tampered).status_code, 403)
+
+    def test_signature_of_another_file(self):
+        other = default_storage.save("documents/other.pdf", ContentFile(PDF + b"\n"))
+        query = urlsplit(default_storage.url(other)).query
+        url = f"{settings.MEDIA_URL}{self.name}?{query}"
+        self.assertEqual(self.get(url).status_code, 403)
+
+    def test_expired_url(self):
+        signed_at = time.time() - 3 * settings.MEDIA_URL_TTL_SECONDS
+        with mock.patch("accounts.media.time.time", return_value=signed_at):
+            url = default_storage.url(self.name)
+        expires = int(parse_qs(urlsplit(url).query)["expires"][0])
+        self.assertLess(expires, time.time())
+        self.assertEqual(self.get(url).status_code, 403)
+
+    def test_url_is_valid_for_one_to_two_ttls(self):
+        ttl = settings.MEDIA_URL_TTL_SECONDS
+        now = time.time()
+        self.assertGreater(media.expiry(now), now + ttl)
+        self.assertLessEqual(media.expiry(now), now + 2 * ttl)
+
+    def test_unsigned_anonymous_request(self):
+        self.assertEqual(self.get(f"{settings.MEDIA_URL}{self.name}").status_code, 401)
+
+    @mock.patch.object(
+        SimpleRateThrottle, "THROTTLE_RATES", {"user": "3/minute", "anon": "3/minute"}
+    )
+    def test_downloads_are_not_throttled(self):
+        url = default_storage.url(self.name)
+        for _ in range(5):
+            self.assertEqual(self.get(url).status_code, 200)
+        self.assertFalse(ThrottleBucket.objects.exists())
+
+
+class GCMediaTests(KYCTestCase):
+    # code point order, which differs from most locales' collations
+    REFERENCED = [
+        "documents/Z.pdf",
+        "documents/a/b.pdf",
+        "documents/ä.pdf",
+        "profile_photos/thumb.webp",
+    ]
+    UNREFERENCED = [
+        "documents/B.pdf",
+        "documents/a.pdf",
+        "documents/a-b.pdf",
+        "documents/z.pdf",
+        "profile_photos/list.webp",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        old = time.time() - 7 * 86400
+        for name in self.REFERENCED + self.UNREFERENCED:
+            path = default_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"x")
+            os.utime(path, (old, old))
+        self.create_user("+15550000001", document="documents/Z.pdf")
+        self.create_user(
+            "+15550000002",
+            document="documents/a/b.pdf",
+            profile_photo_renditions={
+                "thumb": {
+                    "width": 96,
+                    "height": 96,
+                    "jpeg": "profile_photos/thumb.jpg",
+                    "webp": "profile_photos/thumb.webp",
+                }
+            },
+        )
+        self.create_user("+15550000003", document="documents/ä.pdf")
+
+    def stored(self):
+        return {name for name, _ in media.stored_names(settings.MEDIA_ROOT)}
+
+    def test_references_and_files_are_streamed_in_the_same_order(self):
+        names = [name for name, _ in media.stored_names(settings.MEDIA_ROOT)]
+        self.assertEqual(names, sorted(names))
+        references = list(media.referenced_names())
+        self.assertEqual(references, sorted(references))
+
+    def test_deletes_only_unreferenced_files(self):
+        recent = default_storage.path("documents/recent.pdf")
+        with open(recent, "wb") as file:
+            file.write(b"x")
+        self.addCleanup(os.unlink, recent)
+
+        call_command("gc_media", stdout=StringIO())
+
+        self.assertEqual(self.stored(), {*self.REFERENCED, "documents/recent.pdf"})
+
+    def test_dry_run(self):
+        output = StringIO()
+        call_command("gc_media", "--dry-run", stdout=output)
+        self.assertIn("Would delete 5 of 9 files", output.getvalue())
+        self.assertEqual(self.stored(), {*self.REFERENCED, *self.UNREFERENCED})
@@ -0,0 +1,104 @@
+import io
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from accounts import outbox
+from accounts.models import OutboxEmail
+from accounts.notifications import kyc_decision_message, queue_messages
+
+from .utils import KYCTestCase
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException("Service unavailable")
+
+
+@override_settings(
+    OUTBOX_RETRY_BASE_SECONDS=30, OUTBOX_RETRY_MAX_SECONDS=3600, OUTBOX_MAX_ATTEMPTS=3
+)
+class OutboxTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        queue_messages([kyc_decision_message("jane@example.com", True)])
+        self.email = OutboxEmail.objects.get()
+
+    def dispatch(self):
+        dispatcher = outbox.Dispatcher(connections=2)
+        try:
+            return dispatcher.dispatch()
+        finally:
+            dispatcher.close()
+
+    def test_sent_email(self):
+        self.assertEqual(self.dispatch(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ["jane@example.com"])
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.SENT)
+        self.assertIsNone(self.email.leased_until)
+        # sent emails are not sent again
+        self.assertEqual(self.dispatch(), (0, 0))
+
+    def test_retry_delay_backs_off_exponentially(self):
+        with mock.patch("accounts.outbox.random.uniform", return_value=1.0):
+            self.assertEqual(
+                [outbox.retry_delay(attempts) for attempts in (1, 2, 3, 20)],
+                [30, 60, 120, 3600],
+            )
+
+    @override_settings(EMAIL_BACKEND=f"{__name__}.FailingEmailBackend")
+    def test_failed_email_is_retried_later(self):
+        before = timezone.now()
+        with self.assertLogs("accounts.outbox", "WARNING"):
+            self.assertEqual(self.dispatch(), (0, 1))
+
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.PENDING)
+        self.assertEqual(self.email.attempts, 1)
+        self.assertIn("Service unavailable", self.email.last_error)
+        self.assertIsNone(self.email.leased_until)
+        # 30 seconds, with jitter
+        self.assertGreaterEqual(self.email.available_at, before + timedelta(seconds=24))
+        self.assertLessEqual(
+            self.email.available_at, timezone.now() + timedelta(seconds=36)
+        )
+        # not due yet
+        self.assertEqual(self.dispatch(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND=f"{__name__}.FailingEmailBackend")
+    def test_gives_up_after_the_max_attempts(self):
+        OutboxEmail.objects.update(attempts=2)
+        with self.assertLogs("accounts.outbox", "ERROR") as logs:
+            self.dispatch()
+        self.assertIn("Giving up on outbox email", logs.output[-1])
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.FAILED)
+        self.assertEqual(self.email.attempts, 3)
+
+    def test_leased_email_is_skipped_until_the_lease_expires(self):
+        OutboxEmail.objects.update(leased_until=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(self.dispatch(), (0, 0))
+
+        OutboxEmail.objects.update(leased_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.dispatch(), (1, 0))
+
+    def test_dispatch_command(self):
+        queue_messages([kyc_decision_message("john@example.com", False, "Blurry")])
+        err = io.StringIO()
+        # it would close the connection of the test's transaction
+        with mock.patch(
+            "accounts.management.commands.dispatch_outbox.close_old_connections"
+        ):
+            call_command("dispatch_outbox", once=True, stderr=err, stdout=io.StringIO())
+        self.assertIn("Sent 2 emails, 0 failed.", err.getvalue())
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["jane@example.com", "john@example.com"],
+        )
@@ -0,0 +1,125 @@
+import io
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+
+from accounts import utils
+from accounts.management.commands.benchmark_verification import FakeProvider
+from accounts.renditions import render, rendition_names, save_renditions
+
+from .utils import KYCTestCase
+
+User = get_user_model()
+
+
+def photo(size=(800, 400), mode="RGBA"):
+    image = io.BytesIO()
+    Image.new(mode, size, "red").save(image, format="PNG")
+    return image.getvalue()
+
+
+class RenderTests(KYCTestCase):
+    def test_sizes_keep_the_aspect_ratio(self):
+        renditions = render(photo())
+        self.assertEqual(
+            {name: (r["width"], r["height"]) for name, r in renditions.items()},
+            {"thumb": (96, 48), "list": (240, 120), "detail": (640, 320)},
+        )
+        with Image.open(io.BytesIO(renditions["detail"]["jpeg"])) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (640, 320))
+            self.assertTrue(image.info.get("progressive"))
+        with Image.open(io.BytesIO(renditions["detail"]["webp"])) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (640, 320))
+
+    def test_small_photos_are_not_enlarged(self):
+        renditions = render(photo((50, 60), mode="P"))
+        for rendition in renditions.values():
+            self.assertEqual((rendition["width"], rendition["height"]), (50, 60))
+
+    def test_saved_by_content_next_to_the_photos(self):
+        renditions = save_renditions(photo())
+        names = rendition_names(renditions)
+        self.assertEqual(len(names), 6)
+        for name in names:
+            self.assertRegex(name, r"^profile_photos/.+\.(jpg|webp)$")
+            self.assertTrue(default_storage.exists(name))
+        # the same photo gives the same files
+        self.assertEqual(save_renditions(photo()), renditions)
+
+
+class ProfilePhotoRenditionsTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        # FakeProvider reads "JOHN" on every document
+        self.user = self.create_user("+15550000001", full_name="John")
+        self.login(self.user)
+        provider = FakeProvider(0)
+        for name in ("textract_client", "rekognition_client"):
+            patcher = mock.patch.object(utils, name, provider)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_verification_renders_the_profile_photo(self):
+        response = self.client.post(
+            "/api/upload-document/",
+            {"document": SimpleUploadedFile("id.png", photo(mode="RGB"), "image/png")},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(
+            set(self.user.profile_photo_renditions), {"thumb", "list", "detail"}
+        )
+
+        renditions = self.client.get("/api/user-profile/").json()[
+            "profile_photo_renditions"
+        ]
+        # smallest first, with signed URLs
+        self.assertEqual(list(renditions), ["thumb", "list", "detail"])
+        for rendition in renditions.values():
+            self.assertIn("signature=", rendition["jpeg"])
+            self.assertIn("signature=", rendition["webp"])
+            response = self.client.get(rendition["webp"])
+            self.assertEqual(response.status_code, 200)
+
+    def test_admin_list_shows_the_thumbnail(self):
+        self.user.profile_photo_renditions = save_renditions(photo())
+        self.user.save()
+        self.client.force_login(self.create_admin())
+        response = self.client.get("/admin/accounts/user/")
+        self.assertContains(response, '<source srcset="', count=1)
+        self.assertContains(response, 'width="96" height="48"')
+
+
+class RenderProfilePhotosCommandTests(KYCTestCase):
+    def render_photos(self, *args):
+        out = io.StringIO()
+        call_command("render_profile_photos", *args, stdout=out)
+        return out.getvalue()
+
+    def test_photos_without_renditions(self):
+        name = default_storage.save("profile_photos/face.png", ContentFile(photo()))
+        user = self.create_user("+15550000001", profile_photo=name)
+        self.create_user("+15550000002", profile_photo="profile_photos/gone.png")
+        self.create_user("+15550000003")
+
+        output = self.render_photos()
+        self.assertEqual(output, "Rendered 1 profile photos, 1 missing files.\n")
+        rendered = User.objects.get(pk=user.pk)
+        self.assertEqual(rendered.profile_photo_renditions["thumb"]["width"], 96)
+        # the cached profiles are invalidated
+        self.assertEqual(rendered.version, user.version + 1)
+
+        self.assertEqual(
+            self.render_photos(), "Rendered 0 profile photos, 1 missing files.\n"
+        )
+        self.assertEqual(
+            self.render_photos("--all"),
+            "Rendered 1 profile photos, 1 missing files.\n",
+        )
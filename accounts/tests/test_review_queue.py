@@ -0,0 +1,163 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts import review_queue
+from accounts.models import ReviewClaim
+
+from .utils import KYCTestCase, KYCTransactionTestCase
+
+User = get_user_model()
+
+
+class ReviewQueueMixin:
+    def setUp(self):
+        super().setUp()
+        self.reviewer = self.create_admin("+15550000000")
+        self.other_reviewer = self.create_admin("+15550000009")
+        now = timezone.now()
+        self.pending = [
+            self.create_user(
+                f"+1555000000{index}",
+                document=f"documents/{index}.pdf",
+                date_joined=now - timedelta(hours=10 - index),
+            )
+            for index in range(1, 5)
+        ]
+        # not in the queue
+        self.create_user("+15550000005")
+
+
+class ReviewQueueTests(ReviewQueueMixin, KYCTestCase):
+    def expire(self, user):
+        ReviewClaim.objects.filter(user=user).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claims_the_oldest_users(self):
+        claims = review_queue.claim_next(self.reviewer, 2)
+        self.assertEqual(
+            [claim.user_id for claim in claims], [u.pk for u in self.pending[:2]]
+        )
+
+    def test_reviewers_never_claim_the_same_users(self):
+        first = review_queue.claim_next(self.reviewer, 3)
+        second = review_queue.claim_next(self.other_reviewer, 3)
+        self.assertEqual([claim.user_id for claim in second], [self.pending[3].pk])
+        self.assertFalse(
+            {claim.user_id for claim in first} & {claim.user_id for claim in second}
+        )
+        self.assertEqual(review_queue.claim_next(self.other_reviewer, 3), [])
+
+    def test_claim_committed_after_the_candidates_were_read_is_kept(self):
+        review_queue.claim_next(self.other_reviewer, 1)
+        # candidates read before the other reviewer's claim committed
+        candidates = [user.pk for user in self.pending[:2]]
+        with mock.patch.object(review_queue, "_claimable", return_value=candidates):
+            claims = review_queue.claim_next(self.reviewer, 2)
+
+        self.assertEqual([claim.user_id for claim in claims], [self.pending[1].pk])
+        claim = ReviewClaim.objects.get(user=self.pending[0])
+        self.assertEqual(claim.reviewer, self.other_reviewer)
+
+    def test_expired_claim_is_reclaimed(self):
+        review_queue.claim_next(self.reviewer, 1)
+        self.expire(self.pending[0])
+
+        claims = review_queue.claim_next(self.other_reviewer, 1)
+        self.assertEqual([claim.user_id for claim in claims], [self.pending[0].pk])
+        claim = ReviewClaim.objects.get(user=self.pending[0])
+        self.assertEqual(claim.reviewer, self.other_reviewer)
+        self.assertGreater(claim.expires_at, timezone.now())
+
+    def test_heartbeat_extends_only_active_claims(self):
+        review_queue.claim_next(self.reviewer, 2)
+        self.expire(self.pending[1])
+        before = ReviewClaim.objects.get(user=self.pending[0]).expires_at
+
+        renewed = review_queue.heartbeat(
+            self.reviewer, [user.pk for user in self.pending[:2]]
+        )
+        self.assertEqual(renewed, [self.pending[0].pk])
+        self.assertGreaterEqual(
+            ReviewClaim.objects.get(user=self.pending[0]).expires_at, before
+        )
+        self.assertLess(
+            ReviewClaim.objects.get(user=self.pending[1]).expires_at, timezone.now()
+        )
+
+    def test_released_users_are_claimable(self):
+        review_queue.claim_next(self.reviewer, 1)
+        review_queue.release(self.reviewer, [self.pending[0].pk])
+        claims = review_queue.claim_next(self.other_reviewer, 1)
+        self.assertEqual(claims[0].user_id, self.pending[0].pk)
+
+    def test_claim_endpoint(self):
+        self.client.force_authenticate(self.reviewer)
+        response = self.client.post(
+            "/api/admin/review-queue/claim/", {"count": 2}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [claim["user"]["id"] for claim in response.json()["claims"]],
+            [user.pk for user in self.pending[:2]],
+        )
+
+    def test_decision_on_a_user_claimed_by_another_reviewer(self):
+        review_queue.claim_next(self.other_reviewer, 1)
+        self.client.force_authenticate(self.reviewer)
+        response = self.client.post(f"/api/admin/approve-kyc/{self.pending[0].pk}/")
+        self.assertEqual(response.status_code, 409)
+
+        self.expire(self.pending[0])
+        response = self.client.post(f"/api/admin/approve-kyc/{self.pending[0].pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ReviewClaim.objects.filter(user=self.pending[0]).exists())
+
+    def test_decision_locks_the_user(self):
+        self.client.force_authenticate(self.reviewer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f"/api/admin/reject-kyc/{self.pending[0].pk}/",
+                {"kyc_rejection_reason": "Blurry document."},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        if connection.features.has_select_for_update:
+            self.assertTrue(
+                any("FOR UPDATE" in query["sql"] for query in queries),
+            )
+
+
+@skipUnless(connection.vendor == "postgresql", "row locks")
+class ReviewQueueLockTests(ReviewQueueMixin, KYCTransactionTestCase):
+    """Claims while another connection decides on the oldest user."""
+
+    def setUp(self):
+        super().setUp()
+        self.locked, self.release = threading.Event(), threading.Event()
+        self.decision = threading.Thread(target=self.decide)
+        self.decision.start()
+        self.locked.wait()
+
+    def tearDown(self):
+        self.release.set()
+        self.decision.join()
+
+    def decide(self):
+        try:
+            with transaction.atomic():
+                User.objects.select_for_update().get(pk=self.pending[0].pk)
+                self.locked.set()
+                self.release.wait()
+        finally:
+            connections.close_all()
+
+    def test_user_under_decision_is_skipped(self):
+        claims = review_queue.claim_next(self.reviewer, 1)
+        self.assertEqual([claim.user_id for claim in claims], [self.pending[1].pk])
@@ -0,0 +1,129 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from project.middleware import ReplicaRoutingMiddleware
+from project.routers import (
+    PrimaryReplicaRouter,
+    ReplicaHealth,
+    replica_health,
+    routing_context,
+)
+
+User = get_user_model()
+router = PrimaryReplicaRouter()
+
+
+@override_settings(DATABASE_REPLICAS=["replica0"])
+@mock.patch.object(replica_health, "usable", return_value=True)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def test_reads_outside_a_routing_context_use_the_primary(self, usable):
+        self.assertEqual(router.db_for_read(User), "default")
+
+    def test_reads_use_a_replica(self, usable):
+        with routing_context():
+            self.assertEqual(router.db_for_read(User), "replica0")
+
+    def test_pinned_reads_use_the_primary(self, usable):
+        with routing_context(pinned=True):
+            self.assertEqual(router.db_for_read(User), "default")
+
+    def test_reads_after_a_write_use_the_primary(self, usable):
+        with routing_context() as state:
+            self.assertEqual(router.db_for_write(User), "default")
+            self.assertTrue(state.wrote)
+            self.assertEqual(router.db_for_read(User), "default")
+
+    def test_lagging_replicas_are_skipped(self, usable):
+        usable.return_value = False
+        with routing_context():
+            self.assertEqual(router.db_for_read(User), "default")
+
+
+@override_settings(REPLICA_MAX_LAG_SECONDS=2.0, REPLICA_LAG_CHECK_INTERVAL=5.0)
+class ReplicaHealthTests(SimpleTestCase):
+    def test_lag_is_measured_once_per_interval(self):
+        health = ReplicaHealth()
+        with mock.patch.object(health, "_measure", return_value=1.0) as measure:
+            self.assertTrue(health.usable("replica0"))
+            self.assertTrue(health.usable("replica0"))
+        self.assertEqual(measure.call_count, 1)
+        self.assertEqual(health.lag(), {"replica0": 1.0})
+
+    def test_lagging_or_unavailable_replicas_are_unusable(self):
+        for lag in (2.5, None):
+            health = ReplicaHealth()
+            with mock.patch.object(health, "_measure", return_value=lag):
+                self.assertFalse(health.usable("replica0"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica0"], REPLICA_STICKY_SECONDS=10)
+@mock.patch.object(replica_health, "usable", return_value=True)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def view(self, write=False):
+        def get_response(request):
+            if write:
+                router.db_for_write(User)
+            self.reads.append(router.db_for_read(User))
+            return HttpResponse()
+
+        return get_response
+
+    def async_view(self, write=False):
+        view = self.view(write)
+
+        async def get_response(request):
+            return view(request)
+
+        return get_response
+
+    def test_safe_requests_read_from_a_replica(self, usable):
+        response = ReplicaRoutingMiddleware(self.view())(self.factory.get("/"))
+        self.assertEqual(self.reads, ["replica0"])
+        self.assertNotIn("primary_db", response.cookies)
+
+    def test_unsafe_requests_read_from_the_primary(self, usable):
+        ReplicaRoutingMiddleware(self.view())(self.factory.post("/"))
+        self.assertEqual(self.reads, ["default"])
+
+    def test_a_write_pins_the_client_with_a_cookie(self, usable):
+        response = ReplicaRoutingMiddleware(self.view(write=True))(
+            self.factory.post("/")
+        )
+        cookie = response.cookies["primary_db"]
+        self.assertEqual(cookie["max-age"], 10)
+
+        request = self.factory.get("/")
+        request.COOKIES["primary_db"] = cookie.value
+        ReplicaRoutingMiddleware(self.view())(request)
+        self.assertEqual(self.reads, ["default", "default"])
+
+    def test_a_write_pins_the_authorization(self, usable):
+        headers = {"authorization": "Bearer a"}
+        ReplicaRoutingMiddleware(self.view(write=True))(
+            self.factory.post("/", headers=headers)
+        )
+        middleware = ReplicaRoutingMiddleware(self.view())
+        middleware(self.factory.get("/", headers=headers))
+        middleware(self.factory.get("/", headers={"authorization": "Bearer b"}))
+        self.assertEqual(self.reads, ["default", "default", "replica0"])
+
+    def test_async(self, usable):
+        headers = {"authorization": "Bearer a"}
+        middleware = ReplicaRoutingMiddleware(self.async_view(write=True))
+        response = async_to_sync(middleware)(self.factory.post("/", headers=headers))
+        self.assertIn("primary_db", response.cookies)
+
+        middleware = ReplicaRoutingMiddleware(self.async_view())
+        async_to_sync(middleware)(self.factory.get("/", headers=headers))
+        async_to_sync(middleware)(self.factory.get("/"))
+        self.assertEqual(self.reads, ["default", "default", "replica0"])
@@ -0,0 +1,86 @@
+import io
+
+from django.contrib.auth import get_user_model
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from accounts.renderers import ORJSONParser, ORJSONRenderer
+from accounts.serializers import UserProfileReadSerializer, UserProfileSerializer
+
+from .utils import KYCTestCase
+
+User = get_user_model()
+
+RENDITIONS = {
+    "detail": {
+        "width": 512,
+        "height": 384,
+        "jpeg": "profile_photos/detail photo.jpg",
+        "webp": "profile_photos/detail photo.webp",
+    },
+    "thumb": {
+        "width": 96,
+        "height": 72,
+        "jpeg": "profile_photos/thumb.jpg",
+        "webp": "profile_photos/thumb.webp",
+    },
+}
+
+
+class UserProfileReadSerializerTests(KYCTestCase):
+    """The fast path renders exactly like UserProfileSerializer."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_user("+15550000001")
+        self.create_user(
+            "+15550000002",
+            # escaped by JSONRenderer
+            full_name="Zoë O'Brien\u2028",
+            email="zoe@example.com",
+            document="documents/national id.pdf",
+        )
+        self.create_user(
+            "+15550000003",
+            document="documents/id.png",
+            profile_photo="profile_photos/face.jpg",
+            profile_photo_renditions=RENDITIONS,
+            kyc_rejection_reason="Blurry document.",
+        )
+        self.request = APIRequestFactory().get("/api/user-profile/")
+
+    def assertSameOutput(self, request):
+        users = User.objects.order_by("pk")
+        fast = UserProfileReadSerializer(request)
+        expected = UserProfileSerializer(
+            users, many=True, context={"request": request}
+        ).data
+        for rendered in (
+            fast.serialize_rows(fast.queryset(users)),
+            [fast.serialize_instance(user) for user in users],
+        ):
+            self.assertEqual(rendered, expected)
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                with self.subTest(renderer=type(renderer).__name__):
+                    self.assertEqual(
+                        renderer.render(rendered), JSONRenderer().render(expected)
+                    )
+
+    def test_relative_urls(self):
+        self.assertSameOutput(None)
+
+    def test_absolute_urls(self):
+        self.assertSameOutput(self.request)
+
+    def test_users_endpoint(self):
+        self.client.force_authenticate(self.create_admin())
+        response = self.client.get("/api/admin/users/")
+        users = User.objects.all()
+        expected = UserProfileSerializer(users, many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_orjson_parser(self):
+        renderer = ORJSONRenderer()
+        data = {"full_name": "Zoë\u2029", "ids": [1, 2]}
+        parsed = ORJSONParser().parse(io.BytesIO(renderer.render(data)))
+        self.assertEqual(parsed, data)
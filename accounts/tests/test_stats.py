@@ -0,0 +1,107 @@
+import io
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts import stats
+from accounts.models import KYCDailyCount
+
+from .utils import KYCTestCase, KYCTransactionTestCase
+
+
+class KYCStatsTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.create_admin())
+        self.today = timezone.localdate().isoformat()
+
+    def get_stats(self, days=1):
+        response = self.client.get("/api/admin/kyc-stats/", {"days": days})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counters_follow_signups_transitions_and_deletions(self):
+        users = [self.create_user(f"+1555000000{i}") for i in range(1, 5)]
+        users[0].approve_kyc()
+        users[1].approve_kyc()
+        users[2].reject_kyc("Blurry")
+        users[3].delete()
+
+        data = self.get_stats()
+        self.assertEqual(
+            data["totals"],
+            # the admin is pending too
+            {"pending": 1, "verified": 2, "rejected": 1, "total": 4},
+        )
+        self.assertEqual(
+            data["daily"],
+            [
+                {
+                    "date": self.today,
+                    "signups": 5,
+                    "verified": 2,
+                    "rejected": 1,
+                    "verification_rate": 0.6667,
+                }
+            ],
+        )
+
+    def test_days_without_figures(self):
+        data = self.get_stats(days=3)
+        self.assertEqual(len(data["daily"]), 3)
+        self.assertEqual(data["daily"][0]["signups"], 0)
+        self.assertIsNone(data["daily"][0]["verification_rate"])
+
+    def test_days_are_bounded(self):
+        response = self.client.get("/api/admin/kyc-stats/", {"days": 10000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admins_only(self):
+        self.login(self.create_user("+15550000001"))
+        response = self.client.get("/api/admin/kyc-stats/")
+        self.assertEqual(response.status_code, 403)
+
+
+# the command sets the isolation level of its own transaction
+class ReconcileKYCStatsTests(KYCTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_user("+15550000001").approve_kyc()
+        self.create_user("+15550000002")
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command("reconcile_kyc_stats", *args, stdout=out)
+        return out.getvalue()
+
+    def totals(self):
+        return stats.kyc_stats(1)["totals"]
+
+    def test_corrects_the_state_counters(self):
+        stats.adjust({"verified": 5, "pending": -1})
+        self.assertEqual(
+            self.reconcile(),
+            "pending: counted 1, counters had 0\n"
+            "verified: counted 1, counters had 6\n"
+            "Corrected 2 state counters.\n",
+        )
+        self.assertEqual(
+            self.totals(), {"pending": 1, "verified": 1, "rejected": 0, "total": 2}
+        )
+        self.assertEqual(self.reconcile(), "Corrected 0 state counters.\n")
+
+    def test_dry_run(self):
+        stats.adjust({"rejected": 2})
+        self.assertEqual(
+            self.reconcile("--dry-run"), "rejected: counted 0, counters had 2\n"
+        )
+        self.assertEqual(self.totals()["rejected"], 2)
+
+    def test_keeps_the_daily_history(self):
+        # decisions of users since overturned or deleted
+        stats.record(events=["verified", "rejected"])
+        daily = list(KYCDailyCount.objects.values_list("day", "event", "count"))
+        self.reconcile()
+        self.assertCountEqual(
+            KYCDailyCount.objects.values_list("day", "event", "count"), daily
+        )
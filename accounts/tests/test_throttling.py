@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from accounts.models import ThrottleBucket
+from accounts.throttling import take_cached_tokens, take_tokens
+
+from .utils import KYCTestCase
+
+
+class TakeTokensTests(KYCTestCase):
+    """The single statement bucket of THROTTLE_STORE = "database"."""
+
+    def take(self, now, cost=1, capacity=3, rate=0.5):
+        with mock.patch("accounts.throttling.time.time", return_value=now):
+            return take_tokens("bucket", capacity, rate, cost)
+
+    def test_new_bucket_starts_full(self):
+        self.assertEqual(self.take(1000), (True, 2))
+        bucket = ThrottleBucket.objects.get(key="bucket")
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_empty_bucket_refuses_without_taking(self):
+        for _ in range(3):
+            self.assertTrue(self.take(1000)[0])
+        self.assertEqual(self.take(1000), (False, 0))
+        self.assertEqual(self.take(1000), (False, 0))
+
+    def test_bucket_refills_up_to_its_capacity(self):
+        self.take(1000, cost=3)
+        # 0.5 tokens per second
+        self.assertEqual(self.take(1002), (True, 0))
+        self.assertEqual(self.take(1100), (True, 2))
+
+    def test_cost_above_the_level_is_refused(self):
+        self.assertEqual(self.take(1000, cost=4), (False, 3))
+        self.assertEqual(self.take(1000, cost=2), (True, 1))
+
+
+class TakeCachedTokensTests(KYCTestCase):
+    """The sliding windows of THROTTLE_STORE = "cache"."""
+
+    def take(self, now, cost=1):
+        with mock.patch("accounts.throttling.time.time", return_value=now):
+            return take_cached_tokens("bucket", 4, 60, cost)
+
+    def test_refused_requests_take_nothing(self):
+        self.assertEqual(self.take(6000, cost=4), (True, 0))
+        self.assertEqual(self.take(6001), (False, 0))
+        self.assertEqual(self.take(6002), (False, 0))
+
+    def test_previous_window_is_weighted(self):
+        self.take(6000, cost=4)
+        # a quarter into the next window, 3 of the 4 tokens are still counted
+        self.assertEqual(self.take(6075), (True, 0))
+        self.assertFalse(self.take(6075)[0])
+
+
+@mock.patch.object(
+    SimpleRateThrottle, "THROTTLE_RATES", {"user": "3/minute", "anon": "3/minute"}
+)
+class ThrottleTests(KYCTestCase):
+    def signup(self):
+        return self.client.post("/api/signup/", {}, REMOTE_ADDR="203.0.113.1")
+
+    def test_anonymous_requests_are_throttled(self):
+        for _ in range(3):
+            self.assertEqual(self.signup().status_code, 400)
+        response = self.signup()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+
+    @override_settings(THROTTLE_STORE="cache")
+    def test_cache_store_writes_no_bucket(self):
+        with self.assertNumQueries(0):
+            self.signup()
+        self.assertFalse(ThrottleBucket.objects.exists())
+
+    def test_database_store(self):
+        for _ in range(3):
+            self.signup()
+        self.assertEqual(self.signup().status_code, 429)
+        # refilled a little since
+        self.assertLess(ThrottleBucket.objects.get().tokens, 1)
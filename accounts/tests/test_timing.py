@@ -0,0 +1,116 @@
+import io
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from PIL import Image
+
+from accounts import utils
+from accounts.management.commands.benchmark_verification import FakeProvider
+from project.middleware import ServerTimingMiddleware
+from project.timing import header, stage, timing_context
+
+from .utils import KYCTestCase
+
+
+def png():
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(image, format="PNG")
+    return image.getvalue()
+
+
+class StageTests(SimpleTestCase):
+    def test_stages_outside_a_timed_request_are_not_recorded(self):
+        with stage("db"):
+            pass
+        with timing_context() as timings:
+            pass
+        self.assertEqual(timings.stages(), {})
+
+    def test_repeated_stages_add_up(self):
+        with timing_context() as timings:
+            for _ in range(2):
+                with stage("db"):
+                    pass
+            with stage("email"):
+                pass
+        stages = timings.stages()
+        self.assertEqual(list(stages), ["db", "email"])
+        self.assertEqual(stages["db"][1], 2)
+
+    def test_header(self):
+        self.assertEqual(
+            header({"db": [1.23, 2], "email": [4.0, 1]}, 10.04),
+            'db;dur=1.2;desc="x2", email;dur=4.0, total;dur=10.0',
+        )
+
+
+class ServerTimingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/api/kyc-status/")
+        self.request.resolver_match = None
+
+    def get_response(self, request):
+        with stage("db"):
+            pass
+        response = HttpResponse()
+        # e.g. the debug toolbar's
+        response["Server-Timing"] = 'sql;dur=1.0;desc="SQL"'
+        return response
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_requests_out_of_the_sample(self):
+        with self.assertNoLogs("project.timing"):
+            response = ServerTimingMiddleware(self.get_response)(self.request)
+        self.assertEqual(response["Server-Timing"], 'sql;dur=1.0;desc="SQL"')
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_sampled_request(self):
+        with self.assertLogs("project.timing") as logs:
+            response = ServerTimingMiddleware(self.get_response)(self.request)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^sql;dur=1\.0;desc="SQL", db;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["route"], "/api/kyc-status/")
+        self.assertEqual(line["status"], 200)
+        self.assertEqual(line["stages"]["db"]["count"], 1)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_async_request(self):
+        async def get_response(request):
+            return self.get_response(request)
+
+        with self.assertLogs("project.timing"):
+            response = async_to_sync(ServerTimingMiddleware(get_response))(self.request)
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class VerificationStagesTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.create_user("+15550000001", full_name="John"))
+        provider = FakeProvider(0)
+        for name in ("textract_client", "rekognition_client"):
+            patcher = mock.patch.object(utils, name, provider)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_stages_of_a_verification(self):
+        with self.assertLogs("project.timing") as logs:
+            response = self.client.post(
+                "/api/upload-document/",
+                {"document": SimpleUploadedFile("id.png", png(), "image/png")},
+            )
+        self.assertEqual(response.status_code, 200)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["route"], "api/upload-document/")
+        # textract runs in a thread pool, in the context of the request
+        for name in ("upload", "sniff", "textract", "rekognition", "crop", "match"):
+            self.assertIn(name, line["stages"])
+            self.assertIn(f"{name};dur=", response["Server-Timing"])
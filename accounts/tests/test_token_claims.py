@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import KYC_VERIFIED_CLAIM, KYC_VERSION_CLAIM
+
+from .utils import KYCTestCase
+
+
+class KYCTokenClaimTests(KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("+15550000001")
+
+    def obtain(self):
+        response = self.client.post(
+            "/api/login/",
+            {"phone_number": "+15550000001", "password": "password"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        access = response.json()["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return AccessToken(access)
+
+    def status(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/kyc-status/")
+        self.assertEqual(response.status_code, 200)
+        user_queries = [
+            query["sql"] for query in queries if '"accounts_user"' in query["sql"]
+        ]
+        return response.json()["status"], user_queries
+
+    def test_login_issues_the_claims(self):
+        token = self.obtain()
+        self.assertIs(token[KYC_VERIFIED_CLAIM], False)
+        self.assertEqual(token[KYC_VERSION_CLAIM], self.user.version)
+
+    def test_status_is_served_from_the_claims(self):
+        self.obtain()
+        self.assertEqual(self.status()[0], "Not Verified")
+        # the version is cached, and the user is never loaded
+        self.assertEqual(self.status(), ("Not Verified", []))
+
+    def test_stale_claims_fall_back_to_the_user(self):
+        self.obtain()
+        self.status()
+        self.user.approve_kyc()
+        status, user_queries = self.status()
+        self.assertEqual(status, "Verified")
+        self.assertTrue(user_queries)
+
+    def test_tokens_without_the_claims(self):
+        self.login(self.user)
+        self.assertEqual(self.status()[0], "Not Verified")
+
+    def test_deleted_user(self):
+        self.obtain()
+        self.user.delete()
+        self.assertEqual(self.client.get("/api/kyc-status/").status_code, 401)
+
+    def test_inactive_user(self):
+        self.obtain()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/kyc-status/").status_code, 401)
@@ -0,0 +1,208 @@
+import hashlib
+import io
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from rest_framework.throttling import SimpleRateThrottle
+
+from accounts import uploads
+from accounts.models import UploadSession
+
+from .utils import PDF, KYCTestCase, KYCTransactionTestCase
+
+User = get_user_model()
+
+DOCUMENT = PDF + b"x" * 100
+
+
+# finalizations take KYC_VERIFY_THROTTLE_COST tokens
+RATES = {"user": "1000/minute", "anon": "1000/minute"}
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class UploadClientMixin:
+    def setUp(self):
+        super().setUp()
+        # also for the requests of setUp, they share the buckets
+        patcher = mock.patch.object(SimpleRateThrottle, "THROTTLE_RATES", RATES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start(self, size=len(DOCUMENT)):
+        response = self.client.post(
+            "/api/uploads/",
+            {
+                "purpose": UploadSession.SIGNUP,
+                "filename": "id.pdf",
+                "content_type": "application/pdf",
+                "size": size,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def put(self, pk, offset, data, checksum=None):
+        return self.client.generic(
+            "PUT",
+            f"/api/uploads/{pk}/",
+            data,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+            HTTP_CHUNK_SHA256=checksum or sha256(data),
+        )
+
+    def finalize(self, pk, digest):
+        return self.client.post(
+            f"/api/uploads/{pk}/finalize/", {"sha256": digest}, format="json"
+        )
+
+
+class UploadTests(UploadClientMixin, KYCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.start()
+
+    def test_chunks_advance_the_offset(self):
+        response = self.put(self.pk, 0, DOCUMENT[:50])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response[uploads.OFFSET_HEADER], "50")
+
+        response = self.client.head(f"/api/uploads/{self.pk}/")
+        self.assertEqual(response[uploads.OFFSET_HEADER], "50")
+
+    def test_chunk_at_the_wrong_offset(self):
+        self.put(self.pk, 0, DOCUMENT[:50])
+        response = self.put(self.pk, 0, DOCUMENT[:50])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 50)
+
+    def test_corrupted_chunk_is_discarded(self):
+        self.put(self.pk, 0, DOCUMENT[:50])
+        response = self.put(self.pk, 50, DOCUMENT[50:], checksum="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["offset"], 50)
+        # resumed from the last good chunk
+        self.assertEqual(self.put(self.pk, 50, DOCUMENT[50:]).status_code, 200)
+
+    def test_chunk_past_the_declared_size(self):
+        response = self.put(self.pk, 0, DOCUMENT + b"x")
+        self.assertEqual(response.status_code, 400)
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        self.put(self.pk, 0, DOCUMENT[:50])
+        response = self.finalize(self.pk, sha256(DOCUMENT))
+        self.assertEqual(response.status_code, 409)
+
+    def test_hash_mismatch_restarts_the_upload(self):
+        self.put(self.pk, 0, DOCUMENT)
+        response = self.finalize(self.pk, "0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["offset"], 0)
+        self.assertEqual(UploadSession.objects.get(pk=self.pk).offset, 0)
+
+    def test_finalized_upload_signs_up(self):
+        self.put(self.pk, 0, DOCUMENT[:50])
+        self.put(self.pk, 50, DOCUMENT[50:])
+        response = self.finalize(self.pk, sha256(DOCUMENT))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["document_upload"], self.pk)
+        # finalizing again is a no-op, chunks are refused
+        self.assertEqual(self.finalize(self.pk, sha256(DOCUMENT)).status_code, 200)
+        self.assertEqual(self.put(self.pk, len(DOCUMENT), b"x").status_code, 409)
+
+        response = self.client.post(
+            "/api/signup/",
+            {
+                "phone_number": "+15550000001",
+                "password": "Secret-pass-123",
+                "full_name": "Jane Doe",
+                "document_upload": self.pk,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        with User.objects.get().document.open() as document:
+            self.assertEqual(document.read(), DOCUMENT)
+        self.assertFalse(UploadSession.objects.exists())
+
+
+class ReadingStream(io.BytesIO):
+    """A chunk body that calls `on_read` while it is being read."""
+
+    def __init__(self, data, on_read):
+        super().__init__(data)
+        self.on_read = on_read
+
+    def read(self, size=-1):
+        self.on_read()
+        return super().read(size)
+
+
+class UploadLeaseTests(UploadClientMixin, KYCTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.start()
+        self.session = UploadSession.objects.get(pk=self.pk)
+
+    def lease_elsewhere(self, seconds=60):
+        UploadSession.objects.filter(pk=self.pk).update(
+            busy_until=timezone.now() + timedelta(seconds=seconds), lease=uuid.uuid4()
+        )
+
+    def test_leased_session_is_refused(self):
+        self.lease_elsewhere()
+        response = self.put(self.pk, 0, DOCUMENT)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 0)
+        response = self.finalize(self.pk, sha256(DOCUMENT))
+        self.assertEqual(response.status_code, 409)
+
+    def test_expired_lease_is_taken_over(self):
+        self.lease_elsewhere(seconds=-1)
+        self.assertEqual(self.put(self.pk, 0, DOCUMENT).status_code, 200)
+        session = UploadSession.objects.get(pk=self.pk)
+        self.assertEqual(session.offset, len(DOCUMENT))
+        self.assertIsNone(session.lease)
+        self.assertIsNone(session.busy_until)
+
+    def test_chunk_is_read_outside_of_a_transaction(self):
+        def on_read():
+            self.assertFalse(connection.in_atomic_block)
+            # other requests see the lease meanwhile
+            self.assertIsNotNone(UploadSession.objects.get(pk=self.pk).lease)
+
+        uploads.write_chunk(
+            self.session,
+            0,
+            ReadingStream(DOCUMENT, on_read),
+            len(DOCUMENT),
+            sha256(DOCUMENT),
+        )
+        self.assertEqual(UploadSession.objects.get(pk=self.pk).offset, len(DOCUMENT))
+
+    def test_lost_lease_does_not_commit_the_offset(self):
+        # the lease expires while the chunk is read and another request takes it
+        stream = ReadingStream(DOCUMENT, lambda: self.lease_elsewhere())
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.write_chunk(
+                self.session, 0, stream, len(DOCUMENT), sha256(DOCUMENT)
+            )
+        self.assertEqual(raised.exception.status_code, 409)
+        self.assertEqual(raised.exception.offset, 0)
+        session = UploadSession.objects.get(pk=self.pk)
+        self.assertEqual(session.offset, 0)
+        # still the other request's
+        self.assertIsNotNone(session.lease)
+
+    def test_lease_is_released_after_a_rejected_chunk(self):
+        response = self.put(self.pk, 0, DOCUMENT, checksum="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(UploadSession.objects.get(pk=self.pk).lease)
+        self.assertEqual(self.put(self.pk, 0, DOCUMENT).status_code, 200)
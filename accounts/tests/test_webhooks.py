@@ -0,0 +1,181 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import orjson
+from django.test import override_settings
+
+from accounts import webhooks
+from accounts.models import KYCState, WebhookEvent, WebhookSubscription
+
+from .utils import KYCTestCase
+
+
+class StubReceiver(ThreadingHTTPServer):
+    """Records the webhook requests and answers them with `status`."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.status = 200
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/kyc"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.headers, body))
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(
+    WEBHOOK_BATCH_WINDOW_SECONDS=0, WEBHOOK_BATCH_SIZE=2, WEBHOOK_MAX_ATTEMPTS=2
+)
+class WebhookTests(KYCTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.receiver = StubReceiver()
+        threading.Thread(target=cls.receiver.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.receiver.server_close)
+        cls.addClassCleanup(cls.receiver.shutdown)
+
+    def setUp(self):
+        super().setUp()
+        self.receiver.status = 200
+        self.receiver.requests.clear()
+        self.subscription = WebhookSubscription.objects.create(url=self.receiver.url)
+        self.users = [self.create_user(f"+1555000000{index}") for index in range(1, 4)]
+        for user in self.users:
+            user.approve_kyc()
+
+    def dispatch(self):
+        dispatcher = webhooks.Dispatcher(concurrency=2)
+        try:
+            return dispatcher.dispatch()
+        finally:
+            dispatcher.close()
+
+    def test_transitions_queue_events(self):
+        events = WebhookEvent.objects.filter(subscription=self.subscription)
+        self.assertEqual(
+            sorted(events.values_list("user_id", "previous_state", "state")),
+            [(user.pk, KYCState.PENDING, KYCState.VERIFIED) for user in self.users],
+        )
+
+    def test_events_are_delivered_in_signed_batches(self):
+        self.assertEqual(self.dispatch(), 3)
+
+        self.assertEqual(len(self.receiver.requests), 2)
+        delivered = []
+        for headers, body in self.receiver.requests:
+            self.assertTrue(
+                webhooks.verify_signature(
+                    self.subscription.secret,
+                    headers[webhooks.SIGNATURE_HEADER],
+                    body,
+                )
+            )
+            data = orjson.loads(body)
+            self.assertEqual(data["type"], webhooks.EVENT_TYPE)
+            self.assertEqual(headers[webhooks.DELIVERY_HEADER], data["id"])
+            delivered += [event["user_id"] for event in data["events"]]
+        self.assertEqual(sorted(delivered), [user.pk for user in self.users])
+
+        self.assertFalse(WebhookEvent.objects.exists())
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.delivered_events, 3)
+        self.assertEqual(self.subscription.delivered_batches, 2)
+        self.assertEqual(self.subscription.last_status, 200)
+
+    def test_signature_checks(self):
+        body = b'{"events": []}'
+        header = webhooks.sign("secret", int(time.time()), body)
+        self.assertTrue(webhooks.verify_signature("secret", header, body))
+        self.assertFalse(webhooks.verify_signature("other", header, body))
+        self.assertFalse(webhooks.verify_signature("secret", header, body + b" "))
+        old = webhooks.sign("secret", int(time.time()) - 3600, body)
+        self.assertFalse(webhooks.verify_signature("secret", old, body))
+        self.assertFalse(webhooks.verify_signature("secret", "garbage", body))
+
+    def test_failed_delivery_is_retried_then_dead(self):
+        self.receiver.status = 500
+        with self.assertLogs("accounts.webhooks", "WARNING"):
+            self.dispatch()
+
+        events = WebhookEvent.objects.all()
+        self.assertEqual(
+            set(events.values_list("status", "attempts", "last_error")),
+            {(WebhookEvent.PENDING, 1, "HTTP 500")},
+        )
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.failed_deliveries, 2)
+        self.assertEqual(self.subscription.last_status, 500)
+        # backed off
+        self.assertEqual(self.dispatch(), 0)
+
+        events.update(available_at=self.subscription.created_at)
+        with self.assertLogs("accounts.webhooks", "WARNING"):
+            self.dispatch()
+        self.assertEqual(
+            set(events.values_list("status", "attempts")), {(WebhookEvent.DEAD, 2)}
+        )
+        # dead letters are not delivered
+        events.update(available_at=self.subscription.created_at)
+        self.assertEqual(self.dispatch(), 0)
+
+    def test_dead_letters_are_requeued(self):
+        WebhookEvent.objects.update(status=WebhookEvent.DEAD, attempts=2)
+        self.client.force_authenticate(self.create_admin())
+        response = self.client.get("/api/admin/webhooks/dead-letters/")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(
+            "/api/admin/webhooks/dead-letters/",
+            {"subscription": self.subscription.pk},
+            format="json",
+        )
+        self.assertEqual(response.json(), {"requeued": 3})
+        self.assertEqual(self.dispatch(), 3)
+        self.assertEqual(len(self.receiver.requests), 2)
+
+    def test_unreachable_receiver(self):
+        self.subscription.url = "http://127.0.0.1:9/kyc"
+        self.subscription.save()
+        with self.assertLogs("accounts.webhooks", "WARNING"):
+            self.dispatch()
+        self.subscription.refresh_from_db()
+        self.assertIsNone(self.subscription.last_status)
+        self.assertEqual(WebhookEvent.objects.filter(attempts=1).count(), 3)
+
+    def test_subscriptions_api(self):
+        self.client.force_authenticate(self.create_admin())
+        response = self.client.post(
+            "/api/admin/webhooks/",
+            {"url": self.receiver.url, "states": [KYCState.REJECTED]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertTrue(data["secret"])
+        rejections = WebhookSubscription.objects.get(pk=data["id"])
+
+        # only the states subscribed to are queued
+        self.users[0].reject_kyc("Blurry")
+        self.users[1].approve_kyc()
+        self.assertEqual(
+            list(rejections.events.values_list("user_id", "state")),
+            [(self.users[0].pk, KYCState.REJECTED)],
+        )
+
+        response = self.client.get("/api/admin/webhooks/")
+        pending = {item["id"]: item["pending_events"] for item in response.json()}
+        self.assertEqual(pending, {self.subscription.pk: 4, rejections.pk: 1})
@@ -0,0 +1,67 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import user_cache
+from accounts.ledger import attempt_writer
+
+User = get_user_model()
+
+# the smallest document the signup accepts
+PDF = b"%PDF-1.4\n%%EOF\n"
+
+
+class KYCTestMixin:
+    """An empty cache for every test, and the files in a temporary directory."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(
+            override_settings(
+                MEDIA_ROOT=media_root,
+                KYC_UPLOAD_DIR=os.path.join(media_root, "uploads"),
+                PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+            )
+        )
+
+    def setUp(self):
+        super().setUp()
+        # throttle buckets, cached users and versions
+        cache.clear()
+        # the local tier outlives the rolled back users, whose ids get reused
+        user_cache._local.clear()
+        # the KYC attempts are written by the test's own thread and connection
+        patcher = mock.patch.object(attempt_writer, "_start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(attempt_writer.flush)
+
+    def create_user(self, phone_number, **fields):
+        fields.setdefault("full_name", "Jane Doe")
+        return User.objects.create_user(phone_number, "password", **fields)
+
+    def create_admin(self, phone_number="+15550000000"):
+        return User.objects.create_superuser(
+            phone_number, "password", full_name="Admin"
+        )
+
+    def login(self, user):
+        """Send the requests with an access token of `user`."""
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+class KYCTestCase(KYCTestMixin, APITestCase):
+    pass
+
+
+class KYCTransactionTestCase(KYCTestMixin, APITransactionTestCase):
+    pass
@@ -0,0 +1,159 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from .models import ThrottleBucket
+
+# One statement creates or refills the bucket, takes the cost if the tokens
+# suffice and returns the outcome. SET expressions all see the old row.
+TAKE_TOKENS_SQL = """
+INSERT INTO {table} ({key}, tokens, updated_at, granted)
+VALUES (
+    %(key)s,
+    CASE WHEN %(capacity)s >= %(cost)s THEN %(capacity)s - %(cost)s ELSE %(capacity)s END,
+    %(now)s,
+    %(capacity)s >= %(cost)s
+)
+ON CONFLICT ({key}) DO UPDATE SET
+    tokens = CASE WHEN {level} >= %(cost)s THEN {level} - %(cost)s ELSE {level} END,
+    granted = {level} >= %(cost)s,
+    updated_at = %(now)s
+RETURNING granted, tokens
+"""
+# the bucket refilled since the previous request, up to its capacity
+LEVEL_SQL = (
+    "{least}(%(capacity)s, {table}.tokens + (%(now)s - {table}.updated_at) * %(rate)s)"
+)
+
+
+def take_tokens(key, capacity, rate, cost):
+    """
+    Atomically take `cost` tokens from a bucket, in a single round trip.
+
+    Works on PostgreSQL and SQLite (INSERT ... ON CONFLICT ... RETURNING).
+
+    Args:
+        key (str): The bucket.
+        capacity (float): Size of the bucket, a new bucket starts full.
+        rate (float): Tokens added per second.
+        cost (float): Tokens taken by the request.
+
+    Returns:
+        tuple: Whether the tokens were taken, and the tokens left.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    table = connection.ops.quote_name(ThrottleBucket._meta.db_table)
+    least = "LEAST" if connection.vendor == "postgresql" else "MIN"
+    sql = TAKE_TOKENS_SQL.format(
+        table=table,
+        key=connection.ops.quote_name("key"),
+        level=LEVEL_SQL.format(least=least, table=table),
+    )
+    params = {
+        "key": key,
+        "capacity": float(capacity),
+        "rate": float(rate),
+        "cost": float(cost),
+        "now": time.time(),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        granted, tokens = cursor.fetchone()
+    return bool(granted), tokens
+
+
+def _window_key(key, window):
+    return f"throttle:{key}:{window}"
+
+
+def take_cached_tokens(key, capacity, duration, cost):
+    """
+    Count `cost` against a sliding window limit kept in the cache.
+
+    The requests counted are those of the current window of `duration`
+    seconds, plus those of the previous one weighted by how much of it is
+    still inside the sliding window. This takes two or three cache round
+    trips. The counters only use cache.incr, atomic on Redis and Memcached,
+    so a burst of concurrent requests never goes over `capacity`; with a
+    local memory cache each worker counts on its own.
+
+    Returns:
+        tuple: Whether the tokens were taken, and the tokens left.
+    """
+    now = time.time()
+    window, position = divmod(now, duration)
+    window = int(window)
+    previous = cache.get(_window_key(key, window - 1), 0)
+    current_key = _window_key(key, window)
+    try:
+        taken = cache.incr(current_key, cost)
+    except ValueError:
+        # first request of the window; a concurrent one may create it first
+        if cache.add(current_key, cost, timeout=int(2 * duration) + 1):
+            taken = cost
+        else:
+            taken = cache.incr(current_key, cost)
+
+    level = capacity - taken - previous * (1 - position / duration)
+    if level >= 0:
+        return True, level
+    # refused requests take nothing
+    cache.decr(current_key, cost)
+    return False, level + cost
+
+
+class TokenBucketThrottleMixin:
+    """
+    Token bucket version of DRF's rate throttles, shared by all the workers.
+
+    The rate ("80/minute") gives both the bucket size and its refill rate.
+    Requests take `throttle_cost` tokens (default 1) as declared by the view,
+    so expensive endpoints drain the bucket faster. The buckets live in the
+    ThrottleBucket table (take_tokens, a write on the primary per request).
+    With THROTTLE_STORE = "cache" they are approximated by sliding windows in
+    the cache instead (take_cached_tokens), which needs a cache shared by the
+    workers.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.cost = getattr(view, "throttle_cost", 1)
+        self.refill_rate = self.num_requests / self.duration
+        if not self.cost:
+            self.tokens = self.num_requests
+            return True
+        if settings.THROTTLE_STORE == "database":
+            granted, self.tokens = take_tokens(
+                self.key, self.num_requests, self.refill_rate, self.cost
+            )
+        else:
+            granted, self.tokens = take_cached_tokens(
+                self.key, self.num_requests, self.duration, self.cost
+            )
+        return granted
+
+    def wait(self):
+        return max(0.0, (self.cost - self.tokens) / self.refill_rate)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottleMixin, UserRateThrottle):
+    """Buckets of authenticated users, "user" rate."""
+
+    def get_cache_key(self, request, view):
+        # anonymous requests have their own buckets
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottleMixin, AnonRateThrottle):
+    """Buckets of anonymous clients (signup, login) by IP address, "anon" rate."""
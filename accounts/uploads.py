@@ -0,0 +1,245 @@
+"""
+Resumable document uploads.
+
+A client creates an UploadSession, PUTs the document in chunks, each sent
+with its offset (Upload-Offset) and SHA-256 (Chunk-SHA256), and finalizes
+the session with the SHA-256 of the whole file. Chunks are streamed to a
+temporary file under KYC_UPLOAD_DIR, so neither a chunk nor the document is
+held in memory. After a dropped connection the client asks for the offset
+and resumes from there, only the interrupted chunk is sent again.
+
+A finalized verification upload goes through the verification of
+VerifyIdentityView; a finalized signup upload is passed to the signup
+request instead of the document.
+"""
+
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+
+from .models import UploadSession
+
+OFFSET_HEADER = "Upload-Offset"
+CHECKSUM_HEADER = "Chunk-SHA256"
+ALLOWED_CONTENT_TYPES = ("image/jpeg", "image/png", "application/pdf")
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """A rejected chunk or finalization, with the offset to resume from."""
+
+    def __init__(self, message, offset, status_code=status.HTTP_409_CONFLICT):
+        super().__init__(message)
+        self.message = message
+        self.offset = offset
+        self.status_code = status_code
+
+
+def part_path(session):
+    return os.path.join(settings.KYC_UPLOAD_DIR, f"{session.pk}.part")
+
+
+def create_session(user, purpose, filename, content_type, size):
+    session = UploadSession.objects.create(
+        user=user,
+        purpose=purpose,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        expires_at=timezone.now() + timedelta(seconds=settings.KYC_UPLOAD_SESSION_TTL),
+    )
+    os.makedirs(settings.KYC_UPLOAD_DIR, exist_ok=True)
+    open(part_path(session), "wb").close()
+    return session
+
+
+@contextmanager
+def leased(session):
+    """
+    Lease the session while a chunk is written or the upload finalized.
+
+    The lease is a conditional UPDATE of busy_until and lease, committed
+    right away: no transaction (nor row lock) is held while the chunk is read
+    from the client. The lease is shared by every worker, and a request that
+    finds the session leased is rejected instead of waiting. If a worker
+    dies, its lease expires after KYC_UPLOAD_LEASE_SECONDS. The session's
+    offset and status are refreshed once it is leased; yields the token that
+    the writes must match (see commit).
+
+    Raises:
+        UploadError: 409 if another request holds the lease.
+    """
+    token = uuid.uuid4()
+    now = timezone.now()
+    taken = (
+        UploadSession.objects.filter(pk=session.pk)
+        .filter(Q(busy_until__isnull=True) | Q(busy_until__lte=now))
+        .update(
+            busy_until=now + timedelta(seconds=settings.KYC_UPLOAD_LEASE_SECONDS),
+            lease=token,
+        )
+    )
+    if not taken:
+        raise UploadError(
+            "Another request on this upload is in progress.", session.offset
+        )
+    try:
+        current = UploadSession.objects.only("offset", "status", "sha256").get(
+            pk=session.pk
+        )
+        session.offset = current.offset
+        session.status = current.status
+        session.sha256 = current.sha256
+        yield token
+    finally:
+        UploadSession.objects.filter(pk=session.pk, lease=token).update(
+            busy_until=None, lease=None
+        )
+
+
+def commit(session, token, **fields):
+    """
+    Save `fields` if the session is still leased by `token` at its offset.
+
+    A compare-and-swap: a request whose lease expired while it was reading
+    its chunk, and was taken over, writes nothing. The lease is released.
+
+    Raises:
+        UploadError: 409 if the lease was lost.
+    """
+    updated = UploadSession.objects.filter(
+        pk=session.pk, lease=token, offset=session.offset
+    ).update(busy_until=None, lease=None, **fields)
+    if not updated:
+        current = (
+            UploadSession.objects.filter(pk=session.pk)
+            .values_list("offset", flat=True)
+            .first()
+        )
+        raise UploadError(
+            "The upload was taken over by another request.",
+            session.offset if current is None else current,
+        )
+    for name, value in fields.items():
+        setattr(session, name, value)
+
+
+def write_chunk(session, offset, stream, length, checksum):
+    """
+    Append a chunk read from `stream` at `offset`.
+
+    The chunk is discarded unless all of its `length` bytes arrive and match
+    the SHA-256 `checksum`.
+
+    Raises:
+        UploadError: 409 if the offset is not the end of the upload, another
+            request on the session is in progress or the session is
+            finalized; 400 if the chunk is too large, truncated or corrupted.
+    """
+    # the chunk is read from the client under the lease, outside of any
+    # transaction
+    with leased(session) as token:
+        if session.status != UploadSession.OPEN:
+            raise UploadError("The upload is finalized.", session.offset)
+        if offset != session.offset:
+            raise UploadError(
+                f"The upload continues at offset {session.offset}.", session.offset
+            )
+        if offset + length > session.size:
+            raise UploadError(
+                "The chunk goes past the declared size.",
+                session.offset,
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        digest = hashlib.sha256()
+        with open(part_path(session), "r+b") as file:
+            # drops what an interrupted chunk left
+            file.truncate(offset)
+            file.seek(offset)
+            remaining = length
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                file.write(block)
+                remaining -= len(block)
+            if remaining or digest.hexdigest() != checksum.lower():
+                file.truncate(offset)
+                raise UploadError(
+                    "The chunk does not match its checksum.",
+                    offset,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            file.flush()
+            os.fsync(file.fileno())
+
+        # a request that lost its lease may have written to the file too,
+        # the hash checked by finalize catches what it left
+        commit(session, token, offset=offset + length)
+
+
+def finalize(session, sha256):
+    """
+    Check the whole file against its SHA-256 and complete the session.
+
+    A mismatch restarts the upload from offset 0.
+
+    Raises:
+        UploadError: 409 if chunks are missing or another request on the
+            session is in progress, 400 if the file does not match `sha256`.
+    """
+    with leased(session) as token:
+        if session.status == UploadSession.COMPLETE:
+            if session.sha256 != sha256.lower():
+                raise UploadError(
+                    "The upload was finalized with another hash.",
+                    session.offset,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            return
+        if session.offset != session.size:
+            raise UploadError("The upload is incomplete.", session.offset)
+
+        digest = hashlib.sha256()
+        with open(part_path(session), "rb") as file:
+            while block := file.read(BLOCK_SIZE):
+                digest.update(block)
+        if digest.hexdigest() == sha256.lower():
+            commit(
+                session,
+                token,
+                sha256=sha256.lower(),
+                status=UploadSession.COMPLETE,
+            )
+            return
+        with open(part_path(session), "r+b") as file:
+            file.truncate(0)
+        commit(session, token, offset=0)
+    raise UploadError(
+        "The file does not match its hash, upload it again.",
+        0,
+        status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def open_upload(session):
+    """The uploaded file, to be closed by the caller."""
+    return File(open(part_path(session), "rb"), name=session.filename)
+
+
+def delete_session(session):
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
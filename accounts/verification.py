@@ -0,0 +1,249 @@
+import asyncio
+import contextvars
+import hashlib
+import io
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+from project.timing import stage
+
+from .ledger import attempt_writer
+from .notifications import name_mismatch_message, queue_messages
+from .renditions import save_renditions
+from .utils import (
+    NAME_MATCH_THRESHOLD,
+    extract_face_from_ID,
+    extract_text_from_ID,
+    name_match_score,
+)
+
+# outcomes of a document verification
+VERIFIED = "verified"
+NAME_MISMATCH = "name_mismatch"
+CONFLICT = "conflict"
+
+# the boto3 clients block, their calls run in this bounded pool so that the
+# Textract and Rekognition calls of a verification overlap and async views
+# never block the event loop
+_provider_executor = ThreadPoolExecutor(
+    max_workers=settings.KYC_PROVIDER_MAX_CONCURRENCY,
+    thread_name_prefix="kyc-provider",
+)
+
+# how often a duplicate verification checks whether the first one finished
+LOCK_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class Analysis:
+    """What the providers extracted from a document, and how long they took."""
+
+    document_sha256: str
+    text: str
+    # the cropped face as JPEG bytes, or None
+    face: bytes
+    textract_ms: float
+    rekognition_ms: float
+    # perf_counter() when the analysis started
+    started: float
+
+
+def _timed(func, content):
+    start = time.perf_counter()
+    result = func(io.BytesIO(content))
+    return result, (time.perf_counter() - start) * 1000
+
+
+def analyze_document(content):
+    """
+    Extract the text and the face of an ID document.
+
+    Args:
+        content (bytes): The uploaded document.
+
+    Returns:
+        Analysis: The extracted text and face.
+    """
+    started = time.perf_counter()
+    # in the caller's context, so that the stages of the call are timed
+    text = _provider_executor.submit(
+        contextvars.copy_context().run, _timed, extract_text_from_ID, content
+    )
+    face, rekognition_ms = _timed(extract_face_from_ID, content)
+    text, textract_ms = text.result()
+    return Analysis(
+        hashlib.sha256(content).hexdigest(),
+        text,
+        face,
+        textract_ms,
+        rekognition_ms,
+        started,
+    )
+
+
+async def aanalyze_document(content):
+    """Async version of analyze_document."""
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    (text, textract_ms), (face, rekognition_ms) = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                _provider_executor,
+                contextvars.copy_context().run,
+                _timed,
+                extract,
+                content,
+            )
+            for extract in (extract_text_from_ID, extract_face_from_ID)
+        )
+    )
+    return Analysis(
+        hashlib.sha256(content).hexdigest(),
+        text,
+        face,
+        textract_ms,
+        rekognition_ms,
+        started,
+    )
+
+
+def complete_verification(user, analysis):
+    """
+    Verify the user if the name on the document matches.
+
+    A mismatch is reported to the user by email, through the outbox. On a
+    match the face becomes the profile photo, with its renditions
+    (accounts.renditions), and the user is moved to the verified KYC state.
+    The attempt is added to the ledger (accounts.ledger).
+
+    Returns:
+        str: VERIFIED, NAME_MISMATCH or CONFLICT (the KYC state changed meanwhile).
+    """
+    with stage("match"):
+        score = name_match_score(user.full_name, analysis.text)
+    if score < NAME_MATCH_THRESHOLD:
+        if user.email:
+            with stage("email"):
+                queue_messages([name_mismatch_message(user.email)])
+        outcome = NAME_MISMATCH
+    else:
+        with stage("photo"):
+            # stored by content hash, the name only gives the extension
+            user.profile_photo.save(
+                "profile.jpg", ContentFile(analysis.face), save=False
+            )
+            renditions = save_renditions(analysis.face)
+        with stage("db"):
+            verified = user.verify_kyc(
+                profile_photo=user.profile_photo.name,
+                profile_photo_renditions=renditions,
+            )
+        outcome = VERIFIED if verified else CONFLICT
+
+    attempt_writer.record(
+        user_id=user.pk,
+        document_sha256=analysis.document_sha256,
+        match_score=score,
+        textract_ms=analysis.textract_ms,
+        rekognition_ms=analysis.rekognition_ms,
+        total_ms=(time.perf_counter() - analysis.started) * 1000,
+        decision=outcome,
+    )
+    return outcome
+
+
+def _lock_key(user):
+    return f"kyc-verify-lock:{user.pk}"
+
+
+def _result_key(user, content):
+    # the version changes with every KYC transition, an outcome is only
+    # reused by uploads made while the user was in the same state
+    digest = hashlib.sha256(content).hexdigest()
+    return f"kyc-verify:{user.pk}:{user.version}:{digest}"
+
+
+def _release(lock_key, token):
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _verify_once(user, content, verify):
+    """
+    Run `verify` unless the same upload was just verified for the user.
+
+    Verifications of a user run one at a time (single-flight): a duplicate
+    upload sent while the first one is with the provider waits for it and
+    reuses its outcome instead of paying for another Textract and Rekognition
+    call. A lock that is not released within KYC_VERIFY_LOCK_SECONDS expires.
+
+    The lock and the outcomes live in the cache. With the default local memory
+    cache they only cover the uploads of one worker: duplicates sent to
+    different workers are verified twice, and the KYC transition keeps the
+    outcome consistent. Configure a shared cache (CACHES) to deduplicate them
+    across workers.
+    """
+    lock_key, result_key = _lock_key(user), _result_key(user, content)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.KYC_VERIFY_LOCK_SECONDS
+    while not cache.add(lock_key, token, settings.KYC_VERIFY_LOCK_SECONDS):
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(LOCK_POLL_INTERVAL)
+    try:
+        outcome = cache.get(result_key)
+        if outcome is None:
+            outcome = verify()
+            cache.set(result_key, outcome, settings.KYC_VERIFY_RESULT_SECONDS)
+        return outcome
+    finally:
+        _release(lock_key, token)
+
+
+def verify_document(user, document):
+    """
+    Run the KYC verification of an uploaded ID document.
+
+    Args:
+        user (User): The user being verified.
+        document (File): The uploaded ID document.
+
+    Returns:
+        str: The outcome, see complete_verification.
+    """
+    with stage("read"):
+        content = document.read()
+
+    def verify():
+        return complete_verification(user, analyze_document(content))
+
+    return _verify_once(user, content, verify)
+
+
+async def averify_document(user, document):
+    """Async version of verify_document."""
+    with stage("read"):
+        content = document.read()
+    lock_key, result_key = _lock_key(user), _result_key(user, content)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.KYC_VERIFY_LOCK_SECONDS
+    while not await cache.aadd(lock_key, token, settings.KYC_VERIFY_LOCK_SECONDS):
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+    try:
+        outcome = await cache.aget(result_key)
+        if outcome is None:
+            analysis = await aanalyze_document(content)
+            outcome = await sync_to_async(complete_verification)(user, analysis)
+            await cache.aset(result_key, outcome, settings.KYC_VERIFY_RESULT_SECONDS)
+        return outcome
+    finally:
+        await sync_to_async(_release)(lock_key, token)
@@ -1,40 +1,109 @@
 # from rest_framework.decorators import api_view, permission_classes
+from functools import partial
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import (
     RegistrationSerializer,
     UserProfileSerializer,
+    UserProfileReadSerializer,
     ApproveKYCSerializer,
     RejectKYCSerializer,
     DocumentUploadSerializer,
     RefreshTokenSerializer,
+    UserExportSerializer,
+    ReviewQueueClaimSerializer,
+    ReviewQueueLeaseSerializer,
+    BulkKYCDecisionSerializer,
+    KYCStatsSerializer,
+    WebhookSubscriptionSerializer,
+    WebhookEventSerializer,
+    WebhookRequeueSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
+    UploadFinalizeSerializer,
 )
 from rest_framework.views import APIView
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from .utils import (
-    extract_text_from_ID,
-    extract_face_from_ID,
-    is_name_matching,
+from . import verification
+from .exports import stream_export, export_filename, export_content_type
+from . import review_queue
+from .stats import kyc_stats
+from .decisions import apply_decisions
+from .authentication import KYCTokenAuthentication, user_cache
+from .conditional import conditional_user_response
+from .idempotency import IDEMPOTENCY_HEADER, idempotent
+from .blacklist import FilteredRefreshToken, blacklist_filter
+from .ledger import attempt_writer
+from .media import IgnoreClientContentNegotiation, can_access, serve, signed_resource
+from project.timing import stage
+from . import webhooks
+from .models import UploadSession, WebhookEvent, WebhookSubscription
+from . import uploads
+from drf_spectacular.utils import (
+    extend_schema,
+    OpenApiResponse,
+    OpenApiExample,
+    OpenApiParameter,
 )
-from django.core.files.base import ContentFile
-from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
-from django.core.mail import send_mail
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 from django.conf import settings
 
 User = get_user_model()
 
+KYC_CONFLICT_MESSAGE = (
+    "The KYC status does not allow this change, it may have been changed by another request."
+)
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        "Unique key of this request; retries with the same key replay the first "
+        "response (marked by Idempotent-Replayed: true) instead of running again. "
+        "A retry sent while the first request runs gets a 409 with Retry-After. "
+        "Without authentication the key must be a UUID."
+    ),
+)
+
+
+def verification_response(outcome):
+    """The response of a document verification with the given outcome."""
+    if outcome == verification.NAME_MISMATCH:
+        return Response(
+            {"error": "Full name does not match ID."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if outcome == verification.CONFLICT:
+        return Response(
+            {"error": KYC_CONFLICT_MESSAGE}, status=status.HTTP_409_CONFLICT
+        )
+
+    return Response(
+        {"status": "Verification successful!"}, status=status.HTTP_200_OK
+    )
+
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
 
     @extend_schema(
         summary="User Registration",
-        description="Registers a new user with phone number, password, full name, and document.",
+        description=(
+            "Registers a new user with phone number, password, full name, and document. "
+            "The document can instead be uploaded beforehand in chunks (a signup upload "
+            "session, see /api/uploads/) and passed as document_upload."
+        ),
         request=RegistrationSerializer,
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={
             201: OpenApiResponse(
                 response={"status": "string"},
@@ -68,8 +137,20 @@ class RegisterView(APIView):
                     ),
                 ],
             ),
+            409: OpenApiResponse(
+                response={"error": "string"},
+                description=(
+                    "A request with the same Idempotency-Key is still being "
+                    "processed, retry after the Retry-After delay."
+                ),
+            ),
+            422: OpenApiResponse(
+                response={"error": "string"},
+                description="The Idempotency-Key was already used for a different request.",
+            ),
         },
     )
+    @idempotent
     def post(self, request):
         """
         Handle POST request for user registration.
@@ -164,7 +245,7 @@ class LogoutView(APIView):
         serializer.is_valid(raise_exception=True)
         refresh_token = serializer.validated_data["refresh"]
         try:
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({"status": "logout success"}, status=200)
         except Exception:
@@ -174,11 +255,24 @@ class LogoutView(APIView):
 
 
 class KYCStatusView(APIView):
+    # served from the token claims, without loading the user
+    authentication_classes = [KYCTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # polled all the time, but served without a query
+    throttle_cost = 1
 
     @extend_schema(
         summary="Retrieve KYC Verification Status",
         description="Returns the KYC verification status of the authenticated user.",
+        parameters=[
+            OpenApiParameter(
+                name="If-None-Match",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                required=False,
+                description="ETag of a previous response; 304 is returned if it is still current.",
+            ),
+        ],
         responses={
             200: OpenApiResponse(
                 response={"status": "string"},
@@ -198,6 +292,9 @@ class KYCStatusView(APIView):
                     ),
                 ],
             ),
+            304: OpenApiResponse(
+                description="Not modified since the response with the given ETag.",
+            ),
             401: OpenApiResponse(
                 response={"error": "string"},
                 description="User is not authenticated.",
@@ -220,6 +317,7 @@ class KYCStatusView(APIView):
             ),
         },
     )
+    @conditional_user_response("kyc-status", max_age=settings.KYC_STATUS_MAX_AGE)
     def get(self, request):
         """
         Handle GET request to retrieve the KYC verification status of the user.
@@ -245,6 +343,15 @@ class UserProfileView(APIView):
     @extend_schema(
         summary="Retrieve User Profile",
         description="Returns the profile details of the authenticated user.",
+        parameters=[
+            OpenApiParameter(
+                name="If-None-Match",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                required=False,
+                description="ETag of a previous response; 304 is returned if it is still current.",
+            ),
+        ],
         responses={
             200: OpenApiResponse(
                 response=UserProfileSerializer,
@@ -260,6 +367,7 @@ class UserProfileView(APIView):
                             "is_kyc_verified": True,
                             "kyc_rejection_reason": "",
                             "profile_photo": "",
+                            "profile_photo_renditions": {},
                             "document": "",
                         },
                         response_only=True,
@@ -267,6 +375,9 @@ class UserProfileView(APIView):
                     ),
                 ],
             ),
+            304: OpenApiResponse(
+                description="Not modified since the response with the given ETag.",
+            ),
             401: OpenApiResponse(
                 response={"error": "string"},
                 description="User is not authenticated.",
@@ -289,6 +400,11 @@ class UserProfileView(APIView):
             ),
         },
     )
+    # the profile lists signed media URLs, a cached copy lasts as long as them
+    @conditional_user_response(
+        partial(signed_resource, "user-profile"),
+        max_age=settings.USER_PROFILE_MAX_AGE,
+    )
     def get(self, request):
         """
         Handle GET request to retrieve the user profile.
@@ -300,8 +416,8 @@ class UserProfileView(APIView):
             Response: A Response object containing the serialized user profile data and HTTP status 200 (OK).
         """
         user = self.request.user
-        serializer = UserProfileSerializer(user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = UserProfileReadSerializer()
+        return Response(serializer.serialize_instance(user), status=status.HTTP_200_OK)
 
 
 class UsersView(APIView):
@@ -326,6 +442,7 @@ class UsersView(APIView):
                                 "is_kyc_verified": False,
                                 "kyc_rejection_reason": "",
                                 "profile_photo": "",
+                                "profile_photo_renditions": {},
                                 "document": "",
                             },
                             {
@@ -336,6 +453,7 @@ class UsersView(APIView):
                                 "is_kyc_verified": False,
                                 "kyc_rejection_reason": "",
                                 "profile_photo": "",
+                                "profile_photo_renditions": {},
                                 "document": "",
                             },
                         ],
@@ -385,9 +503,92 @@ class UsersView(APIView):
             Response: A Response object containing serialized user profile data
                       and an HTTP 200 OK status.
         """
-        users = User.objects.all()
-        serializer = UserProfileSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = UserProfileReadSerializer()
+        rows = serializer.queryset(User.objects.all())
+        return Response(serializer.serialize_rows(rows), status=status.HTTP_200_OK)
+
+
+class UsersExportView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Export All Users",
+        description=(
+            "Streams every user and their KYC outcome as NDJSON or CSV, ordered by id. "
+            "Pass the last id received as `after` to resume an interrupted export. "
+            "Admin access required."
+        ),
+        parameters=[
+            OpenApiParameter(
+                "output", str, enum=["ndjson", "csv"], description="Export format."
+            ),
+            OpenApiParameter("gzip", bool, description="Gzip the export on the fly."),
+            OpenApiParameter(
+                "after", int, description="Only export users with an id above this."
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(
+                description="Streamed export file.",
+            ),
+            400: OpenApiResponse(
+                response={"error": "string"},
+                description="Invalid export parameters.",
+                examples=[
+                    OpenApiExample(
+                        "Invalid Format",
+                        value={"output": ['"xml" is not a valid choice.']},
+                        response_only=True,
+                        status_codes=[400],
+                    ),
+                ],
+            ),
+            403: OpenApiResponse(
+                response={"error": "string"},
+                description="User does not have permission to access this resource.",
+                examples=[
+                    OpenApiExample(
+                        "Forbidden Access",
+                        value={
+                            "error": "You do not have permission to perform this action."
+                        },
+                        response_only=True,
+                        status_codes=[403],
+                    ),
+                ],
+            ),
+        },
+    )
+    def get(self, request):
+        """
+        Handle GET requests to stream an export of all users.
+
+        Rows are read with a chunked iterator and encoded one at a time, so the
+        memory used by the worker stays constant regardless of the number of users.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            StreamingHttpResponse: The export as an attachment.
+        """
+        serializer = UserExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        export_format = serializer.validated_data["output"]
+        gzip = serializer.validated_data["gzip"]
+
+        response = StreamingHttpResponse(
+            stream_export(
+                export_format,
+                after_id=serializer.validated_data.get("after"),
+                gzip=gzip,
+            ),
+            content_type=export_content_type(export_format, gzip),
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{export_filename(export_format, gzip)}"'
+        )
+        return response
 
 
 class ApproveKYCView(APIView):
@@ -448,6 +649,27 @@ class ApproveKYCView(APIView):
                     ),
                 ],
             ),
+            409: OpenApiResponse(
+                response={"error": "string"},
+                description=(
+                    "The user is claimed by another reviewer, or their KYC status "
+                    "changed while the request was processed."
+                ),
+                examples=[
+                    OpenApiExample(
+                        "Claimed By Another Reviewer",
+                        value={"error": "User is claimed by another reviewer."},
+                        response_only=True,
+                        status_codes=[409],
+                    ),
+                    OpenApiExample(
+                        "Concurrent Change",
+                        value={"error": KYC_CONFLICT_MESSAGE},
+                        response_only=True,
+                        status_codes=[409],
+                    ),
+                ],
+            ),
         },
     )
     def post(self, request, pk):
@@ -465,10 +687,21 @@ class ApproveKYCView(APIView):
             Http404: If the user with the specified primary key does not exist.
             ValidationError: If the provided data is not valid according to the serializer.
         """
-        user = get_object_or_404(User, pk=pk)
-        serializer = ApproveKYCSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save(user=user)
+        with transaction.atomic():
+            # locked, so that no reviewer claims the user before the decision
+            user = get_object_or_404(User.objects.select_for_update(), pk=pk)
+            if review_queue.claimed_by_other(user, request.user):
+                return Response(
+                    {"error": "User is claimed by another reviewer."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            serializer = ApproveKYCSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            if not serializer.save(user=user):
+                return Response(
+                    {"error": KYC_CONFLICT_MESSAGE}, status=status.HTTP_409_CONFLICT
+                )
+            review_queue.finish([user.pk])
         return Response({"status": "success"}, status=status.HTTP_200_OK)
 
 
@@ -530,6 +763,27 @@ class RejectKYCView(APIView):
                     ),
                 ],
             ),
+            409: OpenApiResponse(
+                response={"error": "string"},
+                description=(
+                    "The user is claimed by another reviewer, or their KYC status "
+                    "changed while the request was processed."
+                ),
+                examples=[
+                    OpenApiExample(
+                        "Claimed By Another Reviewer",
+                        value={"error": "User is claimed by another reviewer."},
+                        response_only=True,
+                        status_codes=[409],
+                    ),
+                    OpenApiExample(
+                        "Concurrent Change",
+                        value={"error": KYC_CONFLICT_MESSAGE},
+                        response_only=True,
+                        status_codes=[409],
+                    ),
+                ],
+            ),
         },
     )
     def post(self, request, pk):
@@ -547,15 +801,106 @@ class RejectKYCView(APIView):
             Http404: If the user with the given primary key does not exist.
             ValidationError: If the provided data is not valid.
         """
-        user = get_object_or_404(User, pk=pk)
-        serializer = RejectKYCSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save(user, serializer.validated_data)
+        with transaction.atomic():
+            # locked, so that no reviewer claims the user before the decision
+            user = get_object_or_404(User.objects.select_for_update(), pk=pk)
+            if review_queue.claimed_by_other(user, request.user):
+                return Response(
+                    {"error": "User is claimed by another reviewer."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            serializer = RejectKYCSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            if not serializer.save(user, serializer.validated_data):
+                return Response(
+                    {"error": KYC_CONFLICT_MESSAGE}, status=status.HTTP_409_CONFLICT
+                )
+            review_queue.finish([user.pk])
         return Response({"status": "success"}, status=status.HTTP_200_OK)
 
 
+class BulkKYCDecisionView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Bulk Approve/Reject KYC Verification",
+        description=(
+            "Applies up to 1000 approve/reject decisions in a single transaction and "
+            "returns the outcome for each user. Decision emails are queued in the outbox "
+            "and sent by the dispatch_outbox command. Admin access required."
+        ),
+        request=BulkKYCDecisionSerializer,
+        responses={
+            200: OpenApiResponse(
+                description="Per-user outcome of the decisions.",
+                examples=[
+                    OpenApiExample(
+                        "Bulk Decisions Applied",
+                        value={
+                            "results": [
+                                {"id": 1, "status": "approved"},
+                                {"id": 2, "status": "rejected"},
+                                {"id": 3, "status": "not_found"},
+                                {"id": 4, "status": "claimed"},
+                            ]
+                        },
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+            400: OpenApiResponse(
+                response={"error": "Validation error message"},
+                description="Invalid input data.",
+                examples=[
+                    OpenApiExample(
+                        "Missing Reason",
+                        value={
+                            "decisions": [
+                                {"reason": ["A reason is required to reject a user."]}
+                            ]
+                        },
+                        response_only=True,
+                        status_codes=[400],
+                    ),
+                ],
+            ),
+            403: OpenApiResponse(
+                response={"error": "Permission denied"},
+                description="User does not have the required permissions.",
+                examples=[
+                    OpenApiExample(
+                        "Forbidden Access",
+                        value={
+                            "error": "You do not have permission to perform this action."
+                        },
+                        response_only=True,
+                        status_codes=[403],
+                    ),
+                ],
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to approve and reject many users at once.
+
+        Args:
+            request (Request): The HTTP request object containing the list of decisions.
+
+        Returns:
+            Response: The outcome for each decision, in request order, with HTTP status 200 (OK).
+        """
+        serializer = BulkKYCDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_decisions(serializer.validated_data["decisions"], request.user)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 class VerifyIdentityView(APIView):
     permission_classes = [IsAuthenticated]
+    # each upload costs a Textract and a Rekognition call
+    throttle_cost = settings.KYC_VERIFY_THROTTLE_COST
 
     @extend_schema(
         summary="Verify User Identity",
@@ -564,6 +909,7 @@ class VerifyIdentityView(APIView):
             "compares extracted name with user's name, and marks the user as verified if they match."
         ),
         request=DocumentUploadSerializer,
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={
             200: OpenApiResponse(
                 response={"status": "Verification successful!"},
@@ -609,8 +955,29 @@ class VerifyIdentityView(APIView):
                     ),
                 ],
             ),
+            409: OpenApiResponse(
+                response={"error": "string"},
+                description=(
+                    "The KYC status changed while the document was processed, or a "
+                    "request with the same Idempotency-Key is still being processed "
+                    "(retry after the Retry-After delay)."
+                ),
+                examples=[
+                    OpenApiExample(
+                        "Concurrent Change",
+                        value={"error": KYC_CONFLICT_MESSAGE},
+                        response_only=True,
+                        status_codes=[409],
+                    ),
+                ],
+            ),
+            422: OpenApiResponse(
+                response={"error": "string"},
+                description="The Idempotency-Key was already used for a different request.",
+            ),
         },
     )
+    @idempotent
     def post(self, request):
         """
         Handle POST request for document upload and KYC verification.
@@ -630,33 +997,1055 @@ class VerifyIdentityView(APIView):
         Returns:
             Response: A Response object with the status of the verification process.
         """
-        serializer = DocumentUploadSerializer(data=request.data)
+        # parsing the multipart body reads the upload
+        with stage("upload"):
+            serializer = DocumentUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        document = serializer.validated_data["document"]
-        user = request.user
+        outcome = verification.verify_document(
+            request.user, serializer.validated_data["document"]
+        )
+        return verification_response(outcome)
 
-        extracted_text = extract_text_from_ID(document)
-        profile_picture = extract_face_from_ID(document)
 
-        if not is_name_matching(user.full_name, extracted_text):
-            send_mail(
-                subject="Document Rejected",
-                message="Greetings,\n\nKindly note your verification has been rejected as your name does not match the name on the ID provided.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-            return Response(
-                {"error": "Full name does not match ID."},
-                status=status.HTTP_400_BAD_REQUEST,
+class ReviewQueueClaimView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Claim Users From The Review Queue",
+        description=(
+            "Atomically claims the next `count` users waiting for a KYC review, oldest first. "
+            "Claims are leases: they expire unless renewed through the heartbeat endpoint. "
+            "Admin access required."
+        ),
+        request=ReviewQueueClaimSerializer,
+        responses={
+            200: OpenApiResponse(
+                description="Users claimed for review.",
+                examples=[
+                    OpenApiExample(
+                        "Claimed Users",
+                        value={
+                            "lease_seconds": 300,
+                            "claims": [
+                                {
+                                    "expires_at": "2025-03-01T10:05:00Z",
+                                    "user": {
+                                        "id": 1,
+                                        "full_name": "John Doe",
+                                        "phone_number": "+1234567890",
+                                        "email": "johndoe@example.com",
+                                        "is_kyc_verified": False,
+                                        "kyc_rejection_reason": "",
+                                        "profile_photo": None,
+                                        "profile_photo_renditions": {},
+                                        "document": "/media/documents/id.pdf",
+                                    },
+                                }
+                            ],
+                        },
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+            400: OpenApiResponse(
+                response={"error": "string"},
+                description="Invalid input data.",
+                examples=[
+                    OpenApiExample(
+                        "Too Many Users",
+                        value={"count": ["At most 25 users can be claimed at once."]},
+                        response_only=True,
+                        status_codes=[400],
+                    ),
+                ],
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to claim pending users for the requesting reviewer.
+
+        Args:
+            request (Request): The HTTP request object containing the number of users to claim.
+
+        Returns:
+            Response: The claimed users with their lease expiry. The list is empty
+                      when no unclaimed user is waiting.
+        """
+        serializer = ReviewQueueClaimSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        claims = review_queue.claim_next(
+            request.user, serializer.validated_data["count"]
+        )
+
+        read_serializer = UserProfileReadSerializer()
+        users = {
+            row["id"]: row
+            for row in read_serializer.serialize_rows(
+                read_serializer.queryset(
+                    User.objects.filter(pk__in=[claim.user_id for claim in claims])
+                )
             )
+        }
+        return Response(
+            {
+                "lease_seconds": settings.KYC_REVIEW_LEASE_SECONDS,
+                "claims": [
+                    {"expires_at": claim.expires_at, "user": users[claim.user_id]}
+                    for claim in claims
+                    if claim.user_id in users
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class ReviewQueueHeartbeatView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Renew Review Claims",
+        description=(
+            "Extends the requesting reviewer's active claims on the given users. "
+            "Expired claims are not renewed and are reported as lost. Admin access required."
+        ),
+        request=ReviewQueueLeaseSerializer,
+        responses={
+            200: OpenApiResponse(
+                description="Claims renewed.",
+                examples=[
+                    OpenApiExample(
+                        "Renewed Claims",
+                        value={"renewed": [1, 2], "lost": [3]},
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to renew the reviewer's claims.
 
-        user.profile_photo.save(f"{user.id}_profile.jpg", ContentFile(profile_picture))
+        Args:
+            request (Request): The HTTP request object containing the claimed user ids.
 
-        user.is_kyc_verified = True
-        user.save()
+        Returns:
+            Response: The ids whose claims were renewed and the ids that were lost.
+        """
+        serializer = ReviewQueueLeaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data["user_ids"]
 
+        renewed = review_queue.heartbeat(request.user, user_ids)
         return Response(
-            {"status": "Verification successful!"}, status=status.HTTP_200_OK
+            {
+                "renewed": sorted(renewed),
+                "lost": sorted(set(user_ids) - set(renewed)),
+            },
+            status=status.HTTP_200_OK,
         )
+
+
+class ReviewQueueReleaseView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Release Review Claims",
+        description="Returns the given users to the review queue. Admin access required.",
+        request=ReviewQueueLeaseSerializer,
+        responses={
+            200: OpenApiResponse(
+                response={"status": "success"},
+                description="Claims released.",
+                examples=[
+                    OpenApiExample(
+                        "Claims Released",
+                        value={"status": "success"},
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to release the reviewer's claims.
+
+        Args:
+            request (Request): The HTTP request object containing the claimed user ids.
+
+        Returns:
+            Response: A success response with HTTP status 200 (OK).
+        """
+        serializer = ReviewQueueLeaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        review_queue.release(request.user, serializer.validated_data["user_ids"])
+        return Response({"status": "success"}, status=status.HTTP_200_OK)
+
+
+class ReviewQueueStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Review Queue Statistics",
+        description="Returns the review queue depth and lease ages. Admin access required.",
+        responses={
+            200: OpenApiResponse(
+                description="Review queue statistics.",
+                examples=[
+                    OpenApiExample(
+                        "Queue Statistics",
+                        value={
+                            "pending": 120,
+                            "claimed": 20,
+                            "unclaimed": 100,
+                            "lease_seconds": 300,
+                            "oldest_claim_age_seconds": 240.5,
+                            "stalest_heartbeat_age_seconds": 55.2,
+                            "reviewers": [{"reviewer_id": 7, "claimed": 10}],
+                        },
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def get(self, request):
+        """
+        Handle GET request to retrieve review queue statistics.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            Response: Queue depth, claim counts and lease ages.
+        """
+        return Response(review_queue.queue_stats(), status=status.HTTP_200_OK)
+
+
+class KYCStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="KYC Statistics",
+        description=(
+            "Returns the number of users in each KYC state and, for the last `days` "
+            "days, the signups, verifications, rejections and verification rate of "
+            "each day. Served from incrementally maintained counters, so the cost "
+            "does not grow with the number of users. Admin access required."
+        ),
+        parameters=[
+            OpenApiParameter(
+                "days", int, description="Number of days of daily figures (default 30)."
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(
+                description="KYC statistics.",
+                examples=[
+                    OpenApiExample(
+                        "KYC Statistics",
+                        value={
+                            "totals": {
+                                "pending": 120,
+                                "verified": 4500,
+                                "rejected": 310,
+                                "total": 4930,
+                            },
+                            "daily": [
+                                {
+                                    "date": "2025-03-01",
+                                    "signups": 85,
+                                    "verified": 61,
+                                    "rejected": 4,
+                                    "verification_rate": 0.9385,
+                                }
+                            ],
+                        },
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+            400: OpenApiResponse(
+                response={"error": "string"},
+                description="Invalid number of days.",
+                examples=[
+                    OpenApiExample(
+                        "Too Many Days",
+                        value={"days": ["At most 366 days can be requested."]},
+                        response_only=True,
+                        status_codes=[400],
+                    ),
+                ],
+            ),
+        },
+    )
+    def get(self, request):
+        """
+        Handle GET request to retrieve the KYC statistics.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            Response: State totals and daily figures.
+        """
+        serializer = KYCStatsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            kyc_stats(serializer.validated_data["days"]), status=status.HTTP_200_OK
+        )
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Worker Metrics",
+        description=(
+            "Returns the counters of the worker serving the request, such as the "
+            "authentication user cache hit ratio and the token blacklist filter "
+            "size and false positive rate, or the KYC attempts written to the "
+            "ledger and those dropped (queue overflows, and failed inserts counted "
+            "again in failed). Admin access required."
+        ),
+        responses={
+            200: OpenApiResponse(
+                description="Metrics of this worker.",
+                examples=[
+                    OpenApiExample(
+                        "Metrics",
+                        value={
+                            "user_cache": {
+                                "local_hits": 900,
+                                "shared_hits": 60,
+                                "misses": 40,
+                                "hit_ratio": 0.96,
+                                "db_queries_saved": 960,
+                                "local_size": 35,
+                            },
+                            "token_blacklist_filter": {
+                                "items": 1200,
+                                "capacity": 100000,
+                                "size_bytes": 179720,
+                                "hashes": 10,
+                                "expected_false_positive_rate": 0.0,
+                                "lookups": 300,
+                                "database_checks": 4,
+                                "false_positives": 0,
+                                "observed_false_positive_rate": 0.0,
+                            },
+                            "kyc_attempt_writer": {
+                                "queued": 0,
+                                "written": 250,
+                                "dropped": 0,
+                                "failed": 0,
+                            },
+                        },
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def get(self, request):
+        """
+        Handle GET request to retrieve the metrics of this worker.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            Response: The counters of this worker process.
+        """
+        return Response(
+            {
+                "user_cache": user_cache.stats(),
+                "token_blacklist_filter": blacklist_filter.stats(),
+                "kyc_attempt_writer": attempt_writer.stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+WEBHOOK_SUBSCRIPTION_EXAMPLE = {
+    "id": 1,
+    "url": "https://partner.example.com/kyc-webhook",
+    "secret": "5f0c3c2e9a8b4d7e8f1a2b3c4d5e6f708192a3b4c5d6e7f8091a2b3c4d5e6f70",
+    "states": ["verified", "rejected"],
+    "is_active": True,
+    "created_at": "2025-03-01T09:00:00Z",
+    "delivered_events": 1520,
+    "delivered_batches": 310,
+    "failed_deliveries": 2,
+    "last_delivery_at": "2025-03-02T10:15:05Z",
+    "last_status": 200,
+    "last_error": "",
+    "pending_events": 3,
+    "dead_letters": 0,
+}
+
+
+class WebhookSubscriptionsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="List Webhook Subscriptions",
+        description=(
+            "Returns the webhook subscriptions with their delivery metrics: events "
+            "and batches delivered, failed deliveries, the outcome of the last "
+            "delivery and the number of pending events and dead letters. Admin "
+            "access required."
+        ),
+        responses={
+            200: OpenApiResponse(
+                response=WebhookSubscriptionSerializer(many=True),
+                description="Webhook subscriptions.",
+                examples=[
+                    OpenApiExample(
+                        "Subscriptions",
+                        value=[WEBHOOK_SUBSCRIPTION_EXAMPLE],
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def get(self, request):
+        """
+        Handle GET request to list the webhook subscriptions.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            Response: The subscriptions and their delivery metrics.
+        """
+        serializer = WebhookSubscriptionSerializer(webhooks.subscriptions(), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary="Create Webhook Subscription",
+        description=(
+            "Subscribes a URL to KYC state changes, optionally only to some states. "
+            "Changes are POSTed in batches by the dispatch_webhooks command, signed "
+            "with the subscription's secret in the X-KYC-Signature header "
+            "(t=<unix time>,v1=<HMAC-SHA256 of '<t>.<body>'>). A secret is "
+            "generated unless one is given. Admin access required."
+        ),
+        request=WebhookSubscriptionSerializer,
+        responses={
+            201: OpenApiResponse(
+                response=WebhookSubscriptionSerializer,
+                description="Subscription created.",
+                examples=[
+                    OpenApiExample(
+                        "Subscription Created",
+                        value=WEBHOOK_SUBSCRIPTION_EXAMPLE,
+                        response_only=True,
+                        status_codes=[201],
+                    ),
+                ],
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to create a webhook subscription.
+
+        Args:
+            request (Request): The HTTP request object containing the URL and states.
+
+        Returns:
+            Response: The new subscription with HTTP status 201 (Created).
+        """
+        serializer = WebhookSubscriptionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        subscription = serializer.save()
+        return Response(
+            WebhookSubscriptionSerializer(
+                webhooks.subscriptions().get(pk=subscription.pk)
+            ).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class WebhookSubscriptionView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="Update Webhook Subscription",
+        description=(
+            "Changes the URL, secret or states of a subscription, or pauses it "
+            "with is_active=false; the events of a paused subscription are kept "
+            "until it is resumed. Admin access required."
+        ),
+        request=WebhookSubscriptionSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=WebhookSubscriptionSerializer,
+                description="Subscription updated.",
+            ),
+            404: OpenApiResponse(description="Subscription not found."),
+        },
+    )
+    def patch(self, request, pk):
+        """
+        Handle PATCH request to update a webhook subscription.
+
+        Args:
+            request (Request): The HTTP request object containing the changes.
+            pk (int): The primary key of the subscription.
+
+        Returns:
+            Response: The updated subscription.
+        """
+        subscription = get_object_or_404(webhooks.subscriptions(), pk=pk)
+        serializer = WebhookSubscriptionSerializer(
+            subscription, data=request.data, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary="Delete Webhook Subscription",
+        description=(
+            "Deletes a subscription with its pending events and dead letters. "
+            "Admin access required."
+        ),
+        responses={
+            204: OpenApiResponse(description="Subscription deleted."),
+            404: OpenApiResponse(description="Subscription not found."),
+        },
+    )
+    def delete(self, request, pk):
+        """
+        Handle DELETE request to remove a webhook subscription.
+
+        Args:
+            request (Request): The HTTP request object.
+            pk (int): The primary key of the subscription.
+
+        Returns:
+            Response: An empty response with HTTP status 204 (No Content).
+        """
+        get_object_or_404(WebhookSubscription, pk=pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class WebhookDeadLettersView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @extend_schema(
+        summary="List Webhook Dead Letters",
+        description=(
+            "Returns the oldest events whose delivery still failed after "
+            "WEBHOOK_MAX_ATTEMPTS attempts. Admin access required."
+        ),
+        parameters=[
+            OpenApiParameter(
+                "subscription",
+                int,
+                description="Only the dead letters of this subscription.",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(
+                response=WebhookEventSerializer(many=True),
+                description="Dead letters, at most 100.",
+                examples=[
+                    OpenApiExample(
+                        "Dead Letters",
+                        value=[
+                            {
+                                "id": 812,
+                                "subscription": 1,
+                                "user": 42,
+                                "previous_state": "pending",
+                                "state": "verified",
+                                "occurred_at": "2025-03-02T10:15:00Z",
+                                "attempts": 10,
+                                "last_error": "HTTP 503",
+                            }
+                        ],
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def get(self, request):
+        """
+        Handle GET request to list the webhook dead letters.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            Response: The oldest dead letters.
+        """
+        events = WebhookEvent.objects.filter(status=WebhookEvent.DEAD)
+        subscription = request.query_params.get("subscription")
+        if subscription is not None:
+            if not subscription.isdigit():
+                return Response(
+                    {"subscription": ["A valid integer is required."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            events = events.filter(subscription_id=subscription)
+        serializer = WebhookEventSerializer(events.order_by("id")[:100], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary="Retry Webhook Dead Letters",
+        description=(
+            "Queues the given dead letters, or all those of a subscription, for "
+            "delivery again. Admin access required."
+        ),
+        request=WebhookRequeueSerializer,
+        responses={
+            200: OpenApiResponse(
+                response={"requeued": "integer"},
+                description="Dead letters queued again.",
+                examples=[
+                    OpenApiExample(
+                        "Requeued",
+                        value={"requeued": 12},
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to retry webhook dead letters.
+
+        Args:
+            request (Request): The HTTP request object containing the ids or subscription.
+
+        Returns:
+            Response: The number of events queued again.
+        """
+        serializer = WebhookRequeueSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        events = WebhookEvent.objects.all()
+        if "ids" in serializer.validated_data:
+            events = events.filter(pk__in=serializer.validated_data["ids"])
+        if "subscription" in serializer.validated_data:
+            events = events.filter(
+                subscription_id=serializer.validated_data["subscription"]
+            )
+        return Response(
+            {"requeued": webhooks.requeue(events)}, status=status.HTTP_200_OK
+        )
+
+
+class MediaView(APIView):
+    permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreClientContentNegotiation
+    # the signature already gates the downloads, a page showing a few documents
+    # would otherwise drain the bucket (and write to it for every file)
+    throttle_cost = 0
+
+    @extend_schema(
+        summary="Download Media File",
+        description=(
+            "Returns an identity document or profile photo. The request must either "
+            "use the signed URL returned by the API (valid for a few minutes, no "
+            "authentication needed) or be authenticated as the owner of the file "
+            "or an admin. Behind nginx the file is sent by the proxy "
+            "(X-Accel-Redirect); Range and conditional requests are supported."
+        ),
+        parameters=[
+            OpenApiParameter(
+                "expires", int, description="Expiry of the signed URL (unix time)."
+            ),
+            OpenApiParameter("signature", str, description="Signature of the URL."),
+        ],
+        responses={
+            (200, "application/octet-stream"): OpenApiResponse(
+                response=bytes, description="The file."
+            ),
+            (206, "application/octet-stream"): OpenApiResponse(
+                response=bytes, description="The requested range of the file."
+            ),
+            304: OpenApiResponse(description="Not modified."),
+            403: OpenApiResponse(
+                description="Invalid or expired signature, or not the owner's file."
+            ),
+            404: OpenApiResponse(description="File not found."),
+            416: OpenApiResponse(description="Range not satisfiable."),
+        },
+    )
+    def get(self, request, name):
+        """
+        Handle GET request to download a media file.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+            name (str): The name of the file in the media storage.
+
+        Returns:
+            HttpResponse: The file, or an X-Accel-Redirect to it.
+        """
+        if not can_access(request, name):
+            signed = "signature" in request.query_params
+            if not signed and not request.user.is_authenticated:
+                raise NotAuthenticated()
+            raise PermissionDenied()
+        return serve(request, name)
+
+
+UPLOAD_SESSION_EXAMPLE = {
+    "id": "3f2b8c1e-6d4a-4f7b-9e0a-1c2d3e4f5a6b",
+    "purpose": "verification",
+    "filename": "passport.pdf",
+    "content_type": "application/pdf",
+    "size": 7340032,
+    "offset": 2097152,
+    "status": "open",
+    "chunk_size": 1048576,
+    "expires_at": "2025-03-02T10:15:00Z",
+}
+
+
+def get_upload_session(request, pk):
+    """The unexpired upload session `pk`, if the request may use it."""
+    session = get_object_or_404(UploadSession, pk=pk, expires_at__gt=timezone.now())
+    if session.user_id is not None and session.user_id != request.user.pk:
+        raise Http404("No upload session matches the given query.")
+    return session
+
+
+def upload_error_response(exc):
+    return Response(
+        {"error": exc.message, "offset": exc.offset}, status=exc.status_code
+    )
+
+
+class UploadSessionsView(APIView):
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        summary="Create Resumable Upload",
+        description=(
+            "Starts a resumable document upload. The document is then sent in chunks "
+            "with PUT /api/uploads/{id}/ and the upload finalized with "
+            "POST /api/uploads/{id}/finalize/. Verification uploads require "
+            "authentication and are verified when finalized; signup uploads are "
+            "anonymous and passed as document_upload to /api/signup/."
+        ),
+        request=UploadSessionCreateSerializer,
+        responses={
+            201: OpenApiResponse(
+                response=UploadSessionSerializer,
+                description="Upload session created.",
+                examples=[
+                    OpenApiExample(
+                        "Upload Created",
+                        value={**UPLOAD_SESSION_EXAMPLE, "offset": 0},
+                        response_only=True,
+                        status_codes=[201],
+                    ),
+                ],
+            ),
+            400: OpenApiResponse(description="Invalid file type or size."),
+            401: OpenApiResponse(
+                description="Verification uploads need authentication."
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Handle POST request to create an upload session.
+
+        Args:
+            request (Request): The HTTP request object containing the upload details.
+
+        Returns:
+            Response: The upload session with HTTP status 201 (Created).
+        """
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = None
+        if data["purpose"] == UploadSession.VERIFICATION:
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            user = request.user
+        session = uploads.create_session(
+            user, data["purpose"], data["filename"], data["content_type"], data["size"]
+        )
+        return Response(
+            UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED
+        )
+
+
+class UploadSessionView(APIView):
+    permission_classes = [AllowAny]
+    # the chunks are bounded by the size of the upload, and creating uploads
+    # is throttled; a document takes many chunks on a poor link
+    throttle_cost = 0
+
+    @extend_schema(
+        summary="Resumable Upload Status",
+        description=(
+            "Returns the upload session; its offset, also in the Upload-Offset header "
+            "(HEAD requests), is where the next chunk starts."
+        ),
+        responses={
+            200: OpenApiResponse(
+                response=UploadSessionSerializer,
+                description="The upload session.",
+                examples=[
+                    OpenApiExample(
+                        "Upload In Progress",
+                        value=UPLOAD_SESSION_EXAMPLE,
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+            404: OpenApiResponse(description="Unknown or expired upload session."),
+        },
+    )
+    def get(self, request, pk):
+        """
+        Handle GET and HEAD requests to retrieve an upload session.
+
+        Args:
+            request (Request): The HTTP request object.
+            pk (UUID): The id of the upload session.
+
+        Returns:
+            Response: The upload session, with the Upload-Offset header.
+        """
+        session = get_upload_session(request, pk)
+        response = Response(UploadSessionSerializer(session).data)
+        response[uploads.OFFSET_HEADER] = str(session.offset)
+        response["Cache-Control"] = "no-store"
+        return response
+
+    @extend_schema(
+        summary="Upload Chunk",
+        description=(
+            "Appends the raw request body at Upload-Offset, which must be the current "
+            "offset of the upload. Chunk-SHA256 is the SHA-256 of the body in hex; "
+            "a chunk that does not match it, or is cut short, is discarded and can "
+            "be sent again. On a 409 the response gives the offset to resume from."
+        ),
+        request={"application/octet-stream": bytes},
+        parameters=[
+            OpenApiParameter(
+                uploads.OFFSET_HEADER,
+                int,
+                location=OpenApiParameter.HEADER,
+                required=True,
+                description="Offset of the chunk in the file.",
+            ),
+            OpenApiParameter(
+                uploads.CHECKSUM_HEADER,
+                str,
+                location=OpenApiParameter.HEADER,
+                required=True,
+                description="SHA-256 of the chunk, in hex.",
+            ),
+        ],
+        responses={
+            200: OpenApiResponse(
+                response=UploadSessionSerializer,
+                description="Chunk stored, the offset moved past it.",
+            ),
+            400: OpenApiResponse(
+                response={"error": "string"},
+                description="Missing headers, or a truncated or corrupted chunk.",
+                examples=[
+                    OpenApiExample(
+                        "Checksum Mismatch",
+                        value={
+                            "error": "The chunk does not match its checksum.",
+                            "offset": 2097152,
+                        },
+                        response_only=True,
+                        status_codes=[400],
+                    ),
+                ],
+            ),
+            409: OpenApiResponse(
+                response={"error": "string", "offset": "integer"},
+                description="Wrong offset, request in progress or finalized upload.",
+                examples=[
+                    OpenApiExample(
+                        "Wrong Offset",
+                        value={
+                            "error": "The upload continues at offset 2097152.",
+                            "offset": 2097152,
+                        },
+                        response_only=True,
+                        status_codes=[409],
+                    ),
+                ],
+            ),
+            413: OpenApiResponse(description="The chunk is too large."),
+        },
+    )
+    def put(self, request, pk):
+        """
+        Handle PUT request to append a chunk to an upload.
+
+        The body is streamed to the upload's temporary file, it is never
+        loaded in memory.
+
+        Args:
+            request (Request): The HTTP request object, its body is the chunk.
+            pk (UUID): The id of the upload session.
+
+        Returns:
+            Response: The upload session with its new offset.
+        """
+        session = get_upload_session(request, pk)
+        offset = request.headers.get(uploads.OFFSET_HEADER, "")
+        checksum = request.headers.get(uploads.CHECKSUM_HEADER, "")
+        length = request.headers.get("Content-Length", "")
+        if not offset.isdigit() or len(checksum) != 64 or not length.isdigit():
+            return Response(
+                {
+                    "error": f"{uploads.OFFSET_HEADER}, {uploads.CHECKSUM_HEADER} and "
+                    "Content-Length are required."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if int(length) > settings.KYC_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                {
+                    "error": f"Chunks can be at most "
+                    f"{settings.KYC_UPLOAD_MAX_CHUNK_SIZE} bytes."
+                },
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        try:
+            with stage("upload"):
+                uploads.write_chunk(
+                    session, int(offset), request.stream, int(length), checksum
+                )
+        except uploads.UploadError as exc:
+            return upload_error_response(exc)
+        response = Response(UploadSessionSerializer(session).data)
+        response[uploads.OFFSET_HEADER] = str(session.offset)
+        return response
+
+    @extend_schema(
+        summary="Cancel Upload",
+        description="Deletes the upload session and what was uploaded.",
+        responses={
+            204: OpenApiResponse(description="Upload cancelled."),
+            404: OpenApiResponse(description="Unknown or expired upload session."),
+        },
+    )
+    def delete(self, request, pk):
+        """
+        Handle DELETE request to cancel an upload.
+
+        Args:
+            request (Request): The HTTP request object.
+            pk (UUID): The id of the upload session.
+
+        Returns:
+            Response: An empty response with HTTP status 204 (No Content).
+        """
+        uploads.delete_session(get_upload_session(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadFinalizeView(APIView):
+    permission_classes = [AllowAny]
+    # finalizing a verification upload costs a Textract and a Rekognition call
+    throttle_cost = settings.KYC_VERIFY_THROTTLE_COST
+
+    @extend_schema(
+        summary="Finalize Upload",
+        description=(
+            "Checks the uploaded file against the SHA-256 of the whole file. A "
+            "verification upload is then verified like a document sent to "
+            "/api/upload-document/, with the same responses; finalizing it again "
+            "returns the same outcome. A signup upload is ready to be passed to "
+            "/api/signup/. A file that does not match the hash has to be uploaded "
+            "again from offset 0."
+        ),
+        request=UploadFinalizeSerializer,
+        responses={
+            200: OpenApiResponse(
+                response={"status": "string"},
+                description="Verification successful, or signup upload complete.",
+                examples=[
+                    OpenApiExample(
+                        "Successful Verification",
+                        value={"status": "Verification successful!"},
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                    OpenApiExample(
+                        "Signup Upload Complete",
+                        value={
+                            "status": "complete",
+                            "document_upload": "3f2b8c1e-6d4a-4f7b-9e0a-1c2d3e4f5a6b",
+                        },
+                        response_only=True,
+                        status_codes=[200],
+                    ),
+                ],
+            ),
+            400: OpenApiResponse(
+                response={"error": "string"},
+                description="Name mismatch, or the file does not match the hash.",
+            ),
+            409: OpenApiResponse(
+                response={"error": "string"},
+                description="The upload is incomplete or busy, or the KYC status changed.",
+            ),
+        },
+    )
+    def post(self, request, pk):
+        """
+        Handle POST request to finalize an upload.
+
+        Args:
+            request (Request): The HTTP request object containing the file hash.
+            pk (UUID): The id of the upload session.
+
+        Returns:
+            Response: The verification outcome, or the completed signup upload.
+        """
+        session = get_upload_session(request, pk)
+        serializer = UploadFinalizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            uploads.finalize(session, serializer.validated_data["sha256"])
+        except uploads.UploadError as exc:
+            return upload_error_response(exc)
+
+        if session.purpose == UploadSession.SIGNUP:
+            return Response(
+                {"status": "complete", "document_upload": str(session.pk)},
+                status=status.HTTP_200_OK,
+            )
+
+        if not session.outcome:
+            with uploads.open_upload(session) as document:
+                session.outcome = verification.verify_document(request.user, document)
+            session.save(update_fields=["outcome"])
+        return verification_response(session.outcome)
@@ -0,0 +1,288 @@
+"""
+Webhook delivery of KYC state changes, run by the dispatch_webhooks command.
+
+Every KYC transition adds a WebhookEvent per matching subscription, in the
+transaction of the change. Events are due at the end of the
+WEBHOOK_BATCH_WINDOW_SECONDS window they happened in, so that a
+subscription receives the changes of a window in one request. Requests go
+through a pooled urllib3 client, are signed with the subscription's secret
+and failed deliveries are retried with exponential backoff; events still
+failing after WEBHOOK_MAX_ATTEMPTS become dead letters.
+
+Receivers check the signature header against the raw body, see
+verify_signature.
+"""
+
+import hashlib
+import hmac
+import logging
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import orjson
+import urllib3
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import WebhookEvent, WebhookSubscription
+from .signals import kyc_state_changed
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPE = "kyc.state_changed"
+SIGNATURE_HEADER = "X-KYC-Signature"
+DELIVERY_HEADER = "X-KYC-Delivery"
+# signatures older than this are rejected by verify_signature
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+
+def sign(secret, timestamp, body):
+    """The signature header of a payload: t=<unix time>,v1=<hex HMAC-SHA256>."""
+    digest = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret, header, body, tolerance=SIGNATURE_TOLERANCE_SECONDS):
+    """Whether `header` is a recent signature of the raw `body`."""
+    try:
+        fields = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(fields["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+
+def window_end(moment):
+    """End of the batching window `moment` falls in."""
+    window = settings.WEBHOOK_BATCH_WINDOW_SECONDS
+    if window <= 0:
+        return moment
+    end = -(-moment.timestamp() // window) * window
+    return datetime.fromtimestamp(end, dt_timezone.utc)
+
+
+@receiver(kyc_state_changed)
+def _queue_events(sender, changes, **kwargs):
+    changes = [change for change in changes if change[1] != change[2]]
+    if not changes:
+        return
+    subscriptions = list(
+        WebhookSubscription.objects.filter(is_active=True).values_list("pk", "states")
+    )
+    if not subscriptions:
+        return
+    now = timezone.now()
+    available_at = window_end(now)
+    WebhookEvent.objects.bulk_create(
+        WebhookEvent(
+            subscription_id=subscription_id,
+            user_id=user_id,
+            previous_state=previous,
+            state=state,
+            occurred_at=now,
+            available_at=available_at,
+        )
+        for subscription_id, states in subscriptions
+        for user_id, previous, state in changes
+        if not states or state in states
+    )
+
+
+def subscriptions():
+    """The subscriptions with their number of pending events and dead letters."""
+    return WebhookSubscription.objects.annotate(
+        pending_events=Count("events", filter=Q(events__status=WebhookEvent.PENDING)),
+        dead_letters=Count("events", filter=Q(events__status=WebhookEvent.DEAD)),
+    ).order_by("pk")
+
+
+def claim_events(limit):
+    """
+    Lease up to `limit` due events of active subscriptions, oldest first.
+
+    Returns:
+        list[WebhookEvent]: The claimed events, with their subscription.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        events = list(
+            WebhookEvent.objects.filter(
+                Q(leased_until__isnull=True) | Q(leased_until__lt=now),
+                status=WebhookEvent.PENDING,
+                available_at__lte=now,
+                subscription__is_active=True,
+            )
+            .select_related("subscription")
+            .order_by("available_at", "id")
+            .select_for_update(skip_locked=True, of=("self",))[:limit]
+        )
+        WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            leased_until=now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+        )
+    return events
+
+
+def payload(events):
+    return {
+        "id": str(uuid.uuid4()),
+        "type": EVENT_TYPE,
+        "events": [
+            {
+                "id": event.pk,
+                "user_id": event.user_id,
+                "previous_state": event.previous_state,
+                "state": event.state,
+                "occurred_at": event.occurred_at,
+            }
+            for event in events
+        ],
+    }
+
+
+def retry_delay(attempts):
+    """Seconds before the next delivery, exponential with jitter."""
+    delay = min(
+        settings.WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.WEBHOOK_RETRY_MAX_SECONDS,
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+class Dispatcher:
+    """Delivers the due events, one signed request per subscription batch."""
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or settings.WEBHOOK_CONCURRENCY
+        # urllib3 keeps the connections to each host open between requests
+        self.http = urllib3.PoolManager(
+            num_pools=100,
+            maxsize=self.concurrency,
+            retries=False,
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+        )
+        self._pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix="webhooks")
+        self.metrics = Counter()
+        self.latency_ms = 0.0
+
+    def dispatch(self):
+        """
+        Deliver one round of due events.
+
+        Returns:
+            int: The number of events handled, delivered or not.
+        """
+        events = claim_events(settings.WEBHOOK_BATCH_SIZE * self.concurrency)
+        if not events:
+            return 0
+        by_subscription = defaultdict(list)
+        for event in events:
+            by_subscription[event.subscription_id].append(event)
+        batches = [
+            subscription_events[start : start + settings.WEBHOOK_BATCH_SIZE]
+            for subscription_events in by_subscription.values()
+            for start in range(0, len(subscription_events), settings.WEBHOOK_BATCH_SIZE)
+        ]
+        for batch, outcome in zip(batches, self._pool.map(self._deliver, batches)):
+            self._finish(batch, *outcome)
+        return len(events)
+
+    def stats(self):
+        batches = self.metrics["batches"] + self.metrics["failures"]
+        return {
+            **self.metrics,
+            "average_latency_ms": (
+                round(self.latency_ms / batches, 1) if batches else None
+            ),
+        }
+
+    def close(self):
+        self._pool.shutdown()
+        self.http.clear()
+
+    def _deliver(self, events):
+        """Returns the HTTP status (None if unreachable), an error and the latency."""
+        subscription = events[0].subscription
+        data = payload(events)
+        body = orjson.dumps(data)
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "kyc-webhooks/1.0",
+            SIGNATURE_HEADER: sign(subscription.secret, int(time.time()), body),
+            DELIVERY_HEADER: data["id"],
+        }
+        started = time.perf_counter()
+        try:
+            response = self.http.request(
+                "POST", subscription.url, body=body, headers=headers
+            )
+        except urllib3.exceptions.HTTPError as exc:
+            return None, repr(exc), (time.perf_counter() - started) * 1000
+        elapsed = (time.perf_counter() - started) * 1000
+        if 200 <= response.status < 300:
+            return response.status, "", elapsed
+        return response.status, f"HTTP {response.status}", elapsed
+
+    def _finish(self, events, status, error, elapsed):
+        subscription = events[0].subscription
+        now = timezone.now()
+        self.latency_ms += elapsed
+        if not error:
+            self.metrics["batches"] += 1
+            self.metrics["events"] += len(events)
+            with transaction.atomic():
+                WebhookEvent.objects.filter(
+                    pk__in=[event.pk for event in events]
+                ).delete()
+                WebhookSubscription.objects.filter(pk=subscription.pk).update(
+                    delivered_events=F("delivered_events") + len(events),
+                    delivered_batches=F("delivered_batches") + 1,
+                    last_delivery_at=now,
+                    last_status=status,
+                    last_error="",
+                )
+            return
+
+        logger.warning("Webhook delivery to %s failed: %s", subscription.url, error)
+        self.metrics["failures"] += 1
+        by_attempts = defaultdict(list)
+        for event in events:
+            by_attempts[event.attempts + 1].append(event.pk)
+        with transaction.atomic():
+            for attempts, pks in by_attempts.items():
+                dead = attempts >= settings.WEBHOOK_MAX_ATTEMPTS
+                if dead:
+                    self.metrics["dead"] += len(pks)
+                WebhookEvent.objects.filter(pk__in=pks).update(
+                    status=WebhookEvent.DEAD if dead else WebhookEvent.PENDING,
+                    attempts=attempts,
+                    available_at=now + timedelta(seconds=retry_delay(attempts)),
+                    leased_until=None,
+                    last_error=error,
+                )
+            WebhookSubscription.objects.filter(pk=subscription.pk).update(
+                failed_deliveries=F("failed_deliveries") + 1,
+                last_delivery_at=now,
+                last_status=status,
+                last_error=error,
+            )
+
+
+def requeue(events):
+    """Send dead letters again, returns their number."""
+    return events.filter(status=WebhookEvent.DEAD).update(
+        status=WebhookEvent.PENDING,
+        attempts=0,
+        available_at=timezone.now(),
+        leased_until=None,
+    )
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+# like get_asgi_application(), with the project's handler
+django.setup(set_prefix=False)
+
+from project.handlers import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -0,0 +1,34 @@
+from django.core.handlers import asgi
+from django.urls import get_resolver
+from django.utils.functional import cached_property
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    Django's ASGIHandler, without a thread per request for the KYC status streams.
+
+    Django runs every request in a ThreadSensitiveContext: the request's
+    thread-sensitive sync code (middlewares, request signals) gets a thread of
+    its own, which lives until the response ends. The streams stay open for
+    minutes and only need a thread before their view runs, so their
+    middlewares share asgiref's process-wide sync thread instead, and the
+    views do their database work in the shared thread pool (see
+    accounts.async_views._pooled).
+    """
+
+    # URL names of the long lived requests
+    shared_thread_urls = ("kyc-status-events", "kyc-status-wait")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self._shares_thread(scope):
+            await self.handle(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
+
+    def _shares_thread(self, scope):
+        path = scope["path"].removeprefix(scope.get("root_path", ""))
+        return path.lstrip("/") in self._shared_thread_paths
+
+    @cached_property
+    def _shared_thread_paths(self):
+        return {get_resolver().reverse(name) for name in self.shared_thread_urls}
@@ -1,6 +1,87 @@
+import hashlib
 import json
+import logging
+import random
+import time
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
 
+from project.routers import routing_context
+from project.timing import header, timing_context
+
+timing_logger = logging.getLogger("project.timing")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ServerTimingMiddleware:
+    """
+    Times the stages (project.timing.stage) of a sample of the requests.
+
+    A sampled request (SERVER_TIMING_SAMPLE_RATE) gets a Server-Timing header,
+    shown by the browsers' developer tools, and the same timings are logged as
+    one JSON line on the "project.timing" logger. Other requests only pay for
+    a random number.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with timing_context() as timings:
+            response = self.get_response(request)
+        self._report(request, response, timings, start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        with timing_context() as timings:
+            response = await self.get_response(request)
+        self._report(request, response, timings, start)
+        return response
+
+    def _report(self, request, response, timings, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        stages = timings.stages()
+        # the debug toolbar adds its own metrics
+        response["Server-Timing"] = ", ".join(
+            filter(None, (response.get("Server-Timing"), header(stages, total_ms)))
+        )
+        match = request.resolver_match
+        timing_logger.info(
+            orjson.dumps(
+                {
+                    "method": request.method,
+                    # the URL pattern, not the path, so that lines group by view
+                    "route": match.route if match else request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 1),
+                    "stages": {
+                        name: {"ms": round(duration_ms, 1), "count": count}
+                        for name, (duration_ms, count) in stages.items()
+                    },
+                }
+            ).decode()
+        )
+
 
 # middleware for json responses http://localhost/api/users?debug=&format=json
 class NonHtmlDebugToolbarMiddleware:
@@ -13,11 +94,25 @@ class NonHtmlDebugToolbarMiddleware:
     https://gist.github.com/fabiosussetto/c534d84cbbf7ab60b025
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
         if request.GET.get("debug", None) is not None:
             if response["Content-Type"] == "application/json":
                 content = json.dumps(
@@ -28,3 +123,74 @@ class NonHtmlDebugToolbarMiddleware:
                 )
 
         return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests read from the database replicas, with read-your-writes
+    stickiness.
+
+    Unsafe methods always read from the primary. When a request writes, the
+    client is pinned to the primary for REPLICA_STICKY_SECONDS (longer than the
+    tolerated replica lag) through a cookie and, for API clients that don't keep
+    cookies, a cache marker keyed on their Authorization header.
+    """
+
+    cookie_name = "primary_db"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        marker = self._marker_key(request)
+        pinned = self._pinned(request, marker is not None and cache.get(marker))
+        with routing_context(pinned=pinned) as state:
+            response = self.get_response(request)
+
+        if state.wrote:
+            self._pin(response)
+            if marker is not None:
+                cache.set(marker, 1, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        marker = self._marker_key(request)
+        pinned = self._pinned(request, marker is not None and await cache.aget(marker))
+        with routing_context(pinned=pinned) as state:
+            response = await self.get_response(request)
+
+        if state.wrote:
+            self._pin(response)
+            if marker is not None:
+                await cache.aset(marker, 1, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def _pinned(self, request, marked):
+        return (
+            request.method not in SAFE_METHODS
+            or self.cookie_name in request.COOKIES
+            or bool(marked)
+        )
+
+    def _pin(self, response):
+        response.set_cookie(
+            self.cookie_name,
+            "1",
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+
+    def _marker_key(self, request):
+        authorization = request.META.get("HTTP_AUTHORIZATION")
+        if not authorization:
+            return None
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+        return f"primary-db:{digest}"
@@ -0,0 +1,120 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RoutingState:
+    # reads go to the primary for the whole request
+    pinned: bool = False
+    # set as soon as anything is routed to the primary for writing
+    wrote: bool = False
+
+
+_routing_state = contextvars.ContextVar("db_routing_state", default=None)
+
+
+@contextmanager
+def routing_context(pinned=False):
+    """
+    Allow reads inside the block to be served by a replica.
+
+    Outside of a routing context (management commands, shells, background
+    threads) every query goes to the primary. Once anything is written inside
+    the context, the following reads go to the primary as well.
+    """
+    state = RoutingState(pinned=pinned)
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+class ReplicaHealth:
+    """Process-wide, periodically refreshed replication lag of each replica."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def usable(self, alias):
+        now = time.monotonic()
+        checked_at, lag = self._checked.get(alias, (None, None))
+        if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+            lag = self._measure(alias)
+            with self._lock:
+                self._checked[alias] = (now, lag)
+        return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    def lag(self):
+        return {alias: lag for alias, (_, lag) in self._checked.items()}
+
+    def _measure(self, alias):
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                # caught up replicas report no lag even if the primary is idle
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+                    "END"
+                )
+                (lag,) = cursor.fetchone()
+        except Exception:
+            logger.warning("Replica %s is unavailable", alias, exc_info=True)
+            connection.close()
+            return None
+        return float(lag or 0)
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a healthy replica (settings.DATABASE_REPLICAS) and
+    everything else to the primary.
+
+    Reads stay on the primary when they happen outside a routing context,
+    inside a transaction, after a write in the same request, or when the
+    request is pinned (see project.middleware.ReplicaRoutingMiddleware).
+    Replicas lagging more than REPLICA_MAX_LAG_SECONDS are skipped.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or state.pinned or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        replicas = [
+            alias
+            for alias in settings.DATABASE_REPLICAS
+            if replica_health.usable(alias)
+        ]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -46,25 +46,36 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "debug_toolbar",
     "rest_framework",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
     "accounts",
     "drf_spectacular",
 ]
+if DEBUG:
+    INSTALLED_APPS += ["debug_toolbar"]
 
 MIDDLEWARE = [
+    # first, so that the timings cover the other middlewares
+    "project.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "project.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
-    "project.middleware.NonHtmlDebugToolbarMiddleware",
 ]
+if DEBUG:
+    # development only, they reparse and render every JSON response
+    MIDDLEWARE += [
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+        "project.middleware.NonHtmlDebugToolbarMiddleware",
+    ]
+# share of the requests timed per stage, with a Server-Timing header and a
+# log line, see project/middleware.py
+SERVER_TIMING_SAMPLE_RATE = env.float("DJANGO_SERVER_TIMING_SAMPLE_RATE", default=0.0)
 
 ROOT_URLCONF = "project.urls"
 
@@ -109,6 +120,40 @@ else:
         }
     }
 
+# READ REPLICAS
+# ------------------------------------------------------------------------------
+# safe requests read from these, see project/routers.py
+if DEBUG:
+    # e.g. a copy of db.sqlite3, to try the routing locally
+    for index, path in enumerate(env.list("DJANGO_SQLITE_REPLICA_PATHS", default=[])):
+        DATABASES[f"replica{index}"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": path,
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    for index, host in enumerate(env.list("DJANGO_DATABASE_REPLICA_HOSTS", default=[])):
+        host, _, port = host.partition(":")
+        DATABASES[f"replica{index}"] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "PORT": port or DATABASES["default"]["PORT"],
+            "TEST": {"MIRROR": "default"},
+        }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["project.routers.PrimaryReplicaRouter"]
+# replicas further behind than this are skipped until they catch up
+REPLICA_MAX_LAG_SECONDS = env.float("DJANGO_REPLICA_MAX_LAG_SECONDS", default=2.0)
+REPLICA_LAG_CHECK_INTERVAL = env.float("DJANGO_REPLICA_LAG_CHECK_INTERVAL", default=5.0)
+# how long a client that wrote keeps reading from the primary
+REPLICA_STICKY_SECONDS = env.int("DJANGO_REPLICA_STICKY_SECONDS", default=10)
+
+# CACHES
+# ------------------------------------------------------------------------------
+# use a shared cache (e.g. redis://...) when running several workers
+CACHES = {"default": env.cache("DJANGO_CACHE_URL", default="locmemcache://")}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -162,12 +207,57 @@ STATICFILES_FINDERS = [
 MEDIA_ROOT = "media"
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "/media/"
+# https://docs.djangoproject.com/en/dev/ref/settings/#storages
+STORAGES = {
+    # content addressed files with signed URLs, see accounts.media
+    "default": {"BACKEND": "accounts.media.ContentAddressedStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+# lifetime of the signed media URLs, they are valid for one to two TTLs
+MEDIA_URL_TTL_SECONDS = env.int("DJANGO_MEDIA_URL_TTL_SECONDS", default=300)
+# internal nginx location of MEDIA_ROOT, e.g. /protected-media/; media are
+# then sent by the proxy (X-Accel-Redirect) instead of the Django worker
+MEDIA_ACCEL_REDIRECT_PREFIX = env("DJANGO_MEDIA_ACCEL_REDIRECT_PREFIX", default="")
+# profile photo renditions (accounts/renditions.py), longest side in pixels
+PROFILE_PHOTO_RENDITIONS = {"thumb": 96, "list": 240, "detail": 640}
+PROFILE_PHOTO_JPEG_QUALITY = env.int("DJANGO_PROFILE_PHOTO_JPEG_QUALITY", default=80)
+PROFILE_PHOTO_WEBP_QUALITY = env.int("DJANGO_PROFILE_PHOTO_WEBP_QUALITY", default=75)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# LOGGING
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+# ------------------------------------------------------------------------------
+# the other loggers keep Django's defaults (WARNING and above on the console)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        # the timing lines are JSON already
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "timing": {
+            "class": "logging.StreamHandler",
+            "stream": "ext://sys.stdout",
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        # one line per sampled request, see SERVER_TIMING_SAMPLE_RATE
+        "project.timing": {
+            "handlers": ["timing"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 
 DEBUG_TOOLBAR_CONFIG = {
     "DISABLE_PANELS": [
@@ -187,20 +277,118 @@ INTERNAL_IPS = [
 
 REST_FRAMEWORK = {
     "COERCE_DECIMAL_TO_STRING": False,
+    "DEFAULT_RENDERER_CLASSES": (
+        "accounts.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "accounts.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.UserRateThrottle",
+        "accounts.throttling.UserTokenBucketThrottle",
+        "accounts.throttling.AnonTokenBucketThrottle",
     ],
+    # token buckets: the size and the refill rate, views declare a throttle_cost
     "DEFAULT_THROTTLE_RATES": {
         "user": "80/minute",
+        "anon": "20/minute",
     },
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# where the throttle buckets are kept: "database" (the ThrottleBucket table, one
+# write per request) or "cache" (sliding windows in CACHES, which must then be
+# shared by all the workers, e.g. Redis)
+THROTTLE_STORE = env("DJANGO_THROTTLE_STORE", default="database")
+
 AUTH_USER_MODEL = "accounts.User"
 
+# KYC REVIEW QUEUE
+# ------------------------------------------------------------------------------
+# how long a reviewer keeps a claimed user without sending a heartbeat
+KYC_REVIEW_LEASE_SECONDS = env.int("DJANGO_KYC_REVIEW_LEASE_SECONDS", default=300)
+KYC_REVIEW_MAX_CLAIM = env.int("DJANGO_KYC_REVIEW_MAX_CLAIM", default=25)
+# rows each KYC statistics counter is spread over, see accounts/stats.py
+KYC_STATS_SHARDS = env.int("DJANGO_KYC_STATS_SHARDS", default=8)
+KYC_STATS_MAX_DAYS = env.int("DJANGO_KYC_STATS_MAX_DAYS", default=366)
+
+# how long a user's version is trusted by KYCTokenAuthentication
+KYC_VERSION_CACHE_SECONDS = env.int("DJANGO_KYC_VERSION_CACHE_SECONDS", default=60)
+
+# Cache-Control max-age of the polled per-user endpoints
+KYC_STATUS_MAX_AGE = env.int("DJANGO_KYC_STATUS_MAX_AGE", default=30)
+USER_PROFILE_MAX_AGE = env.int("DJANGO_USER_PROFILE_MAX_AGE", default=60)
+# KYC status streams, see accounts/broadcast.py
+KYC_EVENTS_POLL_INTERVAL = env.float("DJANGO_KYC_EVENTS_POLL_INTERVAL", default=2.0)
+KYC_EVENTS_KEEPALIVE_SECONDS = env.int("DJANGO_KYC_EVENTS_KEEPALIVE_SECONDS", default=15)
+KYC_EVENTS_MAX_WAIT_SECONDS = env.int("DJANGO_KYC_EVENTS_MAX_WAIT_SECONDS", default=30)
+# serve the status, profile and verification endpoints with the async views
+# of accounts/async_views.py, only makes sense under ASGI
+KYC_ASYNC_VIEWS = env.bool("DJANGO_KYC_ASYNC_VIEWS", default=False)
+# throttle tokens taken by a document upload, a status poll takes 1
+KYC_VERIFY_THROTTLE_COST = env.int("DJANGO_KYC_VERIFY_THROTTLE_COST", default=10)
+# concurrent Textract/Rekognition calls per process
+KYC_PROVIDER_MAX_CONCURRENCY = env.int(
+    "DJANGO_KYC_PROVIDER_MAX_CONCURRENCY", default=32
+)
+# KYC attempt ledger, written in batches by a background thread (accounts/ledger.py)
+KYC_ATTEMPT_BATCH_SIZE = env.int("DJANGO_KYC_ATTEMPT_BATCH_SIZE", default=500)
+KYC_ATTEMPT_FLUSH_SECONDS = env.float("DJANGO_KYC_ATTEMPT_FLUSH_SECONDS", default=1.0)
+KYC_ATTEMPT_QUEUE_SIZE = env.int("DJANGO_KYC_ATTEMPT_QUEUE_SIZE", default=10000)
+KYC_ATTEMPT_RETENTION_MONTHS = env.int(
+    "DJANGO_KYC_ATTEMPT_RETENTION_MONTHS", default=12
+)
+# one document verification per user at a time, see accounts/verification.py;
+# across workers only with a shared cache (see CACHES)
+KYC_VERIFY_LOCK_SECONDS = env.int("DJANGO_KYC_VERIFY_LOCK_SECONDS", default=60)
+# how long a duplicate upload reuses the outcome of the first one
+KYC_VERIFY_RESULT_SECONDS = env.int("DJANGO_KYC_VERIFY_RESULT_SECONDS", default=300)
+# Idempotency-Key responses, see accounts/idempotency.py
+IDEMPOTENCY_KEY_TTL = env.int("DJANGO_IDEMPOTENCY_KEY_TTL", default=86400)
+# lease of the key of a request in flight, longer than the slowest request
+IDEMPOTENCY_IN_FLIGHT_SECONDS = env.int(
+    "DJANGO_IDEMPOTENCY_IN_FLIGHT_SECONDS", default=300
+)
+# Retry-After of a retry sent while the first request is still running
+IDEMPOTENCY_RETRY_AFTER_SECONDS = env.int(
+    "DJANGO_IDEMPOTENCY_RETRY_AFTER_SECONDS", default=2
+)
+# resumable document uploads, see accounts/uploads.py
+KYC_UPLOAD_DIR = env("DJANGO_KYC_UPLOAD_DIR", default=str(BASE_DIR / "uploads"))
+KYC_UPLOAD_MAX_SIZE = env.int("DJANGO_KYC_UPLOAD_MAX_SIZE", default=25 * 1024 * 1024)
+# suggested to clients, chunks can be up to the max chunk size
+KYC_UPLOAD_CHUNK_SIZE = env.int("DJANGO_KYC_UPLOAD_CHUNK_SIZE", default=1024 * 1024)
+KYC_UPLOAD_MAX_CHUNK_SIZE = env.int(
+    "DJANGO_KYC_UPLOAD_MAX_CHUNK_SIZE", default=8 * 1024 * 1024
+)
+KYC_UPLOAD_SESSION_TTL = env.int("DJANGO_KYC_UPLOAD_SESSION_TTL", default=86400)
+# how long a request writing a chunk holds the session, long enough to read
+# the largest chunk on a slow link; a dead worker's lease expires after that
+KYC_UPLOAD_LEASE_SECONDS = env.int("DJANGO_KYC_UPLOAD_LEASE_SECONDS", default=300)
+# users resolved from access tokens, see accounts.authentication.UserCache
+JWT_USER_CACHE_SIZE = env.int("DJANGO_JWT_USER_CACHE_SIZE", default=1024)
+JWT_USER_CACHE_LOCAL_SECONDS = env.int("DJANGO_JWT_USER_CACHE_LOCAL_SECONDS", default=5)
+JWT_USER_CACHE_SECONDS = env.int("DJANGO_JWT_USER_CACHE_SECONDS", default=300)
+
+# per-process Bloom filter of blacklisted refresh tokens, see accounts/blacklist.py
+TOKEN_BLACKLIST_FILTER_CAPACITY = env.int(
+    "DJANGO_TOKEN_BLACKLIST_FILTER_CAPACITY", default=100000
+)
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = env.float(
+    "DJANGO_TOKEN_BLACKLIST_FILTER_ERROR_RATE", default=0.001
+)
+TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS = env.int(
+    "DJANGO_TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS", default=10
+)
+TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS = env.int(
+    "DJANGO_TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS", default=3600
+)
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=6),
@@ -228,8 +416,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.KYCTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.FilteredTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -255,6 +443,34 @@ EMAIL_HOST_PASSWORD = env("DJANGO_EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = env("DJANGO_DEFAULT_FROM_EMAIL")
 # https://docs.djangoproject.com/en/dev/ref/settings/#server-email
 SERVER_EMAIL = env("DJANGO_SERVER_EMAIL", default=DEFAULT_FROM_EMAIL)
+# used by django.core.mail.backends.filebased.EmailBackend, e.g. for local testing
+EMAIL_FILE_PATH = env("DJANGO_EMAIL_FILE_PATH", default=str(BASE_DIR / "sent_emails"))
+
+# outbox dispatcher (manage.py dispatch_outbox), see accounts/outbox.py
+OUTBOX_BATCH_SIZE = env.int("DJANGO_OUTBOX_BATCH_SIZE", default=100)
+# mail connections kept open, one per sending thread
+OUTBOX_CONNECTIONS = env.int("DJANGO_OUTBOX_CONNECTIONS", default=4)
+# connections sending to the same recipient domain at a time
+OUTBOX_DOMAIN_CONCURRENCY = env.int("DJANGO_OUTBOX_DOMAIN_CONCURRENCY", default=2)
+OUTBOX_MAX_ATTEMPTS = env.int("DJANGO_OUTBOX_MAX_ATTEMPTS", default=8)
+# retries back off exponentially from the base delay up to the max delay
+OUTBOX_RETRY_BASE_SECONDS = env.int("DJANGO_OUTBOX_RETRY_BASE_SECONDS", default=30)
+OUTBOX_RETRY_MAX_SECONDS = env.int("DJANGO_OUTBOX_RETRY_MAX_SECONDS", default=3600)
+# a crashed dispatcher's emails are picked up again after this
+OUTBOX_LEASE_SECONDS = env.int("DJANGO_OUTBOX_LEASE_SECONDS", default=300)
+
+# webhooks (manage.py dispatch_webhooks), see accounts/webhooks.py
+# the events of a window are delivered together, once it ends
+WEBHOOK_BATCH_WINDOW_SECONDS = env.int("DJANGO_WEBHOOK_BATCH_WINDOW_SECONDS", default=5)
+WEBHOOK_BATCH_SIZE = env.int("DJANGO_WEBHOOK_BATCH_SIZE", default=500)
+# deliveries in flight, and pooled connections per host
+WEBHOOK_CONCURRENCY = env.int("DJANGO_WEBHOOK_CONCURRENCY", default=8)
+WEBHOOK_TIMEOUT_SECONDS = env.float("DJANGO_WEBHOOK_TIMEOUT_SECONDS", default=10.0)
+# events are dead letters after this many failed deliveries
+WEBHOOK_MAX_ATTEMPTS = env.int("DJANGO_WEBHOOK_MAX_ATTEMPTS", default=10)
+WEBHOOK_RETRY_BASE_SECONDS = env.int("DJANGO_WEBHOOK_RETRY_BASE_SECONDS", default=10)
+WEBHOOK_RETRY_MAX_SECONDS = env.int("DJANGO_WEBHOOK_RETRY_MAX_SECONDS", default=3600)
+WEBHOOK_LEASE_SECONDS = env.int("DJANGO_WEBHOOK_LEASE_SECONDS", default=300)
 
 
 SPECTACULAR_SETTINGS = {
@@ -262,5 +478,7 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "Development of a Django-Based KYC Verification System Using AWS Textract API",
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
+    # one enum for all the KYC state fields
+    "ENUM_NAME_OVERRIDES": {"KYCStateEnum": "accounts.models.KYCState"},
     # OTHER SETTINGS
 }
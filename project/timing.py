@@ -0,0 +1,74 @@
+"""
+Per-stage timing of sampled requests, see ServerTimingMiddleware.
+
+Code times a stage with
+
+    with stage("textract"):
+        ...
+
+Stages inside a sampled request add their duration to the request's
+timings; elsewhere (unsampled requests, commands) stage() only reads a
+context variable. Thread pools run their work in the context of the caller
+(contextvars.copy_context) so that their stages are counted as well.
+"""
+
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_timings = contextvars.ContextVar("server_timings", default=None)
+
+
+class Timings:
+    """The stages of one request, in the order they first ran."""
+
+    def __init__(self):
+        # list.append is atomic, stages may end in other threads
+        self._entries = []
+
+    def add(self, name, duration_ms):
+        self._entries.append((name, duration_ms))
+
+    def stages(self):
+        """Total duration (ms) and count of each stage."""
+        stages = defaultdict(lambda: [0.0, 0])
+        for name, duration_ms in list(self._entries):
+            stages[name][0] += duration_ms
+            stages[name][1] += 1
+        return stages
+
+
+@contextmanager
+def timing_context():
+    """Collect the stages run inside the block."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time the block as the stage `name` of the sampled request, if any."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def header(stages, total_ms):
+    """The Server-Timing header value of `stages` and the total."""
+    metrics = [
+        f"{name};dur={duration_ms:.1f}" + (f';desc="x{count}"' if count > 1 else "")
+        for name, (duration_ms, count) in stages.items()
+    ]
+    metrics.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(metrics)
@@ -17,7 +17,6 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 from accounts.views import (
     RegisterView,
@@ -25,10 +24,26 @@ from accounts.views import (
     KYCStatusView,
     UserProfileView,
     UsersView,
+    UsersExportView,
     ApproveKYCView,
     RejectKYCView,
+    BulkKYCDecisionView,
     VerifyIdentityView,
+    ReviewQueueClaimView,
+    ReviewQueueHeartbeatView,
+    ReviewQueueReleaseView,
+    ReviewQueueStatsView,
+    KYCStatsView,
+    MetricsView,
+    WebhookSubscriptionsView,
+    WebhookSubscriptionView,
+    WebhookDeadLettersView,
+    MediaView,
+    UploadSessionsView,
+    UploadSessionView,
+    UploadFinalizeView,
 )
+from accounts import async_views
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     # TokenRefreshView,
@@ -39,19 +54,91 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+# the async views need an ASGI server, the APIViews remain the fallback
+if settings.KYC_ASYNC_VIEWS:
+    kyc_status_view = async_views.kyc_status
+    user_profile_view = async_views.user_profile
+    verify_identity_view = async_views.verify_identity
+else:
+    kyc_status_view = KYCStatusView.as_view()
+    user_profile_view = UserProfileView.as_view()
+    verify_identity_view = VerifyIdentityView.as_view()
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/signup/", RegisterView.as_view(), name="signup"),
     path("api/logout/", LogoutView.as_view(), name="logout"),
-    path("api/kyc-status/", KYCStatusView.as_view(), name="kyc-status"),
-    path("api/user-profile/", UserProfileView.as_view(), name="user-profile"),
+    path("api/kyc-status/", kyc_status_view, name="kyc-status"),
+    path(
+        "api/kyc-status/events/",
+        async_views.kyc_status_events,
+        name="kyc-status-events",
+    ),
+    path("api/kyc-status/wait/", async_views.kyc_status_wait, name="kyc-status-wait"),
+    path("api/user-profile/", user_profile_view, name="user-profile"),
     path("api/admin/users/", UsersView.as_view(), name="all-users"),
+    path("api/admin/users/export/", UsersExportView.as_view(), name="export-users"),
     path(
         "api/admin/approve-kyc/<int:pk>/", ApproveKYCView.as_view(), name="approve-kyc"
     ),
     path("api/admin/reject-kyc/<int:pk>/", RejectKYCView.as_view(), name="reject-kyc"),
-    path("api/upload-document/", VerifyIdentityView.as_view(), name="verify-identity"),
+    path(
+        "api/admin/kyc-decisions/",
+        BulkKYCDecisionView.as_view(),
+        name="bulk-kyc-decisions",
+    ),
+    path(
+        "api/admin/review-queue/claim/",
+        ReviewQueueClaimView.as_view(),
+        name="review-queue-claim",
+    ),
+    path(
+        "api/admin/review-queue/heartbeat/",
+        ReviewQueueHeartbeatView.as_view(),
+        name="review-queue-heartbeat",
+    ),
+    path(
+        "api/admin/review-queue/release/",
+        ReviewQueueReleaseView.as_view(),
+        name="review-queue-release",
+    ),
+    path(
+        "api/admin/review-queue/stats/",
+        ReviewQueueStatsView.as_view(),
+        name="review-queue-stats",
+    ),
+    path("api/admin/kyc-stats/", KYCStatsView.as_view(), name="kyc-stats"),
+    path("api/admin/metrics/", MetricsView.as_view(), name="metrics"),
+    path(
+        "api/admin/webhooks/",
+        WebhookSubscriptionsView.as_view(),
+        name="webhook-subscriptions",
+    ),
+    path(
+        "api/admin/webhooks/<int:pk>/",
+        WebhookSubscriptionView.as_view(),
+        name="webhook-subscription",
+    ),
+    path(
+        "api/admin/webhooks/dead-letters/",
+        WebhookDeadLettersView.as_view(),
+        name="webhook-dead-letters",
+    ),
+    path("api/upload-document/", verify_identity_view, name="verify-identity"),
+    path("api/uploads/", UploadSessionsView.as_view(), name="uploads"),
+    path("api/uploads/<uuid:pk>/", UploadSessionView.as_view(), name="upload"),
+    path(
+        "api/uploads/<uuid:pk>/finalize/",
+        UploadFinalizeView.as_view(),
+        name="upload-finalize",
+    ),
+    # the media are protected, see accounts.media
+    path(
+        settings.MEDIA_URL.lstrip("/") + "<path:name>",
+        MediaView.as_view(),
+        name="media",
+    ),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/schema/redoc/",
@@ -64,7 +151,7 @@ urlpatterns = [
         name="swagger-ui",
     ),
     # path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
 
 if settings.DEBUG:
     # This allows the error pages to be debugged during development, just visit